@@ -1,5 +1,3 @@
-import re
-import datasets
 import pandas as pd
 import sys
 import os
@@ -7,89 +5,80 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__),
                              'src'))
 from classifiers.knn import Knn
-from evaluation.evaluation import Evaluator
+from evaluation.evaluation import BatchEvaluator
 from preprocessing.preprocessing import Preprocessor
+from preprocessing.dataset import DatasetFile
 from data_representations.bow import BOW
 
-def tokenize(lyrics, keep_punc=False):
-        """Tokenizes the raw data into a list of words in the lyrics by first
-        cleaning the special newline characters and then splitting the string
-        on the whitespaces. Depending on the value of self.keep_punc it removes
-        or keeps punctuation.
-        Args:
-            lyrics (string): Lyrics of a song to be tokenized
-        Returns:
-            list(string): list of words in the lyrics
-        """
-        cleaned = lyrics.replace(" NEWLINE ", ' ').replace(" NEWLINE\n", '')
-        if not keep_punc:  # remove punctuation
-            return re.sub(r'[^\w\s]', '', cleaned).split(' ')
-        else:
-            return cleaned.split(' ')
+def load_songs(dataset_file, artists, preprocessor):
+    """Loads and tokenizes the songs of some artists.
 
-def load_preprocess(n):
+    Args:
+        dataset_file (DatasetFile): indexed data set file
+        artists (list(string)): artists whose songs to load
+        preprocessor (Preprocessor): preprocessor to tokenize with
+    Returns:
+        pd.Dataframe: artist, title and tokenized lyrics per song
+    """
+    lines = dataset_file.lines(artists)
+    if preprocessor.cache is not None:
+        songs = preprocessor.corpus(dataset_file.filepath).select(lines)
+        return pd.DataFrame(songs, columns=['artist', 'title', 'tokenized'])
+
+    songs = pd.DataFrame([dataset_file[i] for i in lines],
+                         columns=['artist', 'title', 'lyrics'])
+    songs["tokenized"] = preprocessor.tokenize_all(songs.lyrics)
+    return songs
+
+def load_preprocess(n, processes=1, cache_dir=None):
     """Loads and preprocesses the data:
-    - Loading data from disk
+    - Indexing data on disk
+    - Filtering for classes
+    - Loading the songs of these classes
     - Tokenizing
     - Converting to BOW
-    - Filtering for classes
 
     Args:
         n (int): Number of classes to keep in the subset.
+        processes (int, optional): Number of processes to tokenize with.
+        cache_dir (string, optional): Directory of the cache of tokenized
+                                      files. If given, each file is
+                                      tokenized completely once and later
+                                      runs skip tokenization.
     Returns:
         train pd.Dataframe, test pd.Dataframe, artists list(string): Training and test datasets, list of artists
     """
     data_folder = "./data/"
 
-    # Read and load training data file
-    train_file = data_folder + "songs_train.txt"
-
-    train = []
-    with open(train_file, 'r') as f:
-        for line in f.readlines():
-            # The three values for each line are joined together with the tab '\t' character
-            artist, title, lyrics = line.split('\t')
+    # Index training and testing data files
+    train_file = DatasetFile(data_folder + "songs_train.txt")
+    test_file = DatasetFile(data_folder + "songs_test.txt")
 
-            train.append([artist, title, lyrics])
-    
-    # Read and load testing data file
-    test_file = data_folder + "songs_test.txt"
-    
-    test = [] 
-    with open(test_file, 'r') as f:
-        for line in f.readlines():
-            # The three values for each line are joined together with the tab '\t' character
-            artist, title, lyrics = line.split('\t')
-
-            test.append([artist, title, lyrics])
-
-    # Creating datasets
-    data_train = pd.DataFrame(train, columns=['artist', 'title', 'lyrics'])
-    data_test = pd.DataFrame(test, columns=['artist', 'title', 'lyrics'])
-    train_ds = datasets.Dataset.from_pandas(data_train)
+    # Filter for only the n artists to experiment on
+    artists = train_file.artists[:n]
 
     # Tokenize and create BOWs
-    data_train["tokenized"] = [tokenize(lyrics) for lyrics in data_train.lyrics]
-    data_train["bow"] = data_train.tokenized.apply(BOW)
-    data_test["tokenized"] = [tokenize(lyrics) for lyrics in data_test.lyrics]
-    data_test["bow"] = data_test.tokenized.apply(BOW)
-
-    # Filter for only the n artists to experiment on
-    artists = list(dict.fromkeys(train_ds["artist"]))[:n]
-    train = data_train[data_train.artist.isin(artists)]
-    test = data_test[data_test.artist.isin(artists)]
+    preprocessor = Preprocessor(processes=processes, cache_dir=cache_dir)
+    train = load_songs(train_file, artists, preprocessor)
+    train["bow"] = train.tokenized.apply(BOW)
+    test = load_songs(test_file, artists, preprocessor)
+    test["bow"] = test.tokenized.apply(BOW)
 
     return train, test, artists
 
 if __name__ == "__main__":
-    # Reading command line arguments
-    n = int(sys.argv[1])
+    # Reading command line arguments, several comma separated numbers of
+    # classes are evaluated in one sweep
+    ns = [int(n) for n in sys.argv[1].split(",")]
     processes = int(sys.argv[2])
     
-    # Loading and preprocessing datasets
-    train, test, artists = load_preprocess(n)
+    # Loading and preprocessing datasets of the largest number of classes,
+    # which contain the smaller ones
+    train, test, artists = load_preprocess(max(ns), processes,
+                                           cache_dir="./data/cache/")
     
-    # Convert artist names to indices
+    # Convert artist names to indices, the first n artists are the labels
+    # below n
     label_to_num = {artist:i for i, artist in enumerate(artists)}
 
     # Convert training and test dataset BOWs and labels into the format
@@ -99,16 +88,31 @@ if __name__ == "__main__":
     test_examples = list(test.bow)
     test_labels = [label_to_num[label] for label in list(test.artist)]
     
-    classifier = Knn(input=training_examples, targets=training_labels, multi_process=processes)
+    # Rankings are cached, so reruns with other ks are served from disk
+    classifier = Knn(input=training_examples, targets=training_labels,
+                     multi_process=processes,
+                     cache_dir="./data/cache/neighbours/")
     
-    for i in range(25):  # Going through different numbers of neighbors
-        curr_k = i+1
-        predictions = classifier.predict(test_examples, k=curr_k, measure="jaccard")
-        
-        evaluator = Evaluator(test_labels, predictions)
-        
-        curr_acc = evaluator.accuracy()
+    # Going through different numbers of neighbors, all predictions are
+    # voted from one ranking of the 25 nearest neighbors. The rankings
+    # against all training songs are filtered to the artists of every n,
+    # which predicts the same as a classifier trained on these only.
+    ks = [i+1 for i in range(25)]
+    rows = [[i for i, label in enumerate(test_labels) if label < n]
+            for n in ns]
+    predictions_per_n = classifier.predict_subsets(
+        test_examples, ks=ks, labels=[range(n) for n in ns], rows=rows,
+        measure="jaccard")
+
+    for n, n_rows, predictions_per_k in zip(ns, rows, predictions_per_n):
+        # All ks are evaluated at once and their results written in one go
+        evaluator = BatchEvaluator([test_labels[i] for i in n_rows],
+                                   [predictions_per_k[curr_k]
+                                    for curr_k in ks])
+        accuracies = evaluator.accuracy().tolist()
+        n_train = sum(label < n for label in training_labels)
 
         # Logging the results
         with open(f"./baseline_results_{n}_classes.csv", "a+") as f:
-            f.write(f"knn-bow;{n};{len(train)};{len(test)};{curr_acc};{curr_k}\n")
+            f.writelines(f"knn-bow;{n};{n_train};{len(n_rows)};{curr_acc};{curr_k}\n"
+                         for curr_k, curr_acc in zip(ks, accuracies))
@@ -0,0 +1,969 @@
+from typing import List, Union
+import sys
+import os
+
+import numpy as np
+from scipy import sparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..',
+                             'data_representations'))
+from vector import Vector
+from bow import BOW, measure_grid, similarity_from_counts
+from bow_matrix import BOWMatrix
+from bow_bitset import BOWBitset
+from minhash import MinHash, LSHIndex
+from ivf import IVFIndex
+from vector_collection import VectorCollection
+
+# fraction of candidate pairs above which MinHashLSH scores all pairs of a
+# block with one sparse matrix product instead of pair by pair
+DENSE_CANDIDATES = 1 / 32
+# slack of the similarity bounds of Pruned against rounding errors
+BOUND_TOLERANCE = 1e-9
+# examples sharing the rarest terms of a query that Pruned scores first, to
+# find a high k-th best similarity early
+FIRST_ROUND_ROWS = 256
+
+
+def nearest(distances: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k smallest distances in ascending order.
+
+    Uses partial selection instead of sorting all distances. Equal distances
+    are ordered by index, so the result is the same as the first k indexes
+    of a stable sort.
+
+    Args:
+        distances (np.ndarray): distances to all training examples
+        k (int): number of nearest neighbours
+
+    Returns:
+        np.ndarray: indexes of the min(k, len(distances)) nearest neighbours
+    """
+    if k >= len(distances):
+        return np.argsort(distances, kind="stable")
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    kth = np.partition(distances, k - 1)[k - 1]
+    # all candidates tied with the k-th distance, in index order
+    candidates = np.flatnonzero(distances <= kth)
+    return candidates[np.argsort(distances[candidates], kind="stable")][:k]
+
+
+def search_neighbours(search,
+                      input: List[Union[Vector, BOW]],
+                      k,
+                      measure,
+                      alpha,
+                      beta,
+                      block_size) -> np.ndarray:
+    """Ranks the nearest training examples of the input with a backend,
+    computing the distances for blocks of inputs at once.
+
+    Args:
+        search: search backend, one of BACKENDS
+        input (List[Union[Vector, BOW]]): input examples
+        k (int): number of nearest neighbours to rank.
+        measure (string): Distance measure to use.
+        alpha (float): Alpha value for Tversky index.
+        beta (float): Beta value for Tversky index.
+        block_size (int): number of inputs per block
+
+    Returns:
+        np.ndarray: indexes of the nearest training examples, of shape
+                    (len(input), min(k, len(search)))
+    """
+    return search_neighbours_grid(search, input, k, [(measure, alpha, beta)],
+                                  block_size)[0]
+
+
+def search_neighbours_grid(search,
+                           input: List[Union[Vector, BOW]],
+                           k,
+                           measures,
+                           block_size) -> np.ndarray:
+    """Ranks the nearest training examples of the input for several
+    measures, see search_neighbours.
+
+    Backends with a counts method compute the intersection and set sizes
+    of a block only once for all measures, the others compute the
+    distances of every measure separately.
+
+    Approximate backends give all training examples that are not candidates
+    of a query an infinite distance. Queries with fewer than k candidates
+    are searched again with their exact_distances method, so no
+    non-candidate is ever returned as a neighbour.
+
+    Args:
+        search: search backend, one of BACKENDS
+        input (List[Union[Vector, BOW]]): input examples
+        k (int): number of nearest neighbours to rank.
+        measures (List[Union[str, Tuple[str, float, float]]]): measure
+            names or (measure, alpha, beta) triples, see bow.measure_grid
+        block_size (int): number of inputs per block
+
+    Returns:
+        np.ndarray: indexes of the nearest training examples, of shape
+                    (len(measures), len(input), min(k, len(search)))
+    """
+    measures = measure_grid(measures)
+    neighbours = np.empty((len(measures), len(input), min(k, len(search))),
+                          dtype=np.int64)
+    queries = search.transform(input)
+    for start in range(0, len(queries), block_size):
+        block = queries[start:start + block_size]
+        if hasattr(search, "neighbours"):
+            # the backend ranks the neighbours itself, e.g. to skip
+            # training examples that cannot be among the k nearest
+            for m, (measure, alpha, beta) in enumerate(measures):
+                neighbours[m, start:start + block_size] = search.neighbours(
+                    block, k, measure, alpha, beta)
+            continue
+
+        counts = search.counts(block) if hasattr(search, "counts") else None
+        for m, (measure, alpha, beta) in enumerate(measures):
+            # Calculate distance between a block of inputs and all
+            # examples in training set
+            if counts is None:
+                distances = search.distances(block, measure, alpha, beta)
+            else:
+                distances = 1 - similarity_from_counts(*counts,
+                                                       measure=measure,
+                                                       alpha=alpha,
+                                                       beta=beta)
+            if hasattr(search, "exact_distances"):
+                found = np.count_nonzero(np.isfinite(distances), axis=1)
+                short = np.flatnonzero(found < min(k, len(search)))
+                if len(short):
+                    distances[short] = search.exact_distances(
+                        block[short], measure, alpha, beta)
+
+            # Picks the k closest examples of every input
+            for i, row in enumerate(distances):
+                neighbours[m, start + i] = nearest(row, k)
+
+    return neighbours
+
+
+def recall(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """Fraction of the exact nearest neighbours an approximate search
+    found, averaged over all queries.
+
+    Args:
+        approximate (np.ndarray): neighbours of an approximate backend, of
+                                  shape (queries, k)
+        exact (np.ndarray): neighbours of an exact backend, same shape
+
+    Returns:
+        float: the recall
+    """
+    if exact.size == 0:
+        return 1.0
+    found = [len(np.intersect1d(a, e)) for a, e in zip(approximate, exact)]
+    return sum(found) / exact.size
+
+
+class BruteForce():
+    """Search backend comparing every query against every training example
+    using the distance method of the representation itself.
+
+    Works for every representation, but is slow since every pair results
+    in a Python-level distance call.
+    """
+
+    def __init__(self, input: List[Union[Vector, BOW]]):
+        """
+        Args:
+            input (List[Union[Vector, BOW]]): training examples
+        """
+        self.data = input
+
+    def __len__(self):
+        return len(self.data)
+
+    def transform(self, input: List[Union[Vector, BOW]]):
+        """Converts input examples into the query format of the backend.
+
+        Args:
+            input (List[Union[Vector, BOW]]): input examples
+
+        Returns:
+            List[Union[Vector, BOW]]: the unchanged input examples
+        """
+        return input
+
+    def distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and all training examples.
+
+        Args:
+            queries (List[Union[Vector, BOW]]): transformed queries
+            measure (string): Distance measure to use.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        distances = np.empty((len(queries), len(self.data)))
+        for row, x in enumerate(queries):
+            for i, example in enumerate(self.data):
+                if measure == 'tversky':
+                    distances[row, i] = example.distance(x,
+                                                         measure=measure,
+                                                         alpha=alpha,
+                                                         beta=beta)
+                else:
+                    distances[row, i] = example.distance(x, measure=measure)
+        return distances
+
+
+class _CountsBackend():
+    """Search backend over BOW training examples whose distances are all
+    computed from the intersection and set sizes given by counts.
+    """
+
+    def counts(self, queries):
+        """Intersection sizes and set sizes from which every measure is
+        computed.
+
+        Args:
+            queries: queries transformed by the backend
+
+        Returns:
+            np.ndarray, np.ndarray, np.ndarray: |A intersection B| of shape
+                (len(queries), len(self)) and the broadcastable |A| and |B|
+        """
+        raise NotImplementedError
+
+    def distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and all training examples.
+
+        Args:
+            queries: queries transformed by the backend
+            measure (string): Distance measure to use.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        return 1 - similarity_from_counts(*self.counts(queries),
+                                          measure=measure,
+                                          alpha=alpha,
+                                          beta=beta)
+
+
+class InvertedIndex(_CountsBackend):
+    """Inverted index over BOW training examples.
+
+    Maps every term to the posting list of training examples containing it,
+    so the intersection sizes of a query with all training examples are
+    obtained by walking only the posting lists of the query terms. The set
+    differences are derived from the stored set sizes.
+
+    The posting lists are stored concatenated in one array, with the
+    postings of term t at postings[offsets[t]:offsets[t+1]].
+    """
+
+    def __init__(self, input: List[BOW]):
+        """
+        Args:
+            input (List[BOW]): training examples
+        """
+        self.vocab = {}
+        term_ids, doc_ids = [], []
+        for doc_id, bow in enumerate(input):
+            for term in bow.rep:
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_id)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        # stable sort keeps the doc ids of a posting list in ascending order
+        order = np.argsort(term_ids, kind="stable")
+        self.postings = np.array(doc_ids, dtype=np.int32)[order]
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocab)),
+                  out=self.offsets[1:])
+        self.sizes = np.array([len(bow.rep) for bow in input], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def transform(self, input: List[BOW]):
+        """Converts input BOWs into lists of known term ids.
+
+        The exact set size is kept along, since unknown terms still count
+        for |B-A|.
+
+        Args:
+            input (List[BOW]): input examples
+
+        Returns:
+            List[Tuple[np.ndarray, int]]: term ids and set size per example
+        """
+        return [(np.array([self.vocab[term] for term in bow.rep
+                           if term in self.vocab], dtype=np.int64),
+                 len(bow.rep))
+                for bow in input]
+
+    def intersections(self, term_ids: np.ndarray) -> np.ndarray:
+        """Intersection sizes of a query with all training examples.
+
+        Args:
+            term_ids (np.ndarray): known term ids of the query
+
+        Returns:
+            np.ndarray: |A intersection B| for every training example A
+        """
+        postings = [self.postings[self.offsets[t]:self.offsets[t + 1]]
+                    for t in term_ids]
+        if not postings:
+            return np.zeros(len(self), dtype=np.int64)
+        return np.bincount(np.concatenate(postings), minlength=len(self))
+
+    def counts(self, queries):
+        """Intersection and set sizes of the queries, see
+        _CountsBackend.counts.
+
+        Args:
+            queries (List[Tuple[np.ndarray, int]]): transformed queries
+        """
+        intersections = np.array([self.intersections(term_ids)
+                                  for term_ids, _ in queries])
+        query_sizes = np.array([size for _, size in queries])
+        # training examples are A, queries are B, as in
+        # example.distance(x) of the brute force search
+        return (intersections.reshape(len(queries), len(self)),
+                self.sizes[None, :], query_sizes[:, None])
+
+
+class SparseMatrix(_CountsBackend):
+    """Search backend over a binary CSR matrix of the BOW training examples.
+
+    The intersections of a block of queries with all training examples are
+    computed with one sparse matrix product.
+    """
+
+    def __init__(self, input: List[BOW]):
+        """
+        Args:
+            input (List[BOW]): training examples
+        """
+        self.matrix = BOWMatrix(input)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def transform(self, input: List[BOW]) -> BOWMatrix:
+        """Converts input BOWs into a matrix over the training vocabulary.
+
+        Args:
+            input (List[BOW]): input examples
+
+        Returns:
+            BOWMatrix: the queries
+        """
+        return BOWMatrix(input, vocabulary=self.matrix.vocabulary)
+
+    def counts(self, queries):
+        """Intersection and set sizes of the queries, see
+        _CountsBackend.counts.
+
+        Args:
+            queries (BOWMatrix): transformed queries
+        """
+        # training examples are A, queries are B
+        return (queries.intersection(self.matrix),
+                self.matrix.sizes[None, :], queries.sizes[:, None])
+
+
+class Bitset(_CountsBackend):
+    """Search backend over packed bitsets of the BOW training examples.
+
+    The intersections of a block of queries with all training examples are
+    popcounts of the AND of their bitsets, see bow_bitset.BOWBitset. With
+    the full training vocabulary the distances are the same as the ones of
+    the other exact backends. A vocabulary pruned to the most frequent
+    terms makes the bitsets shorter, intersections then only count the
+    kept terms while the set sizes stay exact.
+    """
+
+    def __init__(self, input: List[BOW], max_terms: int = None):
+        """
+        Args:
+            input (List[BOW]): training examples
+            max_terms (int, optional): only keep the terms of the max_terms
+                                       highest document frequencies in the
+                                       bitsets. If None, all terms.
+                                       Defaults to None.
+        """
+        self.bitset = BOWBitset(input, max_terms=max_terms)
+
+    def __len__(self):
+        return len(self.bitset)
+
+    def transform(self, input: List[BOW]) -> BOWBitset:
+        """Converts input BOWs into bitsets over the training vocabulary.
+
+        Args:
+            input (List[BOW]): input examples
+
+        Returns:
+            BOWBitset: the queries
+        """
+        return BOWBitset(input, vocabulary=self.bitset.vocabulary)
+
+    def counts(self, queries):
+        """Intersection and set sizes of the queries, see
+        _CountsBackend.counts.
+
+        Args:
+            queries (BOWBitset): transformed queries
+        """
+        # training examples are A, queries are B
+        return (queries.intersection(self.bitset),
+                self.bitset.sizes[None, :], queries.sizes[:, None])
+
+
+def min_intersection(similarity: float, size_self: int, size_other: int,
+                     measure="tversky", alpha=1, beta=1) -> float:
+    """Smallest intersection |A intersection B| for which two sets of the
+    given sizes reach a similarity, see similarity_from_counts.
+
+    Args:
+        similarity (float): the similarity to reach
+        size_self (int): |A|
+        size_other (int): |B|
+        measure (str, optional): Defaults to "tversky".
+        alpha (int, optional): Defaults to 1.
+        beta (int, optional): Defaults to 1.
+
+    Returns:
+        float: the real valued bound, 0 if any intersection might reach the
+               similarity
+    """
+    if measure == "jaccard":
+        measure, alpha, beta = "tversky", 1, 1
+    elif measure == "dsc":
+        measure, alpha, beta = "tversky", 0.5, 0.5
+
+    if similarity <= 0:
+        return 0.0
+    if measure == "tversky":
+        # solves i / (i + |alpha| (|A| - i) + |beta| (|B| - i)) >= s for i
+        alpha, beta = abs(alpha), abs(beta)
+        denominator = 1 - similarity * (1 - alpha - beta)
+        if denominator <= 0:
+            return 0.0
+        return similarity * (alpha * size_self +
+                             beta * size_other) / denominator
+    if measure == "overlap":
+        return similarity * min(size_self, size_other)
+    # the naive similarity falls with the intersection
+    return 0.0
+
+
+class Pruned():
+    """Exact search backend for BOW training examples that skips training
+    examples which cannot be among the k nearest, by length and prefix
+    filtering as in AllPairs/PPJoin.
+
+    Since |A intersection B| <= min(|A|, |B|), the similarity of a training
+    example A to a query B is bounded by its value for the largest possible
+    intersection, e.g. min(|A|, |B|) / max(|A|, |B|) for Jaccard. The bound
+    only depends on |A| and falls off on both sides of |A| = |B|, so the
+    training examples whose bound reaches a similarity are one range of
+    sizes. Reaching a similarity also needs an intersection of at least o
+    terms, see min_intersection, so A has to contain one of the
+    |B| - o + 1 terms of B of the smallest document frequencies, its
+    prefix. The other terms have the longest posting lists.
+
+    For every query, the examples sharing its rarest terms and the examples
+    of the sizes with the highest bounds are scored first, at least k of
+    them. The remaining examples are only scored if their size bound
+    reaches the k-th best similarity found and they contain a prefix term
+    for it. The neighbours are the same as the ones of the other exact
+    backends. The fewer examples reach the k-th best similarity, e.g. for
+    near duplicates, the more are skipped.
+
+    The number of compared and scored pairs are counted in pairs and scored,
+    see pruned_fraction.
+    """
+
+    def __init__(self, input: List[BOW]):
+        """
+        Args:
+            input (List[BOW]): training examples
+        """
+        matrix = BOWMatrix(input)
+        # training examples sorted by size, the examples of the i-th
+        # distinct size are rows size_offsets[i]:size_offsets[i+1]
+        self.order = np.argsort(matrix.sizes, kind="stable")
+        self.matrix = matrix[self.order]
+        self.size_values, counts = np.unique(self.matrix.sizes,
+                                             return_counts=True)
+        self.size_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.size_offsets[1:])
+        # sorted rows containing term t, posting list per term
+        self.postings = self.matrix.matrix.T.tocsr()
+        self.postings.sort_indices()
+        self.document_freq = np.diff(self.postings.indptr)
+        self.pairs = 0
+        self.scored = 0
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @property
+    def pruned_fraction(self) -> float:
+        """Fraction of the query and training example pairs skipped so far.
+        """
+        return 1 - self.scored / self.pairs if self.pairs else 0.0
+
+    def transform(self, input: List[BOW]) -> BOWMatrix:
+        """Converts input BOWs into a matrix over the training vocabulary.
+
+        Args:
+            input (List[BOW]): input examples
+
+        Returns:
+            BOWMatrix: the queries
+        """
+        return BOWMatrix(input, vocabulary=self.matrix.vocabulary)
+
+    def bounds(self, size: int, measure, alpha, beta) -> np.ndarray:
+        """Upper bounds of the similarity of a query to the training
+        examples of every distinct size.
+
+        Args:
+            size (int): set size of the query
+            measure (string): Similarity measure to use.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            np.ndarray: bound per distinct training example size
+        """
+        if measure == "naive":
+            # 1 / |A intersection B| grows for smaller intersections
+            return np.ones(len(self.size_values))
+        # all other measures grow with the intersection for fixed sizes
+        return similarity_from_counts(np.minimum(self.size_values, size),
+                                      self.size_values,
+                                      size,
+                                      measure=measure,
+                                      alpha=alpha,
+                                      beta=beta)
+
+    def _containing(self, terms: np.ndarray) -> np.ndarray:
+        """Mask of the sorted rows containing at least one of the terms.
+        """
+        indptr, indices = self.postings.indptr, self.postings.indices
+        contains = np.zeros(len(self), dtype=bool)
+        for term in terms:
+            contains[indices[indptr[term]:indptr[term + 1]]] = True
+        return contains
+
+    def _similarities(self, terms: np.ndarray, size: int, rows: np.ndarray,
+                      measure, alpha, beta) -> np.ndarray:
+        """Similarities of a query to the sorted training examples of rows,
+        an ascending index array.
+        """
+        if len(rows) == 0:
+            return np.zeros(0)
+        matrix = self.matrix.matrix
+        start, end = rows[0], rows[-1] + 1
+        if 2 * len(rows) > end - start:
+            # the range of rows as a CSR matrix of views, without copying
+            # them, is cheaper than selecting the rows
+            indptr = matrix.indptr[start:end + 1]
+            span = sparse.csr_matrix((matrix.data[indptr[0]:indptr[-1]],
+                                      matrix.indices[indptr[0]:indptr[-1]],
+                                      indptr - indptr[0]),
+                                     shape=(end - start, matrix.shape[1]))
+            intersections = (span @ terms)[rows - start]
+        else:
+            intersections = matrix[rows] @ terms
+        self.scored += len(rows)
+        # training examples are A, queries are B
+        return similarity_from_counts(intersections,
+                                      self.matrix.sizes[rows],
+                                      size,
+                                      measure=measure,
+                                      alpha=alpha,
+                                      beta=beta)
+
+    def neighbours(self, queries, k, measure, alpha, beta) -> np.ndarray:
+        """Ranks the k nearest training examples of the queries, see
+        backends.nearest.
+
+        Args:
+            queries (BOWMatrix): transformed queries
+            k (int): number of nearest neighbours to rank.
+            measure (string): Distance measure to use.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            np.ndarray: indexes of the nearest training examples, of shape
+                        (len(queries), min(k, len(self)))
+        """
+        k = min(k, len(self))
+        neighbours = np.empty((len(queries), k), dtype=np.int64)
+        if k <= 0:
+            return neighbours
+        offsets = self.size_offsets
+        indptr = self.matrix.matrix.indptr
+        # the query as a dense binary vector over the training vocabulary
+        terms = np.zeros(self.matrix.matrix.shape[1], dtype=np.int32)
+        query_indptr, query_indices = (queries.matrix.indptr,
+                                       queries.matrix.indices)
+        for row, size in enumerate(queries.sizes):
+            query_terms = query_indices[query_indptr[row]:
+                                        query_indptr[row + 1]]
+            terms[query_terms] = 1
+            bounds = self.bounds(size, measure, alpha, beta)
+            # the terms of the query, rarest first
+            query_terms = query_terms[np.argsort(
+                self.document_freq[query_terms], kind="stable")]
+
+            # the first round scores the examples sharing the rarest terms,
+            # likely the most similar ones, and the examples of the sizes of
+            # the highest bounds, at least k examples
+            n_terms = np.searchsorted(np.cumsum(
+                self.document_freq[query_terms]), FIRST_ROUND_ROWS) + 1
+            first = self._containing(query_terms[:n_terms])
+            best = np.argsort(-bounds, kind="stable")
+            n_best = np.searchsorted(np.cumsum(np.diff(offsets)[best]), k)
+            first[offsets[best[:n_best + 1].min()]:
+                  offsets[best[:n_best + 1].max() + 1]] = True
+            scored = np.flatnonzero(first)
+            similarities = self._similarities(terms, size, scored, measure,
+                                              alpha, beta)
+
+            # the sizes whose bound reaches the k-th best similarity found
+            kth = np.partition(similarities, len(similarities) - k)[-k]
+            reached = np.flatnonzero(bounds >= kth - BOUND_TOLERANCE)
+            lower = offsets[reached.min(initial=len(bounds))]
+            upper = offsets[reached.max(initial=-1) + 1]
+            # the terms of which the examples reaching it contain one
+            overlap = np.ceil(min_intersection(
+                kth - BOUND_TOLERANCE, self.matrix.sizes[lower], size,
+                measure=measure, alpha=alpha, beta=beta) - BOUND_TOLERANCE)
+            prefix = query_terms[:max(len(query_terms) - int(overlap) + 1,
+                                      0)]
+            rest = np.zeros(len(self), dtype=bool)
+            if (overlap < 1 or self.document_freq[prefix].sum() >
+                    indptr[upper] - indptr[lower]):
+                # scanning the rows is cheaper than their posting lists
+                rest[lower:upper] = True
+            else:
+                rest[lower:upper] = self._containing(prefix)[lower:upper]
+            rest = np.flatnonzero(rest & ~first)
+            scored = np.concatenate([scored, rest])
+            similarities = np.concatenate([
+                similarities,
+                self._similarities(terms, size, rest, measure, alpha,
+                                   beta)])
+            terms[query_terms] = 0
+            self.pairs += len(self)
+
+            # all skipped examples are strictly further than the k-th
+            distances = np.full(len(self), np.inf)
+            distances[self.order[scored]] = 1 - similarities
+            neighbours[row] = nearest(distances, k)
+        return neighbours
+
+
+class LSHQueries():
+    """BOW queries of the MinHashLSH backend: their rows over the training
+    vocabulary and their MinHash signatures.
+    """
+
+    def __init__(self, matrix: BOWMatrix, signatures: np.ndarray):
+        self.matrix = matrix
+        self.signatures = signatures
+
+    def __getitem__(self, rows):
+        return LSHQueries(self.matrix[rows], self.signatures[rows])
+
+    def __len__(self):
+        return len(self.matrix)
+
+
+class MinHashLSH():
+    """Approximate search backend for BOW training examples.
+
+    Candidates are the training examples sharing at least one LSH band of
+    their MinHash signature with the query, see minhash.LSHIndex. Only the
+    candidates are scored, with the exact similarity of BOW.similarity, all
+    other training examples get an infinite distance. Queries with fewer
+    than k candidates are compared with all training examples instead, see
+    search_neighbours_grid.
+
+    More bands of fewer rows trade a higher recall for more candidates to
+    score, see backends.recall to measure it against an exact backend.
+    """
+
+    def __init__(self, input: List[BOW], num_perm=128, bands=32, seed=0):
+        """
+        Args:
+            input (List[BOW]): training examples
+            num_perm (int, optional): length of the MinHash signatures.
+                                      Defaults to 128.
+            bands (int, optional): number of LSH bands, has to divide
+                                   num_perm. Defaults to 32.
+            seed (int, optional): seed of the hash functions.
+                                  Defaults to 0.
+        """
+        self.matrix = BOWMatrix(input)
+        self.minhash = MinHash(num_perm, seed=seed)
+        self.index = LSHIndex(self.minhash.signatures(input), bands=bands,
+                              seed=seed)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def transform(self, input: List[BOW]) -> LSHQueries:
+        """Converts input BOWs into rows over the training vocabulary and
+        MinHash signatures.
+
+        Args:
+            input (List[BOW]): input examples
+
+        Returns:
+            LSHQueries: the queries
+        """
+        return LSHQueries(BOWMatrix(input, vocabulary=self.matrix.vocabulary),
+                          self.minhash.signatures(input))
+
+    def distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and their candidates, infinite for all
+        other training examples.
+
+        Args:
+            queries (LSHQueries): transformed queries
+            measure (string): Distance measure to use.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        rows, examples = self.index.candidates(queries.signatures)
+        if len(rows) > len(queries) * len(self) * DENSE_CANDIDATES:
+            # scoring many single pairs is slower than one matrix product
+            intersections = queries.matrix.intersection(
+                self.matrix)[rows, examples]
+        else:
+            intersections = queries.matrix.pair_intersection(self.matrix,
+                                                             rows, examples)
+        distances = np.full((len(queries), len(self)), np.inf)
+        # training examples are A, queries are B
+        distances[rows, examples] = 1 - similarity_from_counts(
+            intersections,
+            self.matrix.sizes[examples],
+            queries.matrix.sizes[rows],
+            measure=measure,
+            alpha=alpha,
+            beta=beta)
+        return distances
+
+    def exact_distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and all training examples.
+
+        Args:
+            queries (LSHQueries): transformed queries
+            measure (string): Distance measure to use.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        # training examples are A, queries are B
+        return 1 - similarity_from_counts(
+            queries.matrix.intersection(self.matrix),
+            self.matrix.sizes[None, :],
+            queries.matrix.sizes[:, None],
+            measure=measure,
+            alpha=alpha,
+            beta=beta)
+
+
+class Dense():
+    """Search backend over a float32 matrix of the Vector training examples.
+
+    Cosine and euclidean distances of a block of queries to all training
+    examples are computed with one matrix multiplication.
+    """
+
+    def __init__(self, input: List[Vector]):
+        """
+        Args:
+            input (List[Vector]): training examples
+        """
+        self.vectors = VectorCollection(input)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def transform(self, input: List[Vector]) -> VectorCollection:
+        """Converts input Vectors into a float32 matrix.
+
+        Args:
+            input (List[Vector]): input examples
+
+        Returns:
+            VectorCollection: the queries
+        """
+        return VectorCollection(input)
+
+    def distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and all training examples.
+
+        Args:
+            queries (VectorCollection): transformed queries
+            measure (string): Distance measure to use.
+            alpha (float): Not used by vector measures.
+            beta (float): Not used by vector measures.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        return queries.distance(self.vectors, measure=measure)
+
+
+class IVF():
+    """Approximate search backend for dense Vector training examples.
+
+    Candidates are the training examples in the nprobe lists of an
+    inverted file index nearest to the query, see ivf.IVFIndex. With
+    product quantization, only the rerank candidates of the smallest
+    approximate distances are kept. The candidates are scored with the
+    exact distance, all other training examples get an infinite distance.
+    Queries with fewer than k candidates are compared with all training
+    examples instead, see search_neighbours_grid.
+
+    Larger nprobe and rerank values trade speed for a higher recall, see
+    backends.recall to measure it against the Dense backend.
+    """
+
+    def __init__(self, input: List[Vector], n_lists: int = None,
+                 nprobe=8, n_subspaces: int = None, rerank=256,
+                 metric="cosine", index: IVFIndex = None, seed=0):
+        """
+        Args:
+            input (List[Vector]): training examples
+            n_lists (int, optional): number of lists of the index. If None,
+                                     4 * sqrt(len(input)).
+                                     Defaults to None.
+            nprobe (int, optional): lists searched per query. Defaults to 8.
+            n_subspaces (int, optional): product quantization subspaces, has
+                                         to divide the vector length. If
+                                         None, all candidates are scored
+                                         exactly. Defaults to None.
+            rerank (int, optional): candidates per query scored exactly with
+                                    product quantization. Defaults to 256.
+            metric (str, optional): metric the index is built for, the
+                                    measure of the queries is used for
+                                    scoring. Defaults to "cosine".
+            index (IVFIndex, optional): prebuilt index of the input, e.g.
+                                        from IVFIndex.load. Defaults to
+                                        None.
+            seed (int, optional): seed of k-means. Defaults to 0.
+
+        Raises:
+            ValueError: raised for sparse vectors or an index of another
+                        number of vectors
+        """
+        self.vectors = VectorCollection(input)
+        if not isinstance(self.vectors.matrix, np.ndarray):
+            raise ValueError("IVF needs dense vectors.")
+        if index is None:
+            if n_lists is None:
+                n_lists = max(int(4 * np.sqrt(len(input))), 1)
+            index = IVFIndex(self.vectors.matrix, min(n_lists, len(input)),
+                             metric=metric, n_subspaces=n_subspaces,
+                             seed=seed)
+        elif len(index) != len(input):
+            raise ValueError(f"Index of {len(index)} vectors does not fit "
+                             f"{len(input)} training examples.")
+        self.index = index
+        self.nprobe = nprobe
+        self.rerank = rerank
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def transform(self, input: List[Vector]) -> VectorCollection:
+        """Converts input Vectors into a float32 matrix.
+
+        Args:
+            input (List[Vector]): input examples
+
+        Returns:
+            VectorCollection: the queries
+        """
+        return VectorCollection(input)
+
+    def distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and their candidates, infinite for all
+        other training examples.
+
+        Args:
+            queries (VectorCollection): transformed queries
+            measure (string): Distance measure to use.
+            alpha (float): Not used by vector measures.
+            beta (float): Not used by vector measures.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        distances = np.full((len(queries), len(self)), np.inf)
+        if self.index.pq is not None:
+            rows, examples = self.index.candidates(queries.matrix,
+                                                   self.nprobe, self.rerank)
+            distances[rows, examples] = queries.pair_distance(
+                self.vectors, rows, examples, measure=measure)
+            return distances
+
+        # without quantization all vectors of a probed list are scored, so
+        # every list is compared with all queries probing it at once
+        lists = self.index.probe(self.index.prepare(queries.matrix),
+                                 self.nprobe)
+        order = np.argsort(lists.ravel(), kind="stable")
+        bounds = np.flatnonzero(np.diff(lists.ravel()[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group) == 0:
+                continue
+            rows = group // lists.shape[1]
+            examples = self.index.list_members(lists.ravel()[group[0]])
+            distances[rows[:, None], examples[None, :]] = queries[
+                rows].distance(self.vectors[examples], measure=measure)
+        return distances
+
+    def exact_distances(self, queries, measure, alpha, beta) -> np.ndarray:
+        """Distances between queries and all training examples.
+
+        Args:
+            queries (VectorCollection): transformed queries
+            measure (string): Distance measure to use.
+            alpha (float): Not used by vector measures.
+            beta (float): Not used by vector measures.
+
+        Returns:
+            np.ndarray: distance matrix of shape (len(queries), len(self))
+        """
+        return queries.distance(self.vectors, measure=measure)
+
+
+BACKENDS = {
+    "brute": BruteForce,
+    "index": InvertedIndex,
+    "matrix": SparseMatrix,
+    "pruned": Pruned,
+    "bitset": Bitset,
+    "dense": Dense,
+    "minhash": MinHashLSH,
+    "ivf": IVF,
+}
@@ -1,26 +1,51 @@
-import itertools
-from typing import List, Union
+from typing import Dict, Iterable, List, Tuple, Union
 import sys
 import os
+import math
 import concurrent.futures
+import multiprocessing
+import weakref
+
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..',
                              'data_representations'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from vector import Vector
-from bow import BOW
+from bow import BOW, measure_grid
+from classifiers.backends import BACKENDS, nearest, search_neighbours_grid
+from classifiers.neighbour_cache import (DEFAULT_MAX_BYTES, NeighbourCache,
+                                         fingerprint)
+from classifiers.workers import (SharedState, cost, init_worker, pruning,
+                                 split_by_cost, worker_neighbours)
+
+# number of chunks per process in multiprocess predictions, small chunks let
+# idle workers pick up the remaining work
+CHUNKS_PER_PROCESS = 8
+# ranking depth of neighbours_subsets as a multiple of the depth expected to
+# hold k training examples of a subset. Queries whose ranking still holds
+# less are ranked completely.
+DEPTH_MARGIN = 2
 
 
 class Knn():
     """The K-nearest neighbor classifier for artist classification
     using vector representations.
 
-    This class is implemented to allow for multiprocess execution.
+    This class is implemented to allow for multiprocess execution. The
+    worker processes are started on the first multiprocess prediction and
+    reused by later ones until close() is called.
     """
 
     def __init__(self,
                  input: List[Union[Vector, BOW]],
                  targets: List[int],
-                 multi_process=1) -> None:
+                 multi_process=1,
+                 backend="auto",
+                 block_size=256,
+                 backend_options: Dict = None,
+                 cache_dir=None,
+                 cache_bytes=DEFAULT_MAX_BYTES) -> None:
         """
 
         Args:
@@ -31,123 +56,360 @@ class Knn():
                                            predicting. If > 1, the algorithm
                                            switches to multiprocessing.
                                            Defaults to 1.
+            backend (string, optional): search backend used to compute the
+                                        distances, one of the keys of
+                                        backends.BACKENDS. "auto" uses the
+                                        sparse matrix for BOWs and the
+                                        dense matrix for Vectors.
+                                        Defaults to "auto".
+            block_size (int, optional): number of inputs whose distances to
+                                        all training examples are computed
+                                        at once. Bounds the memory to
+                                        block_size x len(input) distances.
+                                        Defaults to 256.
+            backend_options (Dict, optional): keyword arguments of the
+                                              backend, e.g. num_perm and
+                                              bands of "minhash".
+                                              Defaults to None.
+            cache_dir (string, optional): directory of the cache of ranked
+                                          neighbours. If given, the
+                                          neighbours of every input and
+                                          measure are ranked once, later
+                                          predictions with the same or a
+                                          smaller k are served from the
+                                          cache, also by other
+                                          classifiers on the same training
+                                          examples. If None, nothing is
+                                          cached. Defaults to None.
+            cache_bytes (int, optional): disk budget of the cache, the
+                                         least recently used entries above
+                                         it are removed.
+                                         Defaults to DEFAULT_MAX_BYTES.
 
         Raises:
             ValueError: raised when targets length not equal to input list
-                        length.
+                        length or the backend is unknown.
         """
         if len(input) != len(targets):
             error = f"""Input ({len(input)}) and targets {len(targets)}
                     not same dimensions."""
             raise ValueError(error)
 
+        if backend == "auto":
+            # BOWs are recognised by their set, since the representation
+            # modules can be imported under different package paths
+            backend = "matrix" if hasattr(input[0], "rep") else "dense"
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}.")
+
         self.multi_process = multi_process
         self.data = input
         self.targets = targets
+        self.backend = backend
+        self.block_size = block_size
+        self.backend_options = backend_options or {}
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = NeighbourCache(cache_dir, cache_bytes)
+            # the training examples are only hashed once
+            self._fingerprint = fingerprint(input)
+        # built once, so the training data is only processed here
+        self._search = BACKENDS[backend](input, **self.backend_options)
+        self._pool = None
+        # per worker timing of the last multiprocess prediction
+        self.worker_stats = {}
+        # compared and scored pairs of the last prediction, see
+        # pruned_fraction
+        self.pairs, self.scored = 0, 0
+
+    def _neighbours(self,
+                    input: List[Union[Vector, BOW]],
+                    k,
+                    measures) -> np.ndarray:
+        """Internal method that ranks the nearest training examples of the
+        input for some measures.
 
-    def _predict(self,
-                 input: List[Union[Vector, BOW]],
-                 k,
-                 measure,
-                 alpha,
-                 beta) -> List[int]:
-        """Internal method that maked a prediction of the input.
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            k (int): number of nearest neighbours to rank.
+            measures (List[Tuple[str, float, float]]): measure, alpha and
+                                                       beta per measure.
+
+        Returns:
+            np.ndarray: indexes of the nearest training examples, of shape
+                        (len(measures), len(input),
+                         min(k, len(training examples)))
+        """
+        pairs, scored = pruning(self._search)
+        neighbours = search_neighbours_grid(self._search,
+                                            input,
+                                            k,
+                                            measures,
+                                            self.block_size)
+        self.pairs = pruning(self._search)[0] - pairs
+        self.scored = pruning(self._search)[1] - scored
+        return neighbours
+
+    def _start_pool(self):
+        """Starts the worker processes. The numpy arrays of the search
+        backend are moved into memory-mapped files, which every worker
+        attaches once, so the training data is neither pickled per task nor
+        copied into every worker.
+        """
+        state = SharedState(self._search)
+        # spawned workers do not inherit a copy of the parent's memory
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.multi_process,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(state.search,))
+        # shuts the workers down and removes the files, at the latest when
+        # the classifier is garbage collected
+        self._finalizer = weakref.finalize(self, Knn._stop_pool,
+                                           self._pool, state)
+
+    @staticmethod
+    def _stop_pool(pool, state):
+        pool.shutdown()
+        state.close()
+
+    def close(self):
+        """Stops the worker processes used for multiprocess predictions.
+        """
+        if self._pool is not None:
+            self._finalizer()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _multiprocess_neighbours(self,
+                                 input: List[Union[Vector, BOW]],
+                                 k,
+                                 measures) -> np.ndarray:
+        """Internal method that ranks the nearest training examples of the
+        input for some measures using multiple processes.
+
+        The worker processes are persistent and hold the training data in
+        shared memory-mapped buffers, so only the input examples are sent
+        to them.
+
+        The input is split into many small chunks of about equal estimated
+        cost (BOW size or non-zero vector entries), which are picked up by
+        the workers as they finish their previous chunk. The time each
+        worker spent is stored in self.worker_stats.
 
         Args:
             input (List[Union[Vector, BOW]]): input examples we want to
                                               predict.
-            k (int): number of nearest neighbours to compare.
-            measure (string): Distance measure to use.
-            alpha (float): Alpha value for Tversky index.
-            beta (float): Beta value for Tversky index.
+            k (int): number of nearest neighbours to rank.
+            measures (List[Tuple[str, float, float]]): measure, alpha and
+                                                       beta per measure.
 
         Returns:
-            List[int]: list of predictions.
+            np.ndarray: indexes of the nearest training examples, of shape
+                        (len(measures), len(input),
+                         min(k, len(training examples)))
         """
-        predictions = []
-        for x in input:
-            distances = []
-            # Calculate distance between x and all examples in training set
-            for i, example in enumerate(self.data):
-                if measure == 'tversky':
-                    distance = example.distance(x,
-                                                measure=measure,
-                                                alpha=alpha,
-                                                beta=beta)
-                else:
-                    distance = example.distance(x, measure=measure)
-                distances.append([i, distance])
-
-            # Sorts distances and picks k closest examples
-            k_picks = sorted(distances, key=lambda ex: ex[1])[:k]
+        if self._pool is None:
+            self._start_pool()
+
+        chunks = split_by_cost([cost(x) for x in input],
+                               self.multi_process * CHUNKS_PER_PROCESS)
+
+        futures = []
+        for start, end in chunks:
+            # the futures are kept in input order, so the order of the
+            # predictions is preserved no matter which worker finishes first
+            futures.append(self._pool.submit(worker_neighbours,
+                                             input[start:end],
+                                             k,
+                                             measures,
+                                             self.block_size))
+
+        # waits for all processes to finish predictions to be able to
+        # join them together into a final array
+        results = [future.result() for future in futures]
+
+        self.worker_stats = {}
+        self.pairs, self.scored = 0, 0
+        for _, stats in results:
+            worker = self.worker_stats.setdefault(
+                stats["pid"], {"chunks": 0, "examples": 0, "seconds": 0.0})
+            worker["chunks"] += 1
+            worker["examples"] += stats["examples"]
+            worker["seconds"] += stats["seconds"]
+            self.pairs += stats["pairs"]
+            self.scored += stats["scored"]
+
+        if not results:
+            return np.zeros((len(measures), 0, min(k, len(self.data))),
+                            dtype=np.int64)
+        return np.concatenate([neighbours for neighbours, _ in results],
+                              axis=1)
+
+    def neighbours(self,
+                   input: List[Union[Vector, BOW]],
+                   k=5,
+                   measure="cosine",
+                   alpha=1.0,
+                   beta=1.0) -> np.ndarray:
+        """Ranks the k nearest training examples for a list of input
+        examples, nearest first. Equal distances are ranked by training
+        order.
+
+        If the value of variable 'multi_process' > 1, the distances are
+        computed using multiple processes for performance gains.
 
-            # Using saved indexes get corresponding labels
-            labels = [self.targets[example[0]] for example in k_picks]
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            k (int, optional): number of nearest neighbours to rank.
+                               Defaults to 5.
+            measure (string, optional): Distance measure to use.
+                                        Defaults to "cosine".
+            alpha (float, optional): Alpha value for Tversky index.
+                                     Defaults to 1.
+            beta (float, optional): Beta value for Tversky index.
+                                    Defaults to 1.
 
-            label = max(labels, key=labels.count)
-            predictions.append(label)
+        Raises:
+            TypeError: raised when input is not of same class type as
+                       examples in the model.
 
-        return predictions
+        Returns:
+            np.ndarray: indexes of the nearest training examples, of shape
+                        (len(input), min(k, len(training examples)))
+        """
+
+        return self.neighbours_grid(input, k, [(measure, alpha, beta)])[0]
+
+    def neighbours_grid(self,
+                        input: List[Union[Vector, BOW]],
+                        k=5,
+                        measures=("cosine",)) -> np.ndarray:
+        """Ranks the k nearest training examples for a list of input
+        examples for several measures at once, see neighbours.
+
+        Backends that count intersections and set sizes ("index", "matrix"
+        and "bitset") only count them once per block of inputs and derive
+        the distances of all measures from them, so a whole grid of
+        measures costs one pass over the training data.
+
+        With a cache, the neighbours of measures ranked before to at least
+        depth k for the same input are loaded instead.
+
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            k (int, optional): number of nearest neighbours to rank.
+                               Defaults to 5.
+            measures (List[Union[str, Tuple[str, float, float]]], optional):
+                measure names, which use alpha=beta=1, or (measure, alpha,
+                beta) triples. Defaults to ("cosine",).
+
+        Raises:
+            TypeError: raised when input is not of same class type as
+                       examples in the model.
+
+        Returns:
+            np.ndarray: indexes of the nearest training examples, of shape
+                        (len(measures), len(input),
+                         min(k, len(training examples)))
+        """
 
-    def _multiprocess_predict(self,
-                              input: List[Union[Vector, BOW]],
-                              k,
-                              measure,
-                              alpha,
-                              beta) -> List[int]:
-        """Internal method that maked a prediction of the input using
-        multiple processes.
+        if not isinstance(input[0], Vector) == isinstance(self.data[0],
+                                                          Vector):
+            raise TypeError("Input and model data types are not of same class")
 
-        Actually just calls self._predict().
+        measures = measure_grid(measures)
+        if self.cache is not None:
+            return self._cached_neighbours(input, k, measures)
+        return self._search_neighbours(input, k, measures)
+
+    def _search_neighbours(self,
+                           input: List[Union[Vector, BOW]],
+                           k,
+                           measures) -> np.ndarray:
+        """Internal method that ranks the nearest training examples of the
+        input with one or multiple processes, see _neighbours.
+        """
+        if self.multi_process > 1:
+            return self._multiprocess_neighbours(input, k, measures)
+        else:
+            return self._neighbours(input, k, measures)
 
-        This method is very memory intensive, since every process
-        has it's own memory copy of the main program. So use wisely.
+    def _cached_neighbours(self,
+                           input: List[Union[Vector, BOW]],
+                           k,
+                           measures) -> np.ndarray:
+        """Internal method that serves the ranked neighbours of the input
+        from the cache. Only the measures without an entry of at least k
+        neighbours are searched and stored in the cache.
 
         Args:
             input (List[Union[Vector, BOW]]): input examples we want to
                                               predict.
+            k (int): number of nearest neighbours to rank.
+            measures (List[Tuple[str, float, float]]): measure, alpha and
+                                                       beta per measure.
+
+        Returns:
+            np.ndarray: indexes of the nearest training examples, of shape
+                        (len(measures), len(input),
+                         min(k, len(training examples)))
+        """
+        queries = fingerprint(input)
+        keys = [self.cache.key(self._fingerprint, queries, self.backend,
+                               self.backend_options, measure, alpha, beta)
+                for measure, alpha, beta in measures]
+        depth = min(k, len(self.data))
+        grid = [self.cache.get(key, depth) for key in keys]
+
+        missing = [i for i, cached in enumerate(grid) if cached is None]
+        # nothing is scored if all measures are cached
+        self.pairs, self.scored = 0, 0
+        if missing:
+            searched = self._search_neighbours(input, k,
+                                               [measures[i] for i in missing])
+            for i, neighbours in zip(missing, searched):
+                self.cache.put(keys[i], neighbours)
+                grid[i] = neighbours
+        return np.stack(grid)
+
+    @property
+    def pruned_fraction(self) -> float:
+        """Fraction of the pairs of inputs and training examples the search
+        backend skipped in the last prediction. Only the "pruned" backend
+        skips pairs, for all others it is 0.
+
+        Returns:
+            float: the fraction of skipped pairs
+        """
+        return 1 - self.scored / self.pairs if self.pairs else 0.0
+
+    def _vote(self, neighbours: np.ndarray, k) -> List[int]:
+        """Majority vote over the labels of the k nearest neighbours. Ties
+        are won by the label of the nearer neighbour.
+
+        Args:
+            neighbours (np.ndarray): ranked nearest neighbours per input
             k (int): number of nearest neighbours to compare.
-            measure (string): Distance measure to use.
-            alpha (float): Alpha value for Tversky index.
-            beta (float): Beta value for Tversky index.
 
         Returns:
             List[int]: list of predictions.
         """
+        predictions = []
+        for k_picks in neighbours[:, :k]:
+            # Using saved indexes get corresponding labels
+            labels = [self.targets[index] for index in k_picks]
 
-        # Function used for splitting input into chunks for processes
-        def chunks(lst, n):
-            """Yield successive n-sized chunks from lst."""
-            for i in range(0, len(lst), n):
-                yield lst[i:i + n]
-
-        # Decides how many examples each process will have, so that
-        # it's evenly distributed amoung n processes
-        chunk_size = int(len(input) / self.multi_process)
-
-        with concurrent.futures.ProcessPoolExecutor(self.multi_process) as ex:
-            futures = []
-            predictions = []
-
-            for examples in chunks(input, chunk_size):
-                # The ex.submit method starts up a new process and returns
-                # a Future object refering to newly created process.
-                #
-                # ex.submit also saves the order of predictions, so there's
-                # no need to keep extra track of orders
-                futures.append(ex.submit(self._predict,
-                                         examples,
-                                         k,
-                                         measure,
-                                         alpha,
-                                         beta))
-
-            # waits for all processes to finish predictions to be able to
-            # join them together into a final list
-            concurrent.futures.wait(futures)
-
-            predictions += list(itertools.chain(*[future.result()
-                                                  for future in futures]))
+            label = max(labels, key=labels.count)
+            predictions.append(label)
 
         return predictions
 
@@ -181,22 +443,214 @@ class Knn():
         Returns:
             List[int]: list of predictions.
         """
+        return self._vote(self.neighbours(input, k, measure, alpha, beta), k)
 
-        if not isinstance(input[0], Vector) == isinstance(self.data[0],
-                                                          Vector):
-            raise TypeError("Input and model data types are not of same class")
+    def predict_many_k(self,
+                       input: List[Union[Vector, BOW]],
+                       ks: List[int],
+                       measure="cosine",
+                       alpha=1.0,
+                       beta=1.0) -> Dict[int, List[int]]:
+        """Predict classification for a list of input examples for several
+        numbers of nearest neighbours at once.
 
-        if self.multi_process > 1:
-            predictions = self._multiprocess_predict(input,
-                                                     k,
-                                                     measure,
-                                                     alpha,
-                                                     beta)
-        else:
-            predictions = self._predict(input,
-                                        k,
-                                        measure,
-                                        alpha,
-                                        beta)
+        The distances are only computed once, the max(ks) nearest neighbours
+        are ranked and the predictions for every k are voted on from that
+        ranking. The predictions are the same as those of predict.
 
-        return predictions
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            ks (List[int]): numbers of nearest neighbours to compare.
+            measure (string, optional): Distance measure to use.
+                                        Defaults to "cosine".
+            alpha (float, optional): Alpha value for Tversky index.
+                                     Defaults to 1.
+            beta (float, optional): Beta value for Tversky index.
+                                    Defaults to 1.
+
+        Raises:
+            TypeError: raised when input is not of same class type as
+                       examples in the model.
+
+        Returns:
+            Dict[int, List[int]]: list of predictions per k.
+        """
+        neighbours = self.neighbours(input, max(ks), measure, alpha, beta)
+        return {k: self._vote(neighbours, k) for k in ks}
+
+    def predict_grid(self,
+                     input: List[Union[Vector, BOW]],
+                     ks: List[int],
+                     measures) -> Dict[Union[str, Tuple[str, float, float]],
+                                       Dict[int, List[int]]]:
+        """Predict classification for a list of input examples for a grid
+        of measures and numbers of nearest neighbours at once, see
+        neighbours_grid and predict_many_k. The predictions are the same as
+        those of predict.
+
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            ks (List[int]): numbers of nearest neighbours to compare.
+            measures (List[Union[str, Tuple[str, float, float]]]): measure
+                names, which use alpha=beta=1, or (measure, alpha, beta)
+                triples.
+
+        Raises:
+            TypeError: raised when input is not of same class type as
+                       examples in the model.
+
+        Returns:
+            Dict[Union[str, Tuple[str, float, float]], Dict[int, List[int]]]:
+                list of predictions per k, per measure as given
+        """
+        grid = self.neighbours_grid(input, max(ks), measures)
+        return {measure: {k: self._vote(neighbours, k) for k in ks}
+                for measure, neighbours in zip(measures, grid)}
+
+    def neighbours_subsets(self,
+                           input: List[Union[Vector, BOW]],
+                           k,
+                           labels: List[Iterable[int]],
+                           rows: List[Iterable[int]] = None,
+                           measure="cosine",
+                           alpha=1.0,
+                           beta=1.0) -> List[np.ndarray]:
+        """Ranks the k nearest training examples for a list of input
+        examples within several subsets of the labels, as a classifier
+        trained on only the examples of a subset would, see neighbours.
+
+        The input is ranked against all training examples once, deep enough
+        to expect k examples of the smallest subset of every input, and the
+        rankings are filtered to the labels of each subset. Inputs whose
+        ranking holds less than k examples of a subset are ranked
+        completely, so the result is exact.
+
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            k (int): number of nearest neighbours to rank.
+            labels (List[Iterable[int]]): the labels of every subset.
+            rows (List[Iterable[int]], optional): the input examples to rank
+                                                  per subset. If None, all
+                                                  of them. Defaults to None.
+            measure (string, optional): Distance measure to use.
+                                        Defaults to "cosine".
+            alpha (float, optional): Alpha value for Tversky index.
+                                     Defaults to 1.
+            beta (float, optional): Beta value for Tversky index.
+                                    Defaults to 1.
+
+        Raises:
+            TypeError: raised when input is not of same class type as
+                       examples in the model.
+            ValueError: raised when a subset has no training examples.
+
+        Returns:
+            List[np.ndarray]: indexes of the nearest training examples per
+                              subset, of shape (len(rows of the subset),
+                              min(k, training examples of the subset))
+        """
+        targets = np.asarray(self.targets)
+        allowed = [np.isin(targets, list(subset)) for subset in labels]
+        for i, mask in enumerate(allowed):
+            if not mask.any():
+                raise ValueError(f"Subset {i} has no training examples.")
+        if rows is None:
+            rows = [range(len(input))] * len(labels)
+        rows = [np.fromiter(subset_rows, dtype=np.int64)
+                for subset_rows in rows]
+        n = len(self.data)
+
+        # every input is ranked as deep as its smallest subset needs
+        depth = np.zeros(len(input), dtype=np.int64)
+        for mask, subset_rows in zip(allowed, rows):
+            size = np.count_nonzero(mask)
+            expected = min(n, math.ceil(DEPTH_MARGIN * k * n / size))
+            depth[subset_rows] = np.maximum(depth[subset_rows], expected)
+        ranked = self._rank(input, depth, measure, alpha, beta)
+
+        # inputs whose ranking holds too few examples of a subset
+        shallow = set()
+        for mask, subset_rows in zip(allowed, rows):
+            wanted = min(k, np.count_nonzero(mask))
+            shallow.update(row for row in subset_rows.tolist()
+                           if np.count_nonzero(mask[ranked[row]]) < wanted)
+        shallow = np.array(sorted(shallow), dtype=np.int64)
+        depth[:] = 0
+        depth[shallow] = n
+        ranked.update(self._rank(input, depth, measure, alpha, beta))
+
+        neighbours = []
+        for mask, subset_rows in zip(allowed, rows):
+            wanted = min(k, np.count_nonzero(mask))
+            subset = np.empty((len(subset_rows), wanted), dtype=np.int64)
+            for i, row in enumerate(subset_rows.tolist()):
+                subset[i] = ranked[row][mask[ranked[row]]][:wanted]
+            neighbours.append(subset)
+        return neighbours
+
+    def _rank(self,
+              input: List[Union[Vector, BOW]],
+              depth: np.ndarray,
+              measure,
+              alpha,
+              beta) -> Dict[int, np.ndarray]:
+        """Internal method that ranks every input to its own depth, with one
+        search per distinct depth. Inputs of depth 0 are skipped.
+
+        Returns:
+            Dict[int, np.ndarray]: ranked training examples per input
+        """
+        ranked = {}
+        for k in np.unique(depth[depth > 0]).tolist():
+            group = np.flatnonzero(depth == k).tolist()
+            ranking = self.neighbours([input[row] for row in group], k,
+                                      measure, alpha, beta)
+            ranked.update(zip(group, ranking))
+        return ranked
+
+    def predict_subsets(self,
+                        input: List[Union[Vector, BOW]],
+                        ks: List[int],
+                        labels: List[Iterable[int]],
+                        rows: List[Iterable[int]] = None,
+                        measure="cosine",
+                        alpha=1.0,
+                        beta=1.0) -> List[Dict[int, List[int]]]:
+        """Predict classification for a list of input examples within
+        several subsets of the labels for several numbers of nearest
+        neighbours, see neighbours_subsets and predict_many_k. The
+        predictions are the same as those of a classifier trained on only
+        the examples of a subset.
+
+        Args:
+            input (List[Union[Vector, BOW]]): input examples we want to
+                                              predict.
+            ks (List[int]): numbers of nearest neighbours to compare.
+            labels (List[Iterable[int]]): the labels of every subset.
+            rows (List[Iterable[int]], optional): the input examples to
+                                                  predict per subset. If
+                                                  None, all of them.
+                                                  Defaults to None.
+            measure (string, optional): Distance measure to use.
+                                        Defaults to "cosine".
+            alpha (float, optional): Alpha value for Tversky index.
+                                     Defaults to 1.
+            beta (float, optional): Beta value for Tversky index.
+                                    Defaults to 1.
+
+        Raises:
+            TypeError: raised when input is not of same class type as
+                       examples in the model.
+            ValueError: raised when a subset has no training examples.
+
+        Returns:
+            List[Dict[int, List[int]]]: list of predictions per k, per
+                                        subset
+        """
+        subsets = self.neighbours_subsets(input, max(ks), labels, rows,
+                                          measure, alpha, beta)
+        return [{k: self._vote(neighbours, k) for k in ks}
+                for neighbours in subsets]
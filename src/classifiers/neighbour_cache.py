@@ -0,0 +1,160 @@
+import hashlib
+import os
+from typing import Dict, List
+
+import numpy as np
+
+# changes whenever the ranking or the file format changes, so old cache
+# entries are not used anymore
+FORMAT_VERSION = 1
+# disk budget of a cache if none is given, 1 GiB
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def fingerprint(examples: List) -> str:
+    """Content hash of a list of BOWs, Vectors or SparseVectors. Equal
+    examples in the same order have the same fingerprint, whatever objects
+    hold them.
+
+    Args:
+        examples (List[Union[Vector, BOW]]): the examples
+
+    Returns:
+        string: hex digest of the examples
+    """
+    digest = hashlib.sha256()
+    for example in examples:
+        if hasattr(example, "rep"):
+            # terms of a set have no order, 0x1f separates them
+            digest.update(b"\x1f".join(term.encode()
+                                       for term in sorted(example.rep)))
+        elif hasattr(example, "indices"):
+            # sparse vectors are hashed without building their dense list
+            digest.update(f"sparse{example.dim};".encode())
+            digest.update(np.asarray(example.indices,
+                                     dtype=np.int64).tobytes())
+            digest.update(np.asarray(example.values,
+                                     dtype=np.float64).tobytes())
+        else:
+            digest.update(np.asarray(example.vector,
+                                     dtype=np.float64).tobytes())
+        # 0x1e separates the examples
+        digest.update(b"\x1e")
+    digest.update(str(len(examples)).encode())
+    return digest.hexdigest()
+
+
+class NeighbourCache():
+    """Cache of ranked nearest neighbours on disk.
+
+    Every entry holds the K nearest training examples of a list of queries
+    for one measure as a .npy file, which is memory-mapped when read. The
+    k < K nearest neighbours are the first k columns, so any k up to K is
+    served from the same entry. Entries are keyed by the fingerprints of
+    the training examples and the queries, the search backend and the
+    measure, so other data or parameters never hit an old entry.
+
+    The least recently used entries are removed once all entries together
+    take more than max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (string): directory holding the cache entries
+            max_bytes (int, optional): disk budget of all entries.
+                                       Defaults to DEFAULT_MAX_BYTES.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, training: str, queries: str, backend: str,
+            backend_options: Dict, measure, alpha, beta) -> str:
+        """Cache key of the neighbours of queries for one measure.
+
+        Args:
+            training (string): fingerprint of the training examples
+            queries (string): fingerprint of the queries
+            backend (string): name of the search backend
+            backend_options (Dict): keyword arguments of the backend
+            measure (string): Distance measure.
+            alpha (float): Alpha value for Tversky index.
+            beta (float): Beta value for Tversky index.
+
+        Returns:
+            string: the key
+        """
+        options = sorted((backend_options or {}).items())
+        parameters = (f"{training};{queries};{backend};{options};{measure};"
+                      f"{float(alpha)!r};{float(beta)!r};v{FORMAT_VERSION}")
+        return hashlib.sha256(parameters.encode()).hexdigest()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key, k: int) -> np.ndarray:
+        """Loads the k nearest neighbours of a cache entry.
+
+        Args:
+            key (string): key of the entry
+            k (int): number of nearest neighbours
+
+        Returns:
+            np.ndarray: read-only memory-mapped neighbours of shape
+                        (queries, min(k, K)) or None if not cached or the
+                        entry holds less than k neighbours per query
+        """
+        path = self._path(key)
+        try:
+            neighbours = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if neighbours.ndim != 2 or neighbours.shape[1] < k:
+            return None
+        # the modification time orders the entries by their last use
+        os.utime(path)
+        return neighbours[:, :k]
+
+    def put(self, key, neighbours: np.ndarray):
+        """Stores ranked neighbours in the cache and evicts the least
+        recently used entries above the disk budget.
+
+        Args:
+            key (string): key of the entry
+            neighbours (np.ndarray): neighbours of shape (queries, K)
+        """
+        # written to a temporary file first, so a crash never leaves a
+        # truncated entry behind
+        path = self._path(key)
+        with open(path + ".tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(neighbours))
+        os.replace(path + ".tmp", path)
+        self.evict()
+
+    def entries(self) -> List[os.DirEntry]:
+        """Entries of the cache, least recently used first.
+
+        Returns:
+            List[os.DirEntry]: the files of the entries
+        """
+        with os.scandir(self.directory) as files:
+            entries = [entry for entry in files
+                       if entry.name.endswith(".npy")]
+        return sorted(entries, key=lambda entry: entry.stat().st_mtime_ns)
+
+    def evict(self):
+        """Removes the least recently used entries until all entries fit
+        into the disk budget. Entries larger than the whole budget are not
+        kept.
+        """
+        entries = self.entries()
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:  # removed by another process
+                pass
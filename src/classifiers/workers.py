@@ -0,0 +1,182 @@
+import copy
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from classifiers.backends import search_neighbours_grid
+
+# search backend of a worker process, set once by init_worker
+_search = None
+
+
+def _is_instance(obj) -> bool:
+    """Whether obj is an instance with attributes that may hold arrays.
+    """
+    return (hasattr(obj, "__dict__") and not isinstance(obj, type)
+            and not callable(obj))
+
+
+class MappedArray():
+    """Reference to a numpy array saved as .npy file. Pickling it only
+    pickles the path, so the array itself is never copied into a worker.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): path to the .npy file
+        """
+        self.path = path
+
+    def load(self) -> np.ndarray:
+        """Memory-maps the array. Pages of the file are shared between all
+        processes mapping it.
+
+        Returns:
+            np.ndarray: read-only memory-mapped array
+        """
+        return np.load(self.path, mmap_mode="r")
+
+
+class SharedState():
+    """Moves the numpy arrays of a search backend into memory-mapped files,
+    so worker processes can attach the training data once instead of each
+    holding a private copy.
+
+    Every object attribute holding a numpy array (also nested, e.g. the
+    arrays of a CSR matrix) is replaced by a MappedArray. Everything else is
+    pickled as usual.
+    """
+
+    def __init__(self, search):
+        """
+        Args:
+            search: search backend, one of BACKENDS
+        """
+        self.directory = tempfile.mkdtemp(prefix="knn-")
+        self._n_arrays = 0
+        self.search = self._share(search)
+
+    def _share(self, obj):
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject or obj.size == 0:
+                return obj
+            path = os.path.join(self.directory, f"{self._n_arrays}.npy")
+            self._n_arrays += 1
+            np.save(path, obj)
+            return MappedArray(path)
+        if _is_instance(obj):
+            shared = copy.copy(obj)
+            for name, value in vars(obj).items():
+                shared.__dict__[name] = self._share(value)
+            return shared
+        return obj
+
+    def close(self):
+        """Removes the memory-mapped files.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def attach(obj):
+    """Replaces all MappedArrays of an unpickled SharedState.search by the
+    memory-mapped arrays, in place.
+
+    Args:
+        obj: the shared search backend or one of its attributes
+
+    Returns:
+        the object with attached arrays
+    """
+    if isinstance(obj, MappedArray):
+        return obj.load()
+    if _is_instance(obj):
+        for name, value in vars(obj).items():
+            obj.__dict__[name] = attach(value)
+    return obj
+
+
+def init_worker(search):
+    """Initializer of a worker process, attaches the training data once.
+
+    Args:
+        search: the shared search backend, see SharedState
+    """
+    global _search
+    _search = attach(search)
+
+
+def cost(example) -> int:
+    """Estimated cost of searching the neighbours of an example: the size of
+    a BOW or the number of non-zero entries of a vector.
+
+    Args:
+        example (Union[Vector, BOW]): the example
+
+    Returns:
+        int: the cost estimate, at least 1
+    """
+    if hasattr(example, "rep"):
+        return max(len(example.rep), 1)
+    return max(example.nnz, 1)
+
+
+def split_by_cost(costs: List[int], n_chunks: int) -> List[Tuple[int, int]]:
+    """Splits a sequence into consecutive chunks of about equal total cost.
+
+    Args:
+        costs (List[int]): cost per element
+        n_chunks (int): number of chunks to aim for
+
+    Returns:
+        List[Tuple[int, int]]: start and end index of every chunk
+    """
+    # a chunk ends after the element its cumulative cost reaches the
+    # next multiple of total / n_chunks
+    cumulative = np.cumsum(costs)
+    if len(cumulative) == 0:
+        return []
+    targets = cumulative[-1] * np.arange(1, n_chunks) / n_chunks
+    ends = np.unique(np.append(np.searchsorted(cumulative, targets) + 1,
+                               len(costs)))
+    starts = np.append(0, ends[:-1])
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
+
+
+def pruning(search) -> Tuple[int, int]:
+    """Pairs of queries and training examples a backend compared so far and
+    how many of them it scored. Backends that score all pairs do not count
+    them.
+
+    Args:
+        search: search backend, one of BACKENDS
+
+    Returns:
+        Tuple[int, int]: compared and scored pairs
+    """
+    return getattr(search, "pairs", 0), getattr(search, "scored", 0)
+
+
+def worker_neighbours(input, k, measures, block_size):
+    """Ranks the nearest training examples of the input for some measures
+    in a worker process, see backends.search_neighbours_grid.
+
+    Returns:
+        np.ndarray, dict: indexes of the nearest training examples and
+                          timing and pruning stats of the worker for this
+                          chunk
+    """
+    start = time.perf_counter()
+    pairs, scored = pruning(_search)
+    neighbours = search_neighbours_grid(_search, input, k, measures,
+                                        block_size)
+    stats = {"pid": os.getpid(),
+             "examples": len(input),
+             "seconds": time.perf_counter() - start,
+             "pairs": pruning(_search)[0] - pairs,
+             "scored": pruning(_search)[1] - scored}
+    return neighbours, stats
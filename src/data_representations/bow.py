@@ -1,5 +1,144 @@
 import typing
 
+import numpy as np
+
+
+def similarity_from_counts(intersection, size_self, size_other,
+                           measure="tversky", alpha=1, beta=1):
+    """Vectorised version of BOW.similarity working on set sizes only.
+
+    All measures only depend on |A intersection B|, |A| and |B|, since
+    |A-B| = |A| - |A intersection B|. The arguments are broadcast against
+    each other, so a whole query x corpus matrix can be scored at once.
+    The scores are identical to the ones of BOW.similarity.
+
+    Args:
+        intersection (np.ndarray): |A intersection B| per pair
+        size_self (np.ndarray): |A| per pair
+        size_other (np.ndarray): |B| per pair
+        measure (str, optional): Defaults to "tversky".
+        alpha (int, optional): Defaults to 1.
+        beta (int, optional): Defaults to 1.
+
+    Raises:
+        KeyError: raised for unknown measures, as by BOW.similarity
+
+    Returns:
+        np.ndarray: the similarity scores
+    """
+    intersection = np.asarray(intersection, dtype=np.float64)
+    size_self = np.asarray(size_self, dtype=np.float64)
+    size_other = np.asarray(size_other, dtype=np.float64)
+
+    if measure == "jaccard":
+        measure, alpha, beta = "tversky", 1, 1
+    elif measure == "dsc":
+        measure, alpha, beta = "tversky", 0.5, 0.5
+
+    if measure == "tversky":
+        n = (intersection +
+             np.abs(alpha*(size_self - intersection)) +
+             np.abs(beta*(size_other - intersection)))
+    elif measure == "overlap":
+        n = np.minimum(size_self, size_other)
+    elif measure == "naive":
+        # maximum similarity if no element in the intersection
+        n = np.broadcast_to(intersection, np.broadcast_shapes(
+            intersection.shape, size_self.shape, size_other.shape))
+        return np.divide(1, n, out=np.ones(n.shape), where=n != 0)
+    else:
+        raise KeyError(measure)
+
+    # n == 0 means both BOWs are empty -> minimum similarity
+    n, intersection = np.broadcast_arrays(n, intersection)
+    return np.divide(intersection, n, out=np.zeros(n.shape), where=n != 0)
+
+
+def count_similarity(intersection: int, size_self: int, size_other: int,
+                     measure="tversky", alpha=1, beta=1) -> float:
+    """Similarity of one pair from its set sizes, with the same arithmetic
+    as BOW.similarity, see similarity_from_counts for whole arrays.
+
+    Args:
+        intersection (int): |A intersection B|
+        size_self (int): |A|
+        size_other (int): |B|
+        measure (str, optional): Defaults to "tversky".
+        alpha (int, optional): Defaults to 1.
+        beta (int, optional): Defaults to 1.
+
+    Raises:
+        KeyError: raised for unknown measures, as by BOW.similarity
+
+    Returns:
+        float: the similarity score
+    """
+    if measure == "jaccard":
+        measure, alpha, beta = "tversky", 1, 1
+    elif measure == "dsc":
+        measure, alpha, beta = "tversky", 0.5, 0.5
+
+    if measure == "naive":
+        # maximum similarity if no element in the intersection
+        return 1 if intersection == 0 else 1 / intersection
+    if measure == "overlap":
+        n = min(size_self, size_other)
+    elif measure == "tversky":
+        n = (intersection +
+             abs(alpha * (size_self - intersection)) +
+             abs(beta * (size_other - intersection)))
+    else:
+        raise KeyError(measure)
+    if n == 0:  # both BOWs are empty
+        return 0
+    return intersection / n
+
+
+def measure_grid(measures) -> typing.List[typing.Tuple[str, float, float]]:
+    """Normalizes a list of measures into (measure, alpha, beta) triples.
+
+    Args:
+        measures (List[Union[str, Tuple[str, float, float]]]): measure names,
+            which use alpha=beta=1, or (measure, alpha, beta) triples
+
+    Returns:
+        List[Tuple[str, float, float]]: measure, alpha and beta per measure
+    """
+    return [(measure, 1, 1) if isinstance(measure, str) else tuple(measure)
+            for measure in measures]
+
+
+def similarities_from_counts(intersection, size_self, size_other,
+                             measures) -> np.ndarray:
+    """Scores of several measures from the same set sizes, see
+    similarity_from_counts.
+
+    Args:
+        intersection (np.ndarray): |A intersection B| per pair
+        size_self (np.ndarray): |A| per pair
+        size_other (np.ndarray): |B| per pair
+        measures (List[Union[str, Tuple[str, float, float]]]): measure
+            names or (measure, alpha, beta) triples, see measure_grid
+
+    Raises:
+        KeyError: raised for unknown measures
+
+    Returns:
+        np.ndarray: the similarity scores per measure, of shape
+                    (len(measures),) + broadcast shape of the sizes
+    """
+    intersection = np.asarray(intersection, dtype=np.float64)
+    size_self = np.asarray(size_self, dtype=np.float64)
+    size_other = np.asarray(size_other, dtype=np.float64)
+    shape = np.broadcast_shapes(intersection.shape, size_self.shape,
+                                size_other.shape)
+    scores = np.empty((len(measures),) + shape)
+    for i, (measure, alpha, beta) in enumerate(measure_grid(measures)):
+        scores[i] = similarity_from_counts(intersection, size_self,
+                                           size_other, measure=measure,
+                                           alpha=alpha, beta=beta)
+    return scores
+
 
 class BOW():
     """Bag of word class represented by sets
@@ -19,6 +158,9 @@ class BOW():
         Args:
             other (BOW): the other bag of words to compare against
 
+        Raises:
+            KeyError: raised for unknown measures
+
         Returns:
             float: the similarity score within [0,1],
                    the higher, the more similar
@@ -35,6 +177,27 @@ class BOW():
         else:
             return measures[measure](other)
 
+    def similarities(self, other, measures) -> typing.List[float]:
+        """Similarities between two BOWs for several measures at once. The
+        intersection is only computed once.
+
+        Args:
+            other (BOW): the other bag of words to compare against
+            measures (List[Union[str, Tuple[str, float, float]]]): measure
+                names or (measure, alpha, beta) triples, see measure_grid
+
+        Raises:
+            KeyError: raised for unknown measures
+
+        Returns:
+            List[float]: the similarity score per measure, the same as the
+                         one of similarity
+        """
+        counts = (len(self.rep.intersection(other.rep)), len(self.rep),
+                  len(other.rep))
+        return [count_similarity(*counts, measure, alpha, beta)
+                for measure, alpha, beta in measure_grid(measures)]
+
     def distance(self, other, measure="tversky", alpha=1, beta=1):
         """The distance between two BOWs.
 
@@ -0,0 +1,180 @@
+from collections import Counter
+from itertools import chain
+from typing import Iterable
+
+import numpy as np
+
+from bow import BOW, similarity_from_counts
+from vocabulary import Vocabulary
+
+# booleans unpacked at once while packing the bitsets, bounds the memory
+BITS_PER_CHUNK = 1 << 26
+# intersection counts of a tile in intersection, small enough to stay in
+# the cache while all words are combined into it
+COUNTS_PER_TILE = 1 << 20
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Number of set bits of every uint64 word.
+
+    Uses np.bitwise_count if the numpy version has it, otherwise sums up
+    the bits of pairs, nibbles and bytes in parallel within every word.
+
+    Args:
+        words (np.ndarray): uint64 words of any shape
+
+    Returns:
+        np.ndarray: set bits per word, of the same shape
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    # bit counts of the 2 bit pairs, then nibbles, then bytes, in place
+    counts = words - ((words >> np.uint64(1)) &
+                      np.uint64(0x5555555555555555))
+    pairs = counts >> np.uint64(2)
+    pairs &= np.uint64(0x3333333333333333)
+    counts &= np.uint64(0x3333333333333333)
+    counts += pairs
+    counts += counts >> np.uint64(4)
+    counts &= np.uint64(0x0F0F0F0F0F0F0F0F)
+    # the sum of all bytes ends up in the highest byte
+    counts *= np.uint64(0x0101010101010101)
+    counts >>= np.uint64(56)
+    return counts
+
+
+class BOWBitset():
+    """Bags of words of a whole corpus as packed bitsets, one column of
+    uint64 words per document with bit t of a column set if it contains
+    term t. The words are stored word-major, so word w of all documents is
+    one contiguous row.
+
+    Intersection sizes of two corpora are the popcounts of the AND of their
+    columns. All documents of one corpus are combined with a tile of the
+    other's documents at once, word by word, and only the documents with
+    any bit set in a word are combined for it.
+    The exact set sizes are stored separately, so terms missing from the
+    vocabulary, e.g. one pruned to the most frequent terms, still count for
+    |A-B| and |B-A|.
+    """
+
+    def __init__(self, bows: Iterable[BOW], vocabulary: Vocabulary = None,
+                 max_terms: int = None):
+        """
+        Args:
+            bows (Iterable[BOW]): bags of words, one per column
+            vocabulary (Vocabulary, optional): vocabulary to use for the
+                                               bits. Terms not in the
+                                               vocabulary are dropped from
+                                               the bitsets, but still count
+                                               for the set sizes. If None,
+                                               one is built from bows.
+                                               Defaults to None.
+            max_terms (int, optional): if the vocabulary is built from bows,
+                                       only keep the terms of the max_terms
+                                       highest document frequencies. If
+                                       None, all terms. Defaults to None.
+        """
+        bows = [bow.rep for bow in bows]
+        if vocabulary is None:
+            # the most frequent terms are in the first words
+            document_freq = Counter(chain.from_iterable(bows))
+            vocabulary = Vocabulary(term for term, _ in
+                                    document_freq.most_common(max_terms))
+        self.vocabulary = vocabulary
+
+        n_words = max((len(vocabulary) + 63) // 64, 1)
+        self.bits = np.zeros((n_words, len(bows)), dtype=np.uint64)
+        chunk_size = max(BITS_PER_CHUNK // (64 * n_words), 1)
+        for start in range(0, len(bows), chunk_size):
+            chunk = bows[start:start + chunk_size]
+            ids = [vocabulary.lookup(bow) for bow in chunk]
+            members = np.zeros((len(chunk), 64 * n_words), dtype=bool)
+            members[np.repeat(np.arange(len(chunk)),
+                              [len(row) for row in ids]),
+                    np.concatenate(ids + [np.zeros(0, dtype=np.int64)])] = 1
+            # bit t % 64 of word t // 64 of every document
+            self.bits[:, start:start + chunk_size] = np.packbits(
+                members, axis=1, bitorder="little").view("<u8").T
+        # exact set sizes, including terms missing from the vocabulary
+        self.sizes = np.array([len(bow) for bow in bows], dtype=np.int64)
+
+    @classmethod
+    def _from_parts(cls, bits, sizes, vocabulary):
+        new = cls.__new__(cls)
+        new.bits, new.sizes, new.vocabulary = bits, sizes, vocabulary
+        return new
+
+    def intersection(self, other) -> np.ndarray:
+        """Intersection sizes for all pairs of documents.
+
+        Args:
+            other (BOWBitset): bags of words sharing the same vocabulary
+
+        Raises:
+            ValueError: raised when the vocabularies are not the same
+
+        Returns:
+            np.ndarray: |A intersection B| of shape (len(self), len(other))
+        """
+        if self.vocabulary is not other.vocabulary:
+            raise ValueError("BOWBitsets do not share the same vocabulary")
+        # intersections are at most the number of bits
+        counts = np.uint16 if 64 * len(self.bits) < 1 << 16 else np.uint32
+        # per word the documents with any bit in it, the others add nothing
+        rows = [np.flatnonzero(word) for word in self.bits]
+        dense = [2 * len(word_rows) > len(self) for word_rows in rows]
+
+        intersections = np.empty((len(self), len(other)), dtype=np.int64)
+        tile_size = max(COUNTS_PER_TILE // max(len(self), 1), 1)
+        for start in range(0, len(other), tile_size):
+            # the counts of a tile of other's documents stay in the cache
+            # while all words are combined
+            tile = np.zeros((len(self), min(tile_size, len(other) - start)),
+                            dtype=counts)
+            for w, word in enumerate(self.bits):
+                other_word = other.bits[w, None, start:start + tile_size]
+                if dense[w]:
+                    tile += popcount(word[:, None] & other_word)
+                elif len(rows[w]):
+                    tile[rows[w]] += popcount(word[rows[w], None] &
+                                              other_word)
+            intersections[:, start:start + tile_size] = tile
+        return intersections
+
+    def similarity(self, other, measure="tversky", alpha=1, beta=1):
+        """Similarity between all pairs of documents, see BOW.similarity.
+
+        Args:
+            other (BOWBitset): bags of words sharing the same vocabulary
+
+        Returns:
+            np.ndarray: similarity scores of shape (len(self), len(other))
+        """
+        return similarity_from_counts(self.intersection(other),
+                                      self.sizes[:, None],
+                                      other.sizes[None, :],
+                                      measure=measure,
+                                      alpha=alpha,
+                                      beta=beta)
+
+    def distance(self, other, measure="tversky", alpha=1, beta=1):
+        """Distance between all pairs of documents, see BOW.distance.
+
+        Args:
+            other (BOWBitset): bags of words sharing the same vocabulary
+
+        Returns:
+            np.ndarray: distance scores of shape (len(self), len(other))
+        """
+        return 1 - self.similarity(other, measure=measure,
+                                   alpha=alpha, beta=beta)
+
+    def __getitem__(self, rows):
+        if isinstance(rows, int):
+            rows = slice(rows, rows + 1 if rows != -1 else None)
+        return self._from_parts(self.bits[:, rows], self.sizes[rows],
+                                self.vocabulary)
+
+    def __len__(self):
+        return self.bits.shape[1]
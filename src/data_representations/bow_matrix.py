@@ -0,0 +1,172 @@
+from typing import Iterable
+
+import numpy as np
+from scipy import sparse
+
+from bow import BOW, similarities_from_counts, similarity_from_counts
+from vocabulary import Vocabulary
+
+
+class BOWMatrix():
+    """Bags of words of a whole corpus as one binary CSR matrix.
+
+    Rows are documents, columns are the term ids of a (possibly shared)
+    vocabulary. Intersection sizes of two corpora are the sparse matrix
+    product X * Y^T, so all pairwise similarities are computed at once.
+    """
+
+    def __init__(self, bows: Iterable[BOW], vocabulary: Vocabulary = None):
+        """
+        Args:
+            bows (Iterable[BOW]): bags of words, one per row
+            vocabulary (Vocabulary, optional): vocabulary to use for the
+                                               columns. Terms not in a given
+                                               vocabulary are dropped from
+                                               the matrix, but still count
+                                               for the set sizes. If None, a
+                                               new one is built from bows.
+                                               Defaults to None.
+        """
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+            to_ids = vocabulary.intern
+        else:
+            to_ids = vocabulary.lookup
+        self.vocabulary = vocabulary
+
+        # bows are only iterated once, so they can also be streamed
+        rows, sizes = [], []
+        for bow in bows:
+            rows.append(to_ids(bow.rep))
+            sizes.append(len(bow.rep))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=indptr[1:])
+        indices = (np.concatenate(rows) if rows
+                   else np.zeros(0, dtype=np.int64))
+        self.matrix = sparse.csr_matrix((np.ones(len(indices),
+                                                 dtype=np.int32),
+                                         indices, indptr),
+                                        shape=(len(rows), len(vocabulary)))
+        # exact set sizes, including terms unknown to the vocabulary
+        self.sizes = np.array(sizes, dtype=np.int64)
+
+    @classmethod
+    def _from_parts(cls, matrix, sizes, vocabulary):
+        new = cls.__new__(cls)
+        new.matrix, new.sizes, new.vocabulary = matrix, sizes, vocabulary
+        return new
+
+    def _aligned(self, other):
+        """Both matrices with the columns of the current vocabulary.
+
+        Raises:
+            ValueError: raised when the vocabularies are not the same
+        """
+        if self.vocabulary is not other.vocabulary:
+            raise ValueError("BOWMatrices do not share the same vocabulary")
+
+        # the vocabulary might have grown after one of the matrices was built
+        n_terms = len(self.vocabulary)
+        this, that = self.matrix, other.matrix
+        if this.shape[1] != n_terms:
+            this = sparse.csr_matrix((this.data, this.indices, this.indptr),
+                                     shape=(this.shape[0], n_terms))
+        if that.shape[1] != n_terms:
+            that = sparse.csr_matrix((that.data, that.indices, that.indptr),
+                                     shape=(that.shape[0], n_terms))
+        return this, that
+
+    def intersection(self, other) -> np.ndarray:
+        """Intersection sizes for all pairs of rows.
+
+        Args:
+            other (BOWMatrix): bags of words sharing the same vocabulary
+
+        Raises:
+            ValueError: raised when the vocabularies are not the same
+
+        Returns:
+            np.ndarray: |A intersection B| of shape (len(self), len(other))
+        """
+        this, that = self._aligned(other)
+        return (this @ that.T).toarray()
+
+    def pair_intersection(self, other, rows: np.ndarray,
+                          other_rows: np.ndarray) -> np.ndarray:
+        """Intersection sizes for selected pairs of rows only.
+
+        Args:
+            other (BOWMatrix): bags of words sharing the same vocabulary
+            rows (np.ndarray): row of self per pair
+            other_rows (np.ndarray): row of other per pair
+
+        Raises:
+            ValueError: raised when the vocabularies are not the same
+
+        Returns:
+            np.ndarray: |A intersection B| per pair
+        """
+        this, that = self._aligned(other)
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # elementwise product of the binary rows is their intersection
+        return np.asarray(this[rows].multiply(that[other_rows]).sum(axis=1),
+                          dtype=np.int64).ravel()
+
+    def similarity(self, other, measure="tversky", alpha=1, beta=1):
+        """Similarity between all pairs of rows, see BOW.similarity.
+
+        Args:
+            other (BOWMatrix): bags of words sharing the same vocabulary
+
+        Returns:
+            np.ndarray: similarity scores of shape (len(self), len(other))
+        """
+        return similarity_from_counts(self.intersection(other),
+                                      self.sizes[:, None],
+                                      other.sizes[None, :],
+                                      measure=measure,
+                                      alpha=alpha,
+                                      beta=beta)
+
+    def similarities(self, other, measures) -> np.ndarray:
+        """Similarities between all pairs of rows for several measures, see
+        BOW.similarities. The intersections are only computed once.
+
+        Args:
+            other (BOWMatrix): bags of words sharing the same vocabulary
+            measures (List[Union[str, Tuple[str, float, float]]]): measure
+                names or (measure, alpha, beta) triples
+
+        Raises:
+            KeyError: raised for unknown measures
+
+        Returns:
+            np.ndarray: similarity scores of shape
+                        (len(measures), len(self), len(other))
+        """
+        return similarities_from_counts(self.intersection(other),
+                                        self.sizes[:, None],
+                                        other.sizes[None, :],
+                                        measures)
+
+    def distance(self, other, measure="tversky", alpha=1, beta=1):
+        """Distance between all pairs of rows, see BOW.distance.
+
+        Args:
+            other (BOWMatrix): bags of words sharing the same vocabulary
+
+        Returns:
+            np.ndarray: distance scores of shape (len(self), len(other))
+        """
+        return 1 - self.similarity(other, measure=measure,
+                                   alpha=alpha, beta=beta)
+
+    def __getitem__(self, rows):
+        if isinstance(rows, int):
+            rows = slice(rows, rows + 1 if rows != -1 else None)
+        return self._from_parts(self.matrix[rows], self.sizes[rows],
+                                self.vocabulary)
+
+    def __len__(self):
+        return self.matrix.shape[0]
@@ -0,0 +1,146 @@
+import typing
+
+import numpy as np
+
+from bow import count_similarity
+from vocabulary import Vocabulary
+
+
+def _shared_vocabulary(terms: typing.List[str]) -> Vocabulary:
+    """Unpickles SHARED_VOCABULARY as the one of the current process,
+    extended by the terms it does not know yet. CompactBOWs sent to other
+    processes, e.g. multiprocess Knn workers, thus still share it.
+
+    Raises:
+        ValueError: raised when the processes interned different terms
+                    under the same ids
+    """
+    vocabulary = SHARED_VOCABULARY
+    common = min(len(vocabulary), len(terms))
+    if vocabulary.terms[:common] != terms[:common]:
+        raise ValueError("The shared vocabularies of the processes "
+                         "diverged.")
+    for term in terms[common:]:
+        vocabulary.add(term)
+    return vocabulary
+
+
+class _SharedVocabulary(Vocabulary):
+    """Vocabulary that unpickles as SHARED_VOCABULARY, see
+    _shared_vocabulary.
+    """
+
+    def __reduce__(self):
+        return _shared_vocabulary, (self.terms,)
+
+
+# interner shared by all CompactBOWs built without their own vocabulary, so
+# every distinct term is stored once for all of them
+SHARED_VOCABULARY = _SharedVocabulary()
+
+
+def intersection_size(ids: np.ndarray, other_ids: np.ndarray) -> int:
+    """Number of common elements of two sorted arrays of distinct ids.
+
+    Every id of the smaller array is looked up by binary search in the
+    larger one, which takes O(small * log(large)) steps and beats a merge
+    of both arrays if their sizes differ a lot.
+
+    Args:
+        ids (np.ndarray): sorted distinct ids
+        other_ids (np.ndarray): sorted distinct ids
+
+    Returns:
+        int: |ids intersection other_ids|
+    """
+    if len(ids) > len(other_ids):
+        ids, other_ids = other_ids, ids
+    if len(ids) == 0:
+        return 0
+    positions = np.searchsorted(other_ids, ids)
+    return int(np.count_nonzero(other_ids.take(positions, mode="clip") ==
+                                ids))
+
+
+class CompactBOW():
+    """Bag of words represented by the sorted uint32 ids of its terms in a
+    shared vocabulary.
+
+    Compared to the set of strings of a BOW, every distinct term is only
+    stored once in the vocabulary and the bag itself only holds 4 bytes per
+    term. The similarities are the same as the ones of BOW.
+    """
+    __slots__ = ("ids", "vocabulary")
+
+    def __init__(self, text: typing.List[typing.AnyStr],
+                 vocabulary: Vocabulary = None):
+        """
+        Args:
+            text (typing.List[typing.AnyStr]): the tokens
+            vocabulary (Vocabulary, optional): vocabulary interning the
+                                               terms. If None, the shared
+                                               SHARED_VOCABULARY.
+                                               Defaults to None.
+        """
+        self.vocabulary = (SHARED_VOCABULARY if vocabulary is None
+                           else vocabulary)
+        self.ids = np.sort(self.vocabulary.intern(set(text)).astype(
+            np.uint32))
+
+    @property
+    def rep(self) -> typing.Set[str]:
+        """The terms as a set, as in BOW.
+        """
+        terms = self.vocabulary.terms
+        return {terms[term_id] for term_id in self.ids.tolist()}
+
+    def intersection_size(self, other) -> int:
+        """Number of terms in both bags of words.
+
+        Args:
+            other (CompactBOW): bag of words of the same vocabulary
+
+        Raises:
+            ValueError: raised when the vocabularies are not the same
+
+        Returns:
+            int: |A intersection B|
+        """
+        if self.vocabulary is not other.vocabulary:
+            raise ValueError("CompactBOWs do not share the same vocabulary")
+        return intersection_size(self.ids, other.ids)
+
+    def similarity(self, other, measure="tversky", alpha=1, beta=1):
+        """Similarity between two bags of words, see BOW.similarity.
+
+        Args:
+            other (CompactBOW): the other bag of words to compare against
+
+        Raises:
+            KeyError: raised for unknown measures
+
+        Returns:
+            float: the similarity score within [0,1],
+                   the higher, the more similar
+        """
+        return count_similarity(self.intersection_size(other),
+                                len(self.ids), len(other.ids),
+                                measure=measure, alpha=alpha, beta=beta)
+
+    def distance(self, other, measure="tversky", alpha=1, beta=1):
+        """The distance between two bags of words.
+
+        Args:
+            other (CompactBOW): the other bag of words to compare against
+
+        Returns:
+            float: the distance score within [0,1], the lower, the nearer
+        """
+        return 1 - self.similarity(other, measure=measure,
+                                   alpha=alpha, beta=beta)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return str(self.rep)
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import numpy as np
+from scipy import sparse
+
+# training points per cluster used by kmeans, more do not improve the
+# centroids noticeably
+POINTS_PER_CLUSTER = 256
+# rows whose distances to all centroids are computed at once
+BLOCK_SIZE = 4096
+
+
+def _squared_distances(data: np.ndarray, centroids: np.ndarray,
+                       centroid_norms: np.ndarray) -> np.ndarray:
+    """Squared euclidean distances up to the constant |x|^2 per row, which
+    does not change the nearest centroid.
+    """
+    return centroid_norms[None, :] - 2 * (data @ centroids.T)
+
+
+def assign(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every row.
+
+    Args:
+        data (np.ndarray): rows of shape (n, dim)
+        centroids (np.ndarray): centroids of shape (k, dim)
+
+    Returns:
+        np.ndarray: index of the nearest centroid per row
+    """
+    centroid_norms = np.square(centroids).sum(axis=1)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), BLOCK_SIZE):
+        block = data[start:start + BLOCK_SIZE]
+        labels[start:start + BLOCK_SIZE] = np.argmin(
+            _squared_distances(block, centroids, centroid_norms), axis=1)
+    return labels
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter=20,
+           seed=0) -> np.ndarray:
+    """Lloyd's k-means on a random sample of at most POINTS_PER_CLUSTER
+    rows per cluster. Empty clusters are restarted at random rows.
+
+    Args:
+        data (np.ndarray): rows of shape (n, dim)
+        n_clusters (int): number of clusters, at most n
+        n_iter (int, optional): number of iterations. Defaults to 20.
+        seed (int, optional): seed of the sample and initialisation.
+                              Defaults to 0.
+
+    Returns:
+        np.ndarray: float32 centroids of shape (n_clusters, dim)
+    """
+    rng = np.random.default_rng(seed)
+    n_sample = min(len(data), POINTS_PER_CLUSTER * n_clusters)
+    sample = data[np.sort(rng.choice(len(data), n_sample, replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(n_sample, n_clusters, replace=False)]
+
+    for _ in range(n_iter):
+        labels = assign(sample, centroids)
+        # sums of the rows per cluster with one sparse product
+        members = sparse.csr_matrix((np.ones(n_sample, dtype=np.float32),
+                                     (labels, np.arange(n_sample))),
+                                    shape=(n_clusters, n_sample))
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.asarray(members @ sample)
+        empty = counts == 0
+        centroids = np.where(empty[:, None],
+                             sample[rng.choice(n_sample, n_clusters)],
+                             sums / np.maximum(counts, 1)[:, None])
+        centroids = centroids.astype(np.float32)
+    return centroids
+
+
+class ProductQuantizer():
+    """Compresses vectors into one byte per subspace: the vectors are split
+    into n_subspaces parts, each encoded by the index of its nearest
+    k-means centroid. Squared distances of a query to encoded vectors are
+    looked up in one table per query and subspace.
+    """
+
+    def __init__(self, data: np.ndarray, n_subspaces: int, seed=0):
+        """
+        Args:
+            data (np.ndarray): training rows of shape (n, dim)
+            n_subspaces (int): number of subspaces, has to divide dim
+            seed (int, optional): seed of k-means. Defaults to 0.
+
+        Raises:
+            ValueError: raised when n_subspaces does not divide dim
+        """
+        dim = data.shape[1]
+        if dim % n_subspaces:
+            raise ValueError(f"{n_subspaces} subspaces do not divide "
+                             f"{dim} dimensions.")
+        n_centroids = min(256, len(data))
+        self.codebooks = np.stack([kmeans(part, n_centroids, seed=seed)
+                                   for part in self._split(data,
+                                                           n_subspaces)])
+
+    @staticmethod
+    def _split(data: np.ndarray, n_subspaces: int):
+        return np.split(np.asarray(data, dtype=np.float32), n_subspaces,
+                        axis=1)
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        """Codes of the rows.
+
+        Args:
+            data (np.ndarray): rows of shape (n, dim)
+
+        Returns:
+            np.ndarray: uint8 codes of shape (n_subspaces, n), so the codes
+                        of one subspace are contiguous
+        """
+        parts = self._split(data, len(self.codebooks))
+        return np.stack([assign(part, codebook)
+                         for part, codebook in zip(parts,
+                                                   self.codebooks)]
+                        ).astype(np.uint8)
+
+    def tables(self, queries: np.ndarray) -> np.ndarray:
+        """Squared distances of every query part to every centroid of its
+        subspace.
+
+        Args:
+            queries (np.ndarray): rows of shape (q, dim)
+
+        Returns:
+            np.ndarray: tables of shape (q, n_subspaces, centroids)
+        """
+        parts = self._split(queries, len(self.codebooks))
+        return np.stack([np.square(part).sum(axis=1)[:, None] +
+                         _squared_distances(part, codebook,
+                                            np.square(codebook).sum(axis=1))
+                         for part, codebook in zip(parts, self.codebooks)],
+                        axis=1)
+
+
+class IVFIndex():
+    """Inverted file index over dense vectors.
+
+    The vectors are clustered with k-means, every cluster is a list of the
+    vectors nearest to its centroid. A query is only compared with the
+    vectors of the nprobe lists whose centroids are nearest to it. With
+    product quantization, the vectors of those lists are ranked by their
+    approximate distances first and only the best are returned.
+
+    For the cosine metric, the index is built over the normalized vectors,
+    whose euclidean distances rank like the cosine distances.
+    """
+
+    def __init__(self, data: np.ndarray, n_lists: int, metric="cosine",
+                 n_subspaces: int = None, n_iter=20, seed=0):
+        """
+        Args:
+            data (np.ndarray): vectors of shape (n, dim)
+            n_lists (int): number of lists, at most n
+            metric (str, optional): "cosine" or "euclidean".
+                                    Defaults to "cosine".
+            n_subspaces (int, optional): number of product quantization
+                                         subspaces. If None, the vectors
+                                         are not quantized.
+                                         Defaults to None.
+            n_iter (int, optional): k-means iterations. Defaults to 20.
+            seed (int, optional): seed of k-means. Defaults to 0.
+
+        Raises:
+            NotImplementedError: raised for unknown metrics
+        """
+        if metric not in ("cosine", "euclidean"):
+            raise NotImplementedError(f"{metric} not implemented (yet).")
+        self.metric = metric
+        data = self.prepare(data)
+
+        self.centroids = kmeans(data, n_lists, n_iter=n_iter, seed=seed)
+        labels = assign(data, self.centroids)
+        # the vectors of list l are members[offsets[l]:offsets[l+1]]
+        self.members = np.argsort(labels, kind="stable")
+        self.offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists),
+                  out=self.offsets[1:])
+
+        self.pq, self.codes = None, None
+        if n_subspaces:
+            self.pq = ProductQuantizer(data, n_subspaces, seed=seed)
+            self.codes = self.pq.encode(data)
+
+    def prepare(self, data: np.ndarray) -> np.ndarray:
+        """Vectors as float32, normalized for the cosine metric.
+        """
+        data = np.asarray(data, dtype=np.float32)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(data, axis=1, keepdims=True)
+            data = np.divide(data, norms, out=np.zeros_like(data),
+                             where=norms != 0)
+        return data
+
+    def probe(self, queries: np.ndarray, nprobe: int) -> np.ndarray:
+        """Lists nearest to the queries.
+
+        Args:
+            queries (np.ndarray): prepared queries of shape (q, dim)
+            nprobe (int): number of lists per query
+
+        Returns:
+            np.ndarray: list indexes of shape (q, min(nprobe, n_lists))
+        """
+        nprobe = min(nprobe, len(self.centroids))
+        distances = _squared_distances(queries, self.centroids,
+                                       np.square(self.centroids).sum(axis=1))
+        return np.argpartition(distances, nprobe - 1, axis=1)[:, :nprobe]
+
+    def list_members(self, list_id: int) -> np.ndarray:
+        """Indexed vectors of a list.
+
+        Args:
+            list_id (int): the list
+
+        Returns:
+            np.ndarray: indexes of the vectors of the list
+        """
+        return self.members[self.offsets[list_id]:self.offsets[list_id + 1]]
+
+    def _expand(self, lists: np.ndarray):
+        """Pairs of queries and the members of their lists, all lists of
+        all queries expanded at once.
+        """
+        starts, ends = self.offsets[lists], self.offsets[lists + 1]
+        sizes = (ends - starts).ravel()
+        first = np.cumsum(sizes) - sizes
+        positions = (np.repeat(starts.ravel() - first, sizes) +
+                     np.arange(sizes.sum()))
+        rows = np.repeat(np.arange(len(lists)), (ends - starts).sum(axis=1))
+        return rows, self.members[positions]
+
+    def candidates(self, queries: np.ndarray, nprobe: int,
+                   max_candidates: int = None):
+        """Pairs of queries and the indexed vectors in their nearest lists.
+
+        Args:
+            queries (np.ndarray): queries of shape (q, dim)
+            nprobe (int): number of lists per query
+            max_candidates (int, optional): with product quantization, only
+                                            the candidates of the smallest
+                                            approximate distances are kept
+                                            per query. Defaults to None.
+
+        Returns:
+            np.ndarray, np.ndarray: query and indexed vector of every
+                                    candidate pair
+        """
+        queries = self.prepare(queries)
+        lists = self.probe(queries, nprobe)
+        rows, examples = self._expand(lists)
+
+        if self.pq is None or max_candidates is None:
+            return rows, examples
+        # approximate squared distances summed up over the subspaces, as
+        # lookups in the flattened tables
+        tables = self.pq.tables(queries)
+        n_subspaces, n_centroids = tables.shape[1:]
+        flat = tables.ravel()
+        base = rows * (n_subspaces * n_centroids)
+        approximate = np.zeros(len(rows), dtype=np.float32)
+        for subspace, codes in enumerate(self.codes):
+            base += n_centroids if subspace else 0
+            approximate += flat.take(base + codes.take(examples))
+        # the max_candidates smallest approximate distances per query
+        order = np.lexsort((approximate, rows))
+        rows, examples = rows[order], examples[order]
+        group_starts = np.searchsorted(rows, rows, side="left")
+        keep = np.arange(len(rows)) - group_starts < max_candidates
+        return rows[keep], examples[keep]
+
+    def save(self, path):
+        """Saves the index in a binary .npz file.
+
+        Args:
+            path (string): path of the file
+        """
+        arrays = {"centroids": self.centroids, "members": self.members,
+                  "offsets": self.offsets, "metric": np.array(self.metric)}
+        if self.pq is not None:
+            arrays.update(codebooks=self.pq.codebooks, codes=self.codes)
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path) -> IVFIndex:
+        """Loads an index saved with save.
+
+        Args:
+            path (string): path of the file
+
+        Returns:
+            IVFIndex: the index
+        """
+        index = cls.__new__(cls)
+        with np.load(path) as f:
+            index.centroids = f["centroids"]
+            index.members, index.offsets = f["members"], f["offsets"]
+            index.metric = str(f["metric"])
+            index.pq, index.codes = None, None
+            if "codebooks" in f:
+                index.pq = ProductQuantizer.__new__(ProductQuantizer)
+                index.pq.codebooks = f["codebooks"]
+                index.codes = f["codes"]
+        return index
+
+    def __len__(self):
+        return len(self.members)
@@ -0,0 +1,164 @@
+from typing import Iterable
+import zlib
+
+import numpy as np
+
+from bow import BOW
+from vocabulary import Vocabulary
+
+# Mersenne prime of the universal hash functions (a * x + b) mod PRIME
+PRIME = (1 << 31) - 1
+# terms of a corpus processed at once, bounds the memory of computing
+# signatures to about this times num_perm integers
+TERMS_PER_CHUNK = 1 << 16
+
+
+class MinHash():
+    """MinHash signatures of bags of words.
+
+    The probability that two signatures agree at a position equals the
+    Jaccard similarity of the two sets, so the fraction of equal positions
+    estimates it. Terms are hashed by their content, so signatures of
+    different corpora are comparable without a shared vocabulary.
+    """
+
+    def __init__(self, num_perm=128, seed=0):
+        """
+        Args:
+            num_perm (int, optional): length of the signatures, the number
+                                      of hash functions. Defaults to 128.
+            seed (int, optional): seed of the hash functions.
+                                  Defaults to 0.
+        """
+        self.num_perm = num_perm
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, num_perm, dtype=np.int64)
+        self.b = rng.integers(0, PRIME, num_perm, dtype=np.int64)
+
+    def signatures(self, bows: Iterable[BOW]) -> np.ndarray:
+        """Signatures of bags of words. Empty sets get the signature PRIME
+        at every position.
+
+        Args:
+            bows (Iterable[BOW]): the bags of words
+
+        Returns:
+            np.ndarray: uint32 signatures of shape (len(bows), num_perm)
+        """
+        # every distinct term is hashed once, documents are term ids
+        vocabulary = Vocabulary()
+        docs = [vocabulary.intern(bow.rep) for bow in bows]
+        codes = np.array([zlib.crc32(term.encode()) % PRIME
+                          for term in vocabulary.terms], dtype=np.int64)
+        # (a * x + b) mod PRIME of every term and hash function, of shape
+        # (terms, num_perm) so the hashes of a term are one row. a * x <
+        # 2**62 does not overflow. The extra last row pads documents.
+        hashes = np.full((len(codes) + 1, self.num_perm), PRIME,
+                         dtype=np.uint32)
+        hashes[:-1] = (codes[:, None] * self.a[None, :] +
+                       self.b[None, :]) % PRIME
+
+        # documents sorted by length are padded to the longest document of
+        # their chunk, so the minimum is taken over a dense array
+        lengths = np.array([len(doc) for doc in docs], dtype=np.int64)
+        order = np.argsort(lengths, kind="stable")
+        chunk_size = max(TERMS_PER_CHUNK // max(lengths.max(initial=1), 1),
+                         1)
+        signatures = np.empty((len(docs), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(docs), chunk_size):
+            chunk = order[start:start + chunk_size]
+            padded = np.full((len(chunk), max(lengths[chunk[-1]], 1)),
+                             len(codes), dtype=np.int64)
+            for row, i in enumerate(chunk):
+                padded[row, :lengths[i]] = docs[i]
+            signatures[chunk] = hashes[padded].min(axis=1)
+        return signatures
+
+
+class LSHIndex():
+    """Locality sensitive hashing index over MinHash signatures.
+
+    Signatures are split into bands of rows. Two sets become candidates if
+    all rows of at least one band agree, which happens with probability
+    1 - (1 - s^rows)^bands for Jaccard similarity s. More bands of fewer
+    rows find more of the similar sets at the cost of more candidates.
+    """
+
+    def __init__(self, signatures: np.ndarray, bands=32, seed=0):
+        """
+        Args:
+            signatures (np.ndarray): signatures of the indexed sets
+            bands (int, optional): number of bands, has to divide the
+                                   signature length. Defaults to 32.
+            seed (int, optional): seed of the band hashes. Defaults to 0.
+
+        Raises:
+            ValueError: raised when bands does not divide the signature
+                        length
+        """
+        if signatures.shape[1] % bands:
+            raise ValueError(f"{bands} bands do not divide signatures of "
+                             f"length {signatures.shape[1]}.")
+        self.bands = bands
+        self.rows = signatures.shape[1] // bands
+        rng = np.random.default_rng(seed)
+        # odd multipliers mixing the rows of a band into one 64 bit key
+        self.multipliers = (rng.integers(0, 1 << 62, self.rows,
+                                         dtype=np.int64) * 2 + 1
+                            ).astype(np.uint64)
+
+        keys = self.keys(signatures)
+        # per band the indexed sets sorted by their key, so a bucket is a
+        # range of the sorted keys
+        self.order = np.argsort(keys, axis=1, kind="stable")
+        self.sorted_keys = np.take_along_axis(keys, self.order, axis=1)
+
+    def keys(self, signatures: np.ndarray) -> np.ndarray:
+        """Bucket key of every band of the signatures.
+
+        Args:
+            signatures (np.ndarray): signatures of shape (n, length)
+
+        Returns:
+            np.ndarray: keys of shape (bands, n)
+        """
+        banded = signatures.astype(np.uint64).reshape(len(signatures),
+                                                      self.bands, self.rows)
+        # uint64 arithmetic wraps around
+        return (banded * self.multipliers).sum(axis=2,
+                                               dtype=np.uint64).T.copy()
+
+    def candidates(self, signatures: np.ndarray):
+        """Pairs of queries and indexed sets sharing a bucket.
+
+        Args:
+            signatures (np.ndarray): signatures of the queries
+
+        Returns:
+            np.ndarray, np.ndarray: query and indexed set of every distinct
+                                    candidate pair, sorted by query and set
+        """
+        n = len(self)
+        keys = self.keys(signatures)
+        lower = np.array([np.searchsorted(sorted_keys, band_keys, "left")
+                          for sorted_keys, band_keys
+                          in zip(self.sorted_keys, keys)])
+        upper = np.array([np.searchsorted(sorted_keys, band_keys, "right")
+                          for sorted_keys, band_keys
+                          in zip(self.sorted_keys, keys)])
+
+        # bucket members of every query, one band at a time so memory is
+        # bounded by queries x indexed sets however large the buckets are
+        is_candidate = np.zeros((len(signatures), n), dtype=bool)
+        for order, band_lower, band_upper in zip(self.order, lower, upper):
+            sizes = band_upper - band_lower
+            # all ranges of the band expanded at once
+            first = np.cumsum(sizes) - sizes
+            positions = (np.repeat(band_lower - first, sizes) +
+                         np.arange(sizes.sum()))
+            queries = np.repeat(np.arange(len(signatures)), sizes)
+            is_candidate[queries, order[positions]] = True
+        return np.nonzero(is_candidate)
+
+    def __len__(self):
+        return self.order.shape[1]
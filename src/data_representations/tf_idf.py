@@ -1,6 +1,16 @@
 from collections import defaultdict, Counter
+import itertools
 import math
-from typing import List
+import zlib
+from typing import Iterable, List, Union
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+from vector import SparseVector
+from vocabulary import Vocabulary
 
 
 class TfIdf():
@@ -11,43 +21,80 @@ class TfIdf():
     idf is weighted using inverse document frequency (classic).
     """
 
-    def fit(self, docs: List[List[str]]):
+    def __init__(self, interned=True):
+        """
+        Args:
+            interned (bool, optional): intern the tokens to integer ids.
+                                       fit counts the document frequencies
+                                       of the distinct terms of all
+                                       documents in one pass of Counter,
+                                       transform counts the term
+                                       frequencies by sorting the
+                                       concatenated ids of all documents
+                                       instead of a Counter per document.
+                                       Both give the same vocabulary and
+                                       weights. Defaults to True.
+        """
+        self.interned = interned
+
+    def fit(self, docs: Iterable[List[str]]):
         """Learns vocabulary and idf values from input documents
 
+        The documents are only iterated once, so they can also be streamed,
+        e.g. from Preprocessor.iter_records.
+
         Args:
-            docs (List[List[str]]): list of documents, each as a list of str
+            docs (Iterable[List[str]]): documents, each as a list of str
         """
+        if self.interned:
+            self._vocabulary = None
+            return self.partial_fit(docs)
+
         # Counts the number of documents that contain term t
         document_freq_vocab = defaultdict(int)
+        n_docs = 0
         for doc in docs:
+            n_docs += 1
             for term in set(doc):
                 document_freq_vocab[term] += 1
 
         # Create vocabulary of terms with corresponding indexes
-        self._vocab = {term: index for index, term in
-                       enumerate(document_freq_vocab.keys())}
-
-        # Idf computed with inverse document frequency
-        idf = defaultdict(int)
-        for term, freq in document_freq_vocab.items():
-            idf[term] = -math.log(freq / len(docs))
+        self._vocabulary = Vocabulary(document_freq_vocab.keys())
+        self._vocab = self._vocabulary.ids
 
-        self._idf = idf
+        # Idf computed with inverse document frequency, see _idf
+        self._document_freq = np.fromiter(document_freq_vocab.values(),
+                                          dtype=np.int64,
+                                          count=len(document_freq_vocab))
+        self._n_docs = n_docs
+        self._idf_cache = None
 
-    def transform(self, docs: List[List[str]]) -> List[List[float]]:
+    def transform(self, docs: List[List[str]],
+                  sparse=False) -> Union[List[List[float]],
+                                         List[SparseVector]]:
         """Transform input documents into tf-idf document-term matrix
 
         Args:
             docs (List[List[str]]): list of documents represented
                                     as list of str
+            sparse (bool, optional): return one SparseVector per document
+                                     holding only the non-zero weights
+                                     instead of dense lists. Terms of
+                                     idf 0 are not stored.
+                                     Defaults to False.
 
         Returns:
-            List[List[float]]: tf-idf document-term matrix
+            Union[List[List[float]], List[SparseVector]]: tf-idf
+                                                          document-term
+                                                          matrix
         """
+        if self.interned:
+            return self._transform_interned(docs, sparse)
+
         tfidf_matrix = []
 
         for doc in docs:
-            vector = [0] * len(self._vocab)
+            indices, values = [], []
 
             for term, freq in Counter(doc).items():
                 # ignore term if not in vocabulary
@@ -57,22 +104,350 @@ class TfIdf():
                 term_index = self._vocab[term]
                 tf_value = freq / len(doc)
                 idf_value = self._idf.get(term)
-                vector[term_index] = tf_value * idf_value
+                # terms in all documents weigh 0 and are not stored
+                if idf_value == 0:
+                    continue
+                indices.append(term_index)
+                values.append(tf_value * idf_value)
 
-            tfidf_matrix.append(vector)
+            if sparse:
+                tfidf_matrix.append(SparseVector(indices, values,
+                                                 len(self._vocab)))
+            else:
+                vector = [0] * len(self._vocab)
+                for term_index, value in zip(indices, values):
+                    vector[term_index] = value
+                tfidf_matrix.append(vector)
 
         return tfidf_matrix
 
-    def fit_transform(self, docs: List[List[str]]) -> List[List[float]]:
+    def partial_fit(self, docs: Iterable[List[str]]):
+        """Updates vocabulary and document frequencies with more documents,
+        e.g. new songs, without refitting the documents seen before.
+
+        New terms are appended to the vocabulary, so the indexes of known
+        terms never change. Idf values are recomputed lazily from the
+        running counts the next time they are needed, see reweight to
+        update documents transformed before.
+
+        Args:
+            docs (Iterable[List[str]]): documents, each as a list of str
+        """
+        if getattr(self, "_vocabulary", None) is None:
+            self._vocabulary = Vocabulary()
+            self._vocab = self._vocabulary.ids
+            self._document_freq = np.zeros(0, dtype=np.int64)
+            self._n_docs = 0
+
+        # Counts the number of documents that contain term t, counting
+        # the distinct terms of all documents in one pass of Counter
+        n_docs = 0
+
+        def counted(docs):
+            nonlocal n_docs
+            for doc in docs:
+                n_docs += 1
+                yield doc
+
+        counts = Counter(itertools.chain.from_iterable(map(set,
+                                                           counted(docs))))
+        ids = self._vocabulary.intern(counts.keys())
+        document_freq = np.zeros(len(self._vocabulary), dtype=np.int64)
+        document_freq[:len(self._document_freq)] = self._document_freq
+        # terms are distinct, so every id is only incremented once
+        document_freq[ids] += np.fromiter(counts.values(), dtype=np.int64,
+                                          count=len(counts))
+
+        self._document_freq = document_freq
+        self._n_docs += n_docs
+        self._idf_cache = None
+
+    def _compute_idf(self):
+        """Idf computed with inverse document frequency from the running
+        counts, using math.log per distinct frequency for exactly the same
+        values as computing it per term.
+        """
+        freqs, inverse = np.unique(self._document_freq, return_inverse=True)
+        idf_per_freq = np.array([-math.log(freq / self._n_docs)
+                                 for freq in freqs.tolist()],
+                                dtype=np.float64)
+        idf_array = idf_per_freq[inverse.ravel()]
+        idf = defaultdict(int, zip(self._vocabulary.terms,
+                                   idf_array.tolist()))
+        self._idf_cache = idf_array, idf
+
+    @property
+    def _n_features(self) -> int:
+        return len(self._vocab)
+
+    @property
+    def _idf_array(self) -> np.ndarray:
+        if self._idf_cache is None:
+            self._compute_idf()
+        return self._idf_cache[0]
+
+    @property
+    def _idf(self) -> defaultdict:
+        if self._idf_cache is None:
+            self._compute_idf()
+        return self._idf_cache[1]
+
+    def _term_frequencies(self, docs: List[List[str]]):
+        """Term frequencies of all documents as flat arrays.
+
+        Returns:
+            np.ndarray, np.ndarray, np.ndarray: term indexes and tf values
+                of the known terms of all documents, and the bounds of
+                every document in them
+        """
+        # the documents are read twice, so one-shot iterables are kept
+        docs = list(docs)
+        # ids of all tokens of all documents, unknown terms get id -1
+        ids = np.fromiter(map(self._vocab.get,
+                              itertools.chain.from_iterable(docs),
+                              itertools.repeat(-1)), dtype=np.int64)
+        lengths = np.array([len(doc) for doc in docs], dtype=np.int64)
+        doc_index = np.repeat(np.arange(len(lengths)), lengths)
+
+        # frequency of every distinct known term of every document
+        known = ids >= 0
+        n_terms = max(self._n_features, 1)
+        keys = np.sort(doc_index[known] * n_terms + ids[known])
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        freqs = np.diff(starts, append=len(keys))
+        doc_index, ids = np.divmod(keys[starts], n_terms)
+        tf_values = freqs / lengths[doc_index]
+        bounds = np.searchsorted(doc_index, np.arange(len(lengths) + 1))
+        return ids, tf_values, bounds
+
+    def _transform_interned(self, docs: List[List[str]], sparse):
+        """Transform input documents, see transform, weighting the term
+        frequencies of all documents with array operations.
+        """
+        n_terms = self._n_features
+        ids, tf_values, bounds = self._term_frequencies(docs)
+        values = tf_values * self._idf_array[ids]
+        # zero weights, e.g. of terms in all documents, are not stored
+        nonzero = values != 0
+        ids, values = ids[nonzero], values[nonzero]
+        bounds = np.concatenate(([0], np.cumsum(nonzero)))[bounds]
+
+        tfidf_matrix = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if sparse:
+                tfidf_matrix.append(SparseVector(ids[start:end],
+                                                 values[start:end],
+                                                 n_terms))
+            else:
+                vector = [0] * n_terms
+                for term_index, value in zip(ids[start:end].tolist(),
+                                             values[start:end].tolist()):
+                    vector[term_index] = value
+                tfidf_matrix.append(vector)
+
+        return tfidf_matrix
+
+    def term_frequencies(self, docs: List[List[str]]) -> List[SparseVector]:
+        """Transform input documents into their unweighted term
+        frequencies, to be weighted with reweight.
+
+        Keeping the term frequencies of a corpus allows to update its
+        tf-idf weights after partial_fit without counting the terms of the
+        documents again. Terms not in the vocabulary are dropped.
+
+        Args:
+            docs (List[List[str]]): list of documents represented
+                                    as list of str
+
+        Returns:
+            List[SparseVector]: term frequencies per document
+        """
+        n_terms = self._n_features
+        ids, tf_values, bounds = self._term_frequencies(docs)
+        return [SparseVector(ids[start:end], tf_values[start:end], n_terms)
+                for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def reweight(self, term_frequencies: List[SparseVector]
+                 ) -> List[SparseVector]:
+        """Weights term frequencies with the current idf values.
+
+        Since the indexes of known terms never change in partial_fit,
+        term frequencies of an older vocabulary can be reweighted as well,
+        their dimension is extended to the current vocabulary.
+        reweight(term_frequencies(docs)) equals transform(docs, sparse=True).
+
+        Args:
+            term_frequencies (List[SparseVector]): rows returned by
+                                                   term_frequencies
+
+        Returns:
+            List[SparseVector]: tf-idf weights per document
+        """
+        n_terms = self._n_features
+        idf = self._idf_array
+        tfidf_matrix = []
+        for row in term_frequencies:
+            values = row.values * idf[row.indices]
+            nonzero = values != 0
+            tfidf_matrix.append(SparseVector(row.indices[nonzero],
+                                             values[nonzero], n_terms))
+        return tfidf_matrix
+
+    def fit_transform(self, docs: List[List[str]],
+                      sparse=False) -> Union[List[List[float]],
+                                             List[SparseVector]]:
         """Learns vocabulary and idf values from input documents and
         returns tf-idf document-term matrix
 
         Args:
             docs (List[List[str]]): list of documents represented
                                     as list of str
+            sparse (bool, optional): return SparseVectors, see transform.
+                                     Defaults to False.
 
         Returns:
-            List[List[float]]: tf-idf document-term matrix
+            Union[List[List[float]], List[SparseVector]]: tf-idf
+                                                          document-term
+                                                          matrix
         """
         self.fit(docs)
-        return self.transform(docs)
+        return self.transform(docs, sparse=sparse)
+
+
+def _batches(iterable: Iterable, batch_size: int) -> Iterable[list]:
+    iterator = iter(iterable)
+    return iter(lambda: list(itertools.islice(iterator, batch_size)), [])
+
+
+class HashingTfIdf(TfIdf):
+    """Tf-idf with the hashing trick: terms are hashed into a fixed number
+    of features instead of being stored in a vocabulary, so the memory
+    needed does not grow with the corpus.
+
+    Terms hashing to the same feature share their frequencies and idf
+    value. Documents are processed in batches, so fit only holds one batch
+    and the document frequency per feature in memory, and iter_transform
+    yields the weights batch by batch. fit_transform iterates the documents
+    twice, so fit and iter_transform are needed for generators.
+    """
+
+    def __init__(self, n_features=2**20, batch_size=1000):
+        """
+        Args:
+            n_features (int, optional): dimension of the tf-idf vectors.
+                                        Defaults to 2**20.
+            batch_size (int, optional): documents processed at once.
+                                        Defaults to 1000.
+        """
+        super().__init__()
+        self.n_features = n_features
+        self.batch_size = batch_size
+
+    @property
+    def _n_features(self) -> int:
+        return self.n_features
+
+    def _feature(self, term: str) -> int:
+        # crc32 instead of hash, which is salted differently in every
+        # process
+        return zlib.crc32(term.encode()) % self.n_features
+
+    def fit(self, docs: Iterable[List[str]]):
+        """Learns the idf values of the features from input documents, in
+        one pass over the documents.
+
+        Args:
+            docs (Iterable[List[str]]): documents, each as a list of str
+        """
+        self._document_freq = np.zeros(self.n_features, dtype=np.int64)
+        self._n_docs = 0
+        self.partial_fit(docs)
+
+    def partial_fit(self, docs: Iterable[List[str]]):
+        """Updates the document frequencies with more documents, see
+        TfIdf.partial_fit.
+
+        Args:
+            docs (Iterable[List[str]]): documents, each as a list of str
+        """
+        if getattr(self, "_document_freq", None) is None:
+            self._document_freq = np.zeros(self.n_features, dtype=np.int64)
+            self._n_docs = 0
+
+        feature = self._feature
+        for batch in _batches(docs, self.batch_size):
+            # distinct features of every document
+            features = [f for doc in batch
+                        for f in {feature(term) for term in set(doc)}]
+            self._document_freq += np.bincount(features,
+                                               minlength=self.n_features)
+            self._n_docs += len(batch)
+        self._idf_cache = None
+
+    def _compute_idf(self):
+        """Idf per feature, see TfIdf._compute_idf. Features no document
+        hashed to get an idf of 0.
+        """
+        freqs, inverse = np.unique(self._document_freq, return_inverse=True)
+        idf_per_freq = np.array([-math.log(freq / self._n_docs) if freq
+                                 else 0.0 for freq in freqs.tolist()],
+                                dtype=np.float64)
+        self._idf_cache = idf_per_freq[inverse.ravel()], None
+
+    @property
+    def _idf(self):
+        raise AttributeError("HashingTfIdf has no idf per term, "
+                             "see _idf_array")
+
+    def _term_frequencies(self, docs: List[List[str]]):
+        """Term frequencies of all documents as flat arrays, see
+        TfIdf._term_frequencies. Frequencies of terms hashing to the same
+        feature are summed up, features unseen in fit are dropped.
+        """
+        feature = self._feature
+        features, freqs, lengths, n_distinct = [], [], [], []
+        for doc in docs:
+            counts = Counter(doc)
+            features.extend([feature(term) for term in counts])
+            freqs.extend(counts.values())
+            lengths.append(len(doc))
+            n_distinct.append(len(counts))
+        features = np.array(features, dtype=np.int64)
+        doc_index = np.repeat(np.arange(len(lengths)), n_distinct)
+
+        known = self._document_freq[features] > 0
+        keys = doc_index[known] * self.n_features + features[known]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        summed = np.bincount(inverse.ravel(),
+                             weights=np.array(freqs, dtype=np.int64)[known],
+                             minlength=len(keys))
+        doc_index, ids = np.divmod(keys, self.n_features)
+        tf_values = summed / np.array(lengths, dtype=np.int64)[doc_index]
+        bounds = np.searchsorted(doc_index, np.arange(len(lengths) + 1))
+        return ids, tf_values, bounds
+
+    def transform(self, docs: Iterable[List[str]],
+                  sparse=False) -> Union[List[List[float]],
+                                         List[SparseVector]]:
+        """Transform input documents into tf-idf document-feature matrix,
+        see TfIdf.transform. Dense rows have n_features entries, so sparse
+        output is recommended.
+        """
+        return list(self.iter_transform(docs, sparse=sparse))
+
+    def iter_transform(self, docs: Iterable[List[str]],
+                       sparse=True) -> Iterable[Union[List[float],
+                                                      SparseVector]]:
+        """Lazily transforms input documents batch by batch, so the
+        documents can be streamed and only one batch is held in memory.
+
+        Args:
+            docs (Iterable[List[str]]): documents, each as a list of str
+            sparse (bool, optional): yield SparseVectors instead of dense
+                                     lists. Defaults to True.
+
+        Yields:
+            Union[List[float], SparseVector]: tf-idf weights per document
+        """
+        for batch in _batches(docs, self.batch_size):
+            yield from self._transform_interned(batch, sparse)
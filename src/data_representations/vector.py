@@ -2,6 +2,8 @@ from __future__ import annotations
 from typing import List
 import math
 
+import numpy as np
+
 
 class Vector():
     """General class for feature representation.
@@ -30,6 +32,12 @@ class Vector():
     def magnitute(self):
         return math.sqrt(sum([math.pow(i, 2) for i in self._vector]))
 
+    @property
+    def nnz(self):
+        """Number of non-zero entries
+        """
+        return sum(1 for i in self._vector if i != 0)
+
     def __iter__(self):
         for val in self._vector:
             yield val
@@ -90,3 +98,96 @@ class Vector():
 
     def __len__(self):
         return len(self._vector)
+
+
+class SparseVector(Vector):
+    """Vector only storing its non-zero entries, as sorted indices and
+    values.
+
+    Can be used everywhere a Vector is expected. Distances between two
+    SparseVectors only touch the non-zero entries.
+    """
+
+    def __init__(self, indices: List[int], values: List[float], dim: int):
+        """
+        Args:
+            indices (List[int]): indices of the non-zero entries
+            values (List[float]): values of the non-zero entries
+            dim (int): dimension of the vector
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        order = np.argsort(indices, kind="stable")
+        self.indices = indices[order]
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        self.dim = dim
+
+    @property
+    def vector(self):
+        vector = [0.0] * self.dim
+        for i, value in zip(self.indices.tolist(), self.values.tolist()):
+            vector[i] = value
+        return vector
+
+    @property
+    def magnitute(self):
+        return math.sqrt(float(np.dot(self.values, self.values)))
+
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    def __iter__(self):
+        for val in self.vector:
+            yield val
+
+    def dot(self, other: Vector) -> float:
+        """Dot product with another vector, only using the non-zero entries
+        of this vector.
+
+        Args:
+            other (Vector): input vector, sparse or not
+
+        Returns:
+            float: the dot product
+        """
+        if isinstance(other, SparseVector):
+            _, mine, theirs = np.intersect1d(self.indices, other.indices,
+                                             assume_unique=True,
+                                             return_indices=True)
+            return float(np.dot(self.values[mine], other.values[theirs]))
+        dense = np.asarray(other.vector, dtype=np.float64)
+        return float(np.dot(self.values, dense[self.indices]))
+
+    def distance(self, other, measure="cosine"):
+        """Distance between class and input vector, see Vector.distance.
+
+        Args:
+            other (Vector): input vector to compare against.
+            measure (str, optional): Measure for comparison.
+                                     Defaults to "cosine".
+
+        Raises:
+            NotImplementedError: raises when not implemented
+                                 measure gets chosen.
+
+        Returns:
+            float: distance measure
+        """
+        if measure == "cosine":
+            # dist measure instead of sim, thus 1 - sim
+            return 1 - (self.dot(other) /
+                        (self.magnitute * other.magnitute))
+        elif measure == "euclidean":
+            # |a-b|^2 = |a|^2 + |b|^2 - 2ab
+            squared = (self.magnitute ** 2 + other.magnitute ** 2 -
+                       2 * self.dot(other))
+            return math.sqrt(max(squared, 0))
+        else:
+            error = f"{measure} not implemented (yet)."
+            raise NotImplementedError(error)
+
+    def __str__(self) -> str:
+        return str(dict(zip(self.indices.tolist(), self.values.tolist())))
+
+    def __len__(self):
+        return self.dim
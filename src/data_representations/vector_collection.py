@@ -0,0 +1,192 @@
+from __future__ import annotations
+from typing import List
+
+import numpy as np
+from scipy import sparse
+
+from vector import Vector, SparseVector
+
+# pairs of sparse rows multiplied at once in pair_distance
+PAIRS_PER_CHUNK = 8192
+
+
+def _cosine_similarity(dot_products: np.ndarray, norms: np.ndarray,
+                       other_norms: np.ndarray) -> np.ndarray:
+    """Cosine similarities from dot products and broadcastable norms. Zero
+    vectors have a similarity of 0 to every vector.
+    """
+    magnitudes = norms * other_norms
+    return np.divide(dot_products, magnitudes,
+                     out=np.zeros(np.shape(magnitudes),
+                                  dtype=dot_products.dtype),
+                     where=magnitudes != 0)
+
+
+def _euclidean_distance(dot_products: np.ndarray, norms: np.ndarray,
+                        other_norms: np.ndarray) -> np.ndarray:
+    """Euclidean distances from dot products and broadcastable norms,
+    using |a-b|^2 = |a|^2 + |b|^2 - 2ab.
+    """
+    squared = np.square(norms) + np.square(other_norms) - 2 * dot_products
+    # rounding errors may result in slightly negative values
+    return np.sqrt(np.maximum(squared, 0))
+
+
+class VectorCollection():
+    """Collection of Vectors stored as one contiguous float32 matrix.
+
+    Collections of SparseVectors are stored as a float32 CSR matrix
+    instead, so zero entries are never materialized.
+
+    The row norms are computed once, so comparing two collections only
+    needs one matrix multiplication.
+    """
+
+    def __init__(self, vectors: List[Vector]):
+        """
+        Args:
+            vectors (List[Vector]): vectors of the same length, one per row
+        """
+        if vectors and all(isinstance(vector, SparseVector)
+                           for vector in vectors):
+            self.matrix = self.__sparse_matrix(vectors)
+            self.norms = np.sqrt(np.asarray(
+                self.matrix.multiply(self.matrix).sum(axis=1))).ravel()
+            return
+
+        self.matrix = np.ascontiguousarray([vector.vector
+                                            for vector in vectors],
+                                           dtype=np.float32)
+        if self.matrix.ndim != 2:
+            self.matrix = self.matrix.reshape(len(vectors), -1)
+        self.norms = np.linalg.norm(self.matrix, axis=1)
+
+    @staticmethod
+    def __sparse_matrix(vectors: List[SparseVector]) -> sparse.csr_matrix:
+        indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+        np.cumsum([vector.nnz for vector in vectors], out=indptr[1:])
+        return sparse.csr_matrix(
+            (np.concatenate([vector.values for vector in vectors]),
+             np.concatenate([vector.indices for vector in vectors]),
+             indptr),
+            shape=(len(vectors), vectors[0].dim), dtype=np.float32)
+
+    @classmethod
+    def _from_parts(cls, matrix, norms):
+        new = cls.__new__(cls)
+        new.matrix, new.norms = matrix, norms
+        return new
+
+    def distance(self, other: VectorCollection, measure="cosine"):
+        """Distance between all pairs of rows, see Vector.distance.
+
+        Args:
+            other (VectorCollection): vectors to compare against.
+            measure (str, optional): Measure for comparison.
+                                     Defaults to "cosine".
+
+        Raises:
+            NotImplementedError: raises when not implemented
+                                 measure gets chosen.
+
+        Returns:
+            np.ndarray: distances of shape (len(self), len(other))
+        """
+        if measure == "cosine":
+            # dist measure instead of sim, thus 1 - sim
+            return 1 - self.__cosine_similarity(other)
+        elif measure == "euclidean":
+            return self.__euclidean_distance(other)
+        else:
+            error = f"{measure} not implemented (yet)."
+            raise NotImplementedError(error)
+
+    def __dot_products(self, other: VectorCollection) -> np.ndarray:
+        """Dot products of all pairs of rows as dense matrix, for dense and
+        sparse collections.
+        """
+        dot_products = self.matrix @ other.matrix.T
+        if sparse.issparse(dot_products):
+            return dot_products.toarray()
+        return np.asarray(dot_products)
+
+    def __cosine_similarity(self, other: VectorCollection) -> np.ndarray:
+        """Cosine similarities of all pairs of rows. Zero vectors have a
+        similarity of 0 to every vector.
+
+        Args:
+            other (VectorCollection): vectors to compare against.
+
+        Returns:
+            np.ndarray: values in range [-1, 1]
+        """
+        return _cosine_similarity(self.__dot_products(other),
+                                  self.norms[:, None], other.norms[None, :])
+
+    def __euclidean_distance(self, other: VectorCollection) -> np.ndarray:
+        """Euclidean distances of all pairs of rows, using
+        |a-b|^2 = |a|^2 + |b|^2 - 2ab. In float32, distances of almost
+        identical vectors are only accurate to about sqrt(eps) * |a|.
+
+        Args:
+            other (VectorCollection): vectors to compare against.
+
+        Returns:
+            np.ndarray: values in range [0, inf]
+        """
+        return _euclidean_distance(self.__dot_products(other),
+                                   self.norms[:, None], other.norms[None, :])
+
+    def pair_distance(self, other: VectorCollection, rows: np.ndarray,
+                      other_rows: np.ndarray, measure="cosine") -> np.ndarray:
+        """Distances for selected pairs of rows only, see distance.
+
+        Args:
+            other (VectorCollection): vectors to compare against.
+            rows (np.ndarray): row of self per pair
+            other_rows (np.ndarray): row of other per pair
+            measure (str, optional): Measure for comparison.
+                                     Defaults to "cosine".
+
+        Raises:
+            NotImplementedError: raises when not implemented
+                                 measure gets chosen.
+
+        Returns:
+            np.ndarray: distance per pair
+        """
+        if measure not in ("cosine", "euclidean"):
+            error = f"{measure} not implemented (yet)."
+            raise NotImplementedError(error)
+
+        rows, other_rows = np.asarray(rows), np.asarray(other_rows)
+        dot_products = np.empty(len(rows), dtype=np.float32)
+        if sparse.issparse(self.matrix):
+            for start in range(0, len(rows), PAIRS_PER_CHUNK):
+                end = start + PAIRS_PER_CHUNK
+                dot_products[start:end] = np.asarray(
+                    self.matrix[rows[start:end]].multiply(
+                        other.matrix[other_rows[start:end]]).sum(axis=1)
+                    ).ravel()
+        else:
+            # pairs grouped by their row of self, one matrix-vector
+            # product per row
+            order = np.argsort(rows, kind="stable")
+            bounds = np.flatnonzero(np.diff(rows[order])) + 1
+            for group in np.split(order, bounds):
+                if len(group):
+                    dot_products[group] = (other.matrix[other_rows[group]] @
+                                           self.matrix[rows[group[0]]])
+
+        norms, other_norms = self.norms[rows], other.norms[other_rows]
+        if measure == "cosine":
+            return 1 - _cosine_similarity(dot_products, norms, other_norms)
+        return _euclidean_distance(dot_products, norms, other_norms)
+
+    def __getitem__(self, rows):
+        if isinstance(rows, int):
+            rows = slice(rows, rows + 1 if rows != -1 else None)
+        return self._from_parts(self.matrix[rows], self.norms[rows])
+
+    def __len__(self):
+        return self.matrix.shape[0]
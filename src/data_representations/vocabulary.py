@@ -0,0 +1,75 @@
+from typing import Iterable, List
+
+import numpy as np
+
+
+class Vocabulary():
+    """Interns terms to consecutive integer ids, so a corpus only stores
+    every distinct term once.
+    """
+
+    def __init__(self, terms: Iterable[str] = ()):
+        """
+        Args:
+            terms (Iterable[str], optional): initial terms of the vocabulary.
+                                             Defaults to ().
+        """
+        self.ids = {}
+        self.terms: List[str] = []
+        for term in terms:
+            self.add(term)
+
+    def add(self, term: str) -> int:
+        """Adds a term to the vocabulary if not already known.
+
+        Args:
+            term (str): the term
+
+        Returns:
+            int: id of the term
+        """
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = self.ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def intern(self, tokens: Iterable[str]) -> np.ndarray:
+        """Converts tokens into ids, adding unknown tokens to the vocabulary.
+
+        Args:
+            tokens (Iterable[str]): the tokens
+
+        Returns:
+            np.ndarray: term id per token
+        """
+        ids = self.ids
+        tokens = list(tokens)
+        # only the distinct tokens are checked, in order of appearance
+        for token in dict.fromkeys(tokens):
+            if token not in ids:
+                self.add(token)
+        return np.fromiter(map(ids.__getitem__, tokens), dtype=np.int64,
+                           count=len(tokens))
+
+    def lookup(self, tokens: Iterable[str]) -> np.ndarray:
+        """Converts tokens into ids, dropping unknown tokens.
+
+        Args:
+            tokens (Iterable[str]): the tokens
+
+        Returns:
+            np.ndarray: term id per known token
+        """
+        ids = self.ids
+        return np.array([ids[token] for token in tokens if token in ids],
+                        dtype=np.int64)
+
+    def __getitem__(self, term: str) -> int:
+        return self.ids[term]
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.ids
+
+    def __len__(self):
+        return len(self.terms)
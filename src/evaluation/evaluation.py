@@ -1,5 +1,182 @@
+import concurrent.futures
+import functools
 import typing
 
+import numpy as np
+
+# resamples per task of bootstrap and permutation_test
+RESAMPLES_PER_TASK = 100
+DEFAULT_METRICS = ("accuracy", "macro_fscore", "micro_fscore")
+
+
+class ConfusionMatrix():
+    """Confusion matrix of gold labels and predictions, counted in a single
+    pass with numpy.
+
+    Rows are gold labels, columns are predicted labels, both in the order of
+    labels. TP, FN, FP and TN of every label are derived from its row and
+    column.
+    """
+    def __init__(self, gold: typing.List[int], pred: typing.List[int]):
+        """
+        Args:
+            gold (typing.List[int]): true class per example
+            pred (typing.List[int]): predicted class per example
+        """
+        n = len(gold)
+        self.labels, inverse = np.unique(np.array(list(gold) + list(pred)),
+                                         return_inverse=True)
+        inverse = inverse.ravel()
+        n_labels = len(self.labels)
+        self.index = {label: i for i, label in enumerate(self.labels.tolist())}
+
+        # one bincount over the flat cell index gold * n_labels + pred
+        # of every example
+        self.cells = inverse[:n] * n_labels + inverse[n:]
+        self.matrix = np.bincount(self.cells, minlength=n_labels ** 2
+                                  ).reshape(n_labels, n_labels)
+        self.tp = np.diagonal(self.matrix)
+        self.n_gold = self.matrix.sum(axis=1)
+        self.n_pred = self.matrix.sum(axis=0)
+        self.fn = self.n_gold - self.tp
+        self.fp = self.n_pred - self.tp
+        # every example not counted as TP, FN or FP of a label is its TN
+        self.tn = n - self.tp - self.fn - self.fp
+
+    def rows(self, classes: typing.Iterable[int]) -> np.ndarray:
+        """Indexes of classes in the arrays of the matrix.
+
+        Args:
+            classes (typing.Iterable[int]): the classes
+
+        Returns:
+            np.ndarray: index per class
+        """
+        return np.array([self.index[c] for c in classes], dtype=np.int64)
+
+
+def _counts(gold: np.ndarray, pred: np.ndarray, n_labels: int,
+            weights: np.ndarray = None):
+    """TP, number of gold and of predicted examples per run and label.
+
+    Args:
+        gold (np.ndarray): gold label indexes of shape (runs, examples)
+        pred (np.ndarray): predicted label indexes of the same shape
+        n_labels (int): number of labels
+        weights (np.ndarray, optional): number of times each example is
+                                        counted. Defaults to None.
+
+    Returns:
+        np.ndarray, np.ndarray, np.ndarray: counts of shape (runs, labels)
+    """
+    n_runs = len(gold)
+    offsets = (np.arange(n_runs) * n_labels)[:, None]
+    if weights is None:
+        weights = np.ones(gold.shape, dtype=np.int64)
+    gold, pred = (offsets + gold).ravel(), (offsets + pred).ravel()
+    weights = weights.ravel()
+    correct = gold == pred
+    shape = (n_runs, n_labels)
+    tp = np.bincount(gold[correct], weights=weights[correct],
+                     minlength=n_runs * n_labels).reshape(shape)
+    n_gold = np.bincount(gold, weights=weights,
+                         minlength=n_runs * n_labels).reshape(shape)
+    n_pred = np.bincount(pred, weights=weights,
+                         minlength=n_runs * n_labels).reshape(shape)
+    return tp, n_gold, n_pred
+
+
+def _divide(numerator, denominator, defined) -> np.ndarray:
+    return np.divide(numerator, denominator,
+                     out=np.zeros(np.shape(defined)), where=defined)
+
+
+def _scores(tp: np.ndarray, n_gold: np.ndarray, n_pred: np.ndarray,
+            metrics: typing.Iterable[str]) -> typing.Dict[str, np.ndarray]:
+    """Metrics of Evaluator per run from the counts of _counts. The classes
+    of a run are the labels with gold examples in that run.
+
+    Returns:
+        dict(str:np.ndarray): value per run, per metric
+    """
+    classes = n_gold > 0
+    tp, fp = tp * classes, (n_pred - tp) * classes
+    predicted = classes & (n_pred > 0)
+    precision = _divide(tp, n_pred, predicted)
+    recall = _divide(tp, n_gold, predicted)
+    n_classes = classes.sum(axis=1)
+
+    tp_total, n_total = tp.sum(axis=1), n_gold.sum(axis=1)
+    fp_total = fp.sum(axis=1)
+    scores = {"accuracy": tp_total / n_total,
+              "macro_precision": precision.sum(axis=1) / n_classes,
+              "macro_recall": recall.sum(axis=1) / n_classes,
+              "micro_precision": _divide(tp_total, tp_total + fp_total,
+                                         (tp_total + fp_total) != 0),
+              "micro_recall": tp_total / n_total}
+    for average in ["macro", "micro"]:
+        p = scores[f"{average}_precision"]
+        r = scores[f"{average}_recall"]
+        scores[f"{average}_fscore"] = _divide(2 * p * r, p + r, (p + r) != 0)
+    return {metric: scores[metric] for metric in metrics}
+
+
+def _bootstrap_task(cells, cell_counts, n_labels, metrics, n_resamples,
+                    seed):
+    """Scores of bootstrap resamples. Resampling n examples with
+    replacement is drawing how often every cell of the confusion matrix
+    is hit, so only the non-empty cells are resampled, not the examples.
+    """
+    rng = np.random.default_rng(seed)
+    n = cell_counts.sum()
+    weights = rng.multinomial(n, cell_counts / n, size=n_resamples)
+    gold = np.broadcast_to(cells // n_labels, weights.shape)
+    pred = np.broadcast_to(cells % n_labels, weights.shape)
+    return _scores(*_counts(gold, pred, n_labels, weights), metrics)
+
+
+def _permutation_task(gold, pred, other_pred, n_labels, metrics,
+                      n_resamples, seed):
+    """Differences of the scores of two systems after randomly swapping
+    their predictions for every example.
+    """
+    rng = np.random.default_rng(seed)
+    swap = rng.random((n_resamples, len(gold))) < 0.5
+    gold = np.broadcast_to(gold, swap.shape)
+    scores = _scores(*_counts(gold, np.where(swap, other_pred, pred),
+                              n_labels), metrics)
+    other_scores = _scores(*_counts(gold, np.where(swap, pred, other_pred),
+                                    n_labels), metrics)
+    return {metric: scores[metric] - other_scores[metric]
+            for metric in metrics}
+
+
+def _run_tasks(task, n_resamples, processes, seed):
+    """Runs the resamples in tasks of RESAMPLES_PER_TASK, in a process pool
+    if processes > 1. Every task gets its own seed, so the results do not
+    depend on the number of processes.
+
+    Raises:
+        ValueError: raised when n_resamples is less than 1
+
+    Returns:
+        dict(str:np.ndarray): value per resample, per metric
+    """
+    if n_resamples < 1:
+        raise ValueError(f"n_resamples has to be at least 1, got "
+                         f"{n_resamples}.")
+    sizes = [RESAMPLES_PER_TASK] * (n_resamples // RESAMPLES_PER_TASK)
+    if n_resamples % RESAMPLES_PER_TASK:
+        sizes.append(n_resamples % RESAMPLES_PER_TASK)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if processes > 1:
+        with concurrent.futures.ProcessPoolExecutor(processes) as ex:
+            results = list(ex.map(task, sizes, seeds))
+    else:
+        results = list(map(task, sizes, seeds))
+    return {metric: np.concatenate([result[metric] for result in results])
+            for metric in results[0]}
+
 
 class Evaluator():
     """Acts as an evaluator object for a given pair of predictions and their
@@ -18,6 +195,14 @@ class Evaluator():
         self.classes = set(gold)
         # we need to know the number of classes for micro and macro metrics
         self.n_classes = len(self.classes)
+        # all counts are derived from one confusion matrix, the arrays
+        # below are in the order of self.classes
+        self.confusion = ConfusionMatrix(gold, pred)
+        rows = self.confusion.rows(self.classes)
+        self._tp, self._fn = self.confusion.tp[rows], self.confusion.fn[rows]
+        self._fp, self._tn = self.confusion.fp[rows], self.confusion.tn[rows]
+        # classes never predicted have a precision, recall and F-Score of 0
+        self._predicted = self.confusion.n_pred[rows] > 0
         # Precalculating the following since we might want to output more than
         # one metric so might aswell
         tp, fn, fp, tn = self.instances_per_class()
@@ -25,43 +210,15 @@ class Evaluator():
         self.fp_per_class, self.tn_per_class = fp, tn
 
     def instances_per_class(self):
-        """Calculates TP, FP, TN, FN per class
+        """Calculates TP, FP, TN, FN per class from the confusion matrix
 
         Returns:
             tp, fp, tn, fn: dicts with respective number of (mis-)
                             classifications per class
         """
-        tp, fp, tn, fn = {}, {}, {}, {}
-        for i in self.classes:
-            tp[i] = 0
-            fp[i] = 0
-            tn[i] = 0
-            fn[i] = 0
-
-        # for each pair of gold label and prediction
-        for g, p in zip(self.gold, self.pred):
-            # for each class
-            for c in self.classes:
-                # gold label and prediction match
-                # and match the class -> TP
-                if g == p and p == c:
-                    tp[c] += 1
-                # gold label and prediction match
-                # and don't match the class -> TN
-                elif g == p and p != c:
-                    tn[c] += 1
-                # gold label and prediction don't match
-                # but gold matches class -> FN
-                elif g == c and c != p:
-                    fn[c] += 1
-                # gold label and prediction don't match
-                # but prediction and class match -> FP
-                elif g != p and p == c:
-                    fp[c] += 1
-                # Nothing matches -> TN
-                else:
-                    tn[c] += 1
-
+        tp, fn, fp, tn = (dict(zip(self.classes, counts.tolist()))
+                          for counts in (self._tp, self._fn,
+                                         self._fp, self._tn))
         return tp, fn, fp, tn
 
     def accuracy(self):
@@ -71,28 +228,34 @@ class Evaluator():
         Returns:
             float: accuracy
         """
-        return len([1 for i, j in zip(self.gold, self.pred) if i == j]) \
-            / len(self.gold)
+        # correct predictions are the diagonal of the confusion matrix
+        return int(self.confusion.tp.sum()) / len(self.gold)
         # the length of gold and pred should be equal, so either
         # would be fine here
 
+    def _per_class(self, numerator, denominator, defined):
+        """Divides counts per class, in the order of self.classes.
+
+        Returns:
+            dict(int:float): quotient per class, 0 where not defined
+        """
+        quotients = np.divide(numerator, denominator,
+                              out=np.zeros(len(defined)),
+                              where=defined).tolist()
+        return {i: quotient if is_defined else 0
+                for i, quotient, is_defined in zip(self.classes, quotients,
+                                                   defined.tolist())}
+
     def precision_per_class(self):
         """Precisions per class: TP / (TP + FP)
 
         Returns:
             dict(int:float): precision per class in the gold data
         """
-        # if-condition to prevent division by zero in cases where there
+        # mask to prevent division by zero in cases where there
         # is no instance classified as the class or both TP and FN are zero
-        prec_dict = {}
-        for i in self.classes:
-            if (i not in self.pred or (self.tp_per_class[i] ==
-                                       self.fn_per_class[i] == 0)):
-                prec_dict[i] = 0
-            else:
-                prec_dict[i] = self.tp_per_class[i] / \
-                    (self.tp_per_class[i]+self.fp_per_class[i])
-        return prec_dict
+        defined = self._predicted & ~((self._tp == 0) & (self._fn == 0))
+        return self._per_class(self._tp, self._tp + self._fp, defined)
 
     def recall_per_class(self):
         """Recalls per class: TP / (TP + FN)
@@ -100,17 +263,10 @@ class Evaluator():
         Returns:
             dict(int:float): recall per class in the gold data
         """
-        # if-condition to prevent division by zero in cases where there is
+        # mask to prevent division by zero in cases where there is
         # no instance classified as the class or both TP and FN are zero
-        rec_dict = {}
-        for i in self.classes:
-            if (i not in self.pred or (self.tp_per_class[i] ==
-                                       self.fn_per_class[i] == 0)):
-                rec_dict[i] = 0
-            else:
-                rec_dict[i] = (self.tp_per_class[i] /
-                               (self.tp_per_class[i]+self.fn_per_class[i]))
-        return rec_dict
+        defined = self._predicted & ~((self._tp == 0) & (self._fn == 0))
+        return self._per_class(self._tp, self._tp + self._fn, defined)
 
     def fscore_per_class(self):
         """F-Score F1 = (2PR)/(P+R) per class
@@ -118,21 +274,15 @@ class Evaluator():
         Returns:
             dict(int:float): F-Score F1 per glass
         """
-        # if-condition to prevent division by zero in cases where there
+        # mask to prevent division by zero in cases where there
         # is no instance classified as the class
-        f_dict = {}
-        for i in self.classes:
-            if (i not in self.pred or
-                (self.precision_per_class()[i] ==
-                 self.recall_per_class()[i] == 0)):
-                f_dict[i] = 0
-            else:
-                f_dict[i] = ((2 * self.precision_per_class()[i] *
-                              self.recall_per_class()[i])
-                             /
-                             (self.precision_per_class()[i] +
-                              self.recall_per_class()[i]))
-        return f_dict
+        precision = np.array(list(self.precision_per_class().values()),
+                             dtype=np.float64)
+        recall = np.array(list(self.recall_per_class().values()),
+                          dtype=np.float64)
+        defined = self._predicted & ~((precision == 0) & (recall == 0))
+        return self._per_class(2 * precision * recall, precision + recall,
+                               defined)
 
     def macro_precision(self):
         """For n classes:
@@ -215,3 +365,238 @@ class Evaluator():
         else:
             return ((2 * self.micro_precision() * self.micro_recall()) /
                     denominator)
+
+    def bootstrap(self, metrics: typing.Iterable[str] = DEFAULT_METRICS,
+                  n_resamples=1000, confidence=0.95, processes=1,
+                  seed=None) -> typing.Dict[str, typing.Tuple[float, float]]:
+        """Bootstrap confidence intervals of metrics: the examples are
+        resampled with replacement and the metrics computed for every
+        resample, the classes of a resample being its gold classes.
+
+        Args:
+            metrics (typing.Iterable[str], optional): names of the metric
+                methods. Defaults to accuracy, macro and micro F-Score.
+            n_resamples (int, optional): number of resamples.
+                                         Defaults to 1000.
+            confidence (float, optional): confidence level of the intervals.
+                                          Defaults to 0.95.
+            processes (int, optional): number of processes to use.
+                                       Defaults to 1.
+            seed (int, optional): seed of the resampling. Defaults to None.
+
+        Raises:
+            ValueError: raised when n_resamples is less than 1
+
+        Returns:
+            dict(str:(float, float)): lower and upper bound per metric
+        """
+        cells, cell_counts = np.unique(self.confusion.cells,
+                                       return_counts=True)
+        task = functools.partial(_bootstrap_task, cells, cell_counts,
+                                 len(self.confusion.labels), tuple(metrics))
+        scores = _run_tasks(task, n_resamples, processes, seed)
+        tail = (1 - confidence) / 2
+        return {metric: tuple(np.quantile(values, [tail, 1 - tail]).tolist())
+                for metric, values in scores.items()}
+
+    def permutation_test(self, other_pred: typing.List[int],
+                         metrics: typing.Iterable[str] = DEFAULT_METRICS,
+                         n_resamples=1000, processes=1,
+                         seed=None) -> typing.Dict[str, float]:
+        """Paired permutation test of the difference between these and
+        other predictions for the same gold labels: how often randomly
+        swapping the predictions of the two systems per example gives a
+        difference at least as large as the observed one.
+
+        Args:
+            other_pred (typing.List[int]): predictions of the other system
+            metrics (typing.Iterable[str], optional): names of the metric
+                methods. Defaults to accuracy, macro and micro F-Score.
+            n_resamples (int, optional): number of permutations.
+                                         Defaults to 1000.
+            processes (int, optional): number of processes to use.
+                                       Defaults to 1.
+            seed (int, optional): seed of the permutations.
+                                  Defaults to None.
+
+        Raises:
+            ValueError: raised when n_resamples is less than 1
+
+        Returns:
+            dict(str:float): two-sided p-value per metric
+        """
+        n, metrics = len(self.gold), tuple(metrics)
+        labels, inverse = np.unique(np.array(list(self.gold) +
+                                             list(self.pred) +
+                                             list(other_pred)),
+                                    return_inverse=True)
+        gold, pred, other = inverse.ravel().reshape(3, n)
+
+        # computed like the permuted differences, so equal differences
+        # only differ by rounding
+        scores = _scores(*_counts(np.stack([gold, gold]),
+                                  np.stack([pred, other]), len(labels)),
+                         metrics)
+        observed = {metric: scores[metric][0] - scores[metric][1]
+                    for metric in metrics}
+        task = functools.partial(_permutation_task, gold, pred, other,
+                                 len(labels), metrics)
+        differences = _run_tasks(task, n_resamples, processes, seed)
+        return {metric: float((np.sum(np.abs(differences[metric]) >=
+                                      np.abs(observed[metric]) - 1e-12)
+                               + 1) / (n_resamples + 1))
+                for metric in metrics}
+
+
+class BatchEvaluator():
+    """Evaluates several runs of predictions for the same gold labels at
+    once, e.g. one run per k of a kNN classifier.
+
+    The metrics are the same as those of Evaluator, computed for all runs
+    with array operations. Every metric method returns an array with one
+    value per run.
+    """
+    def __init__(self, gold: typing.List[int],
+                 runs: typing.List[typing.List[int]]):
+        """
+        Args:
+            gold (typing.List[int]): a list of integers with the index of the
+                                     true class of an example
+            runs (typing.List[typing.List[int]]): per run, a list of integers
+                                                  with the index of the
+                                                  predicted class of an
+                                                  example
+        """
+        n, n_runs = len(gold), len(runs)
+        self.gold = gold
+        self.runs = runs
+        self.classes = set(gold)
+        self.n_classes = len(self.classes)
+        self.n_examples = n
+
+        labels, inverse = np.unique(
+            np.array(list(gold) + [p for run in runs for p in run]),
+            return_inverse=True)
+        inverse = inverse.ravel()
+        n_labels = len(labels)
+        gold_ids = inverse[:n]
+        pred_ids = inverse[n:].reshape(n_runs, n)
+        run_offsets = (np.arange(n_runs) * n_labels)[:, None]
+
+        # only the diagonal, row and column sums of the confusion matrices
+        # are needed, so they are counted directly per run and label
+        correct = pred_ids == gold_ids
+        tp = np.bincount((run_offsets + pred_ids)[correct],
+                         minlength=n_runs * n_labels
+                         ).reshape(n_runs, n_labels)
+        n_pred = np.bincount((run_offsets + pred_ids).ravel(),
+                             minlength=n_runs * n_labels
+                             ).reshape(n_runs, n_labels)
+        n_gold = np.bincount(gold_ids, minlength=n_labels)
+
+        # arrays of shape (runs, classes) in the order of self.classes
+        index = {label: i for i, label in enumerate(labels.tolist())}
+        rows = np.array([index[c] for c in self.classes], dtype=np.int64)
+        self.tp = tp[:, rows]
+        self.fn = n_gold[rows] - self.tp
+        self.fp = n_pred[:, rows] - self.tp
+        self.tn = n - self.tp - self.fn - self.fp
+        self._predicted = n_pred[:, rows] > 0
+
+    def _mean_per_class(self, values) -> np.ndarray:
+        # summed up from left to right like sum() in Evaluator, which
+        # np.sum does not guarantee
+        return np.cumsum(values, axis=1)[:, -1] / self.n_classes
+
+    def _fscore(self, precision, recall) -> np.ndarray:
+        return _divide(2 * precision * recall, precision + recall,
+                       (precision + recall) != 0)
+
+    def accuracy(self) -> np.ndarray:
+        """Accuracy per run, see Evaluator.accuracy.
+        """
+        return self.tp.sum(axis=1) / self.n_examples
+
+    def precision_per_class(self) -> np.ndarray:
+        """Precision per run and class, see Evaluator.precision_per_class.
+
+        Returns:
+            np.ndarray: precisions of shape (runs, classes)
+        """
+        defined = self._predicted & ~((self.tp == 0) & (self.fn == 0))
+        return _divide(self.tp, self.tp + self.fp, defined)
+
+    def recall_per_class(self) -> np.ndarray:
+        """Recall per run and class, see Evaluator.recall_per_class.
+
+        Returns:
+            np.ndarray: recalls of shape (runs, classes)
+        """
+        defined = self._predicted & ~((self.tp == 0) & (self.fn == 0))
+        return _divide(self.tp, self.tp + self.fn, defined)
+
+    def fscore_per_class(self) -> np.ndarray:
+        """F-Score F1 per run and class, see Evaluator.fscore_per_class.
+
+        Returns:
+            np.ndarray: F-Scores of shape (runs, classes)
+        """
+        precision = self.precision_per_class()
+        recall = self.recall_per_class()
+        defined = self._predicted & ~((precision == 0) & (recall == 0))
+        return _divide(2 * precision * recall, precision + recall,
+                       defined)
+
+    def macro_precision(self) -> np.ndarray:
+        """Macro averaged precision per run, see Evaluator.macro_precision.
+        """
+        return self._mean_per_class(self.precision_per_class())
+
+    def macro_recall(self) -> np.ndarray:
+        """Macro averaged recall per run, see Evaluator.macro_recall.
+        """
+        return self._mean_per_class(self.recall_per_class())
+
+    def macro_fscore(self) -> np.ndarray:
+        """Macro averaged F-Score per run, see Evaluator.macro_fscore.
+        """
+        return self._fscore(self.macro_precision(), self.macro_recall())
+
+    def micro_precision(self) -> np.ndarray:
+        """Micro averaged precision per run, see Evaluator.micro_precision.
+        """
+        tp = self.tp.sum(axis=1)
+        return _divide(tp, tp + self.fp.sum(axis=1),
+                       (tp + self.fp.sum(axis=1)) != 0)
+
+    def micro_recall(self) -> np.ndarray:
+        """Micro averaged recall per run, see Evaluator.micro_recall.
+        """
+        tp = self.tp.sum(axis=1)
+        return _divide(tp, tp + self.fn.sum(axis=1),
+                       (tp + self.fn.sum(axis=1)) != 0)
+
+    def micro_fscore(self) -> np.ndarray:
+        """Micro averaged F-Score per run, see Evaluator.micro_fscore.
+        """
+        return self._fscore(self.micro_precision(), self.micro_recall())
+
+    def results(self, metrics: typing.List[str] = None
+                ) -> typing.List[typing.Dict[str, float]]:
+        """All metrics of all runs.
+
+        Args:
+            metrics (typing.List[str], optional): names of the metric
+                methods to compute. If None, accuracy and all micro and
+                macro averaged scores. Defaults to None.
+
+        Returns:
+            typing.List[typing.Dict[str, float]]: metric name to value,
+                                                  per run
+        """
+        if metrics is None:
+            metrics = ["accuracy",
+                       "macro_precision", "macro_recall", "macro_fscore",
+                       "micro_precision", "micro_recall", "micro_fscore"]
+        values = [getattr(self, metric)().tolist() for metric in metrics]
+        return [dict(zip(metrics, run)) for run in zip(*values)]
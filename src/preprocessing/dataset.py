@@ -0,0 +1,150 @@
+import mmap
+import os
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+
+class DatasetFile():
+    """Random access to a data set file with one tab-separated
+    artist, title and lyrics triple per line.
+
+    The file is memory-mapped and indexed by the byte offsets of its lines
+    and the artist of every line, so single songs or the songs of some
+    artists can be read without parsing unrelated lines. The index is
+    cached next to the file and rebuilt when the file changes.
+    """
+
+    def __init__(self, filepath, index_path=None):
+        """
+        Args:
+            filepath (string): path to the data set file
+            index_path (string, optional): path of the cached index. If
+                                           None, filepath + ".index.npz".
+                                           Defaults to None.
+        """
+        self.filepath = filepath
+        self.index_path = (index_path if index_path is not None
+                           else filepath + ".index.npz")
+
+        with open(filepath, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            # empty files can not be memory-mapped
+            self._mmap = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                          if stat.st_size > 0 else b"")
+        self._stamp = np.array([stat.st_size, stat.st_mtime_ns])
+
+        if not self._load_index():
+            self._build_index()
+            self._save_index()
+
+        # line numbers grouped by artist, the lines of artist a are
+        # _artist_lines[_artist_offsets[a]:_artist_offsets[a+1]]
+        self._artist_lines = np.argsort(self.artist_ids, kind="stable")
+        self._artist_offsets = np.zeros(len(self.artists) + 1,
+                                        dtype=np.int64)
+        np.cumsum(np.bincount(self.artist_ids, minlength=len(self.artists)),
+                  out=self._artist_offsets[1:])
+        self._artist_to_id = {artist: i
+                              for i, artist in enumerate(self.artists)}
+
+    def _build_index(self):
+        """Scans the file once for the line offsets and artists.
+        """
+        offsets, artist_ids = [0], []
+        artist_to_id = {}
+        position = 0
+        for line in iter(getattr(self._mmap, "readline", lambda: b""), b""):
+            artist = line.split(b'\t', 1)[0].decode()
+            artist_ids.append(artist_to_id.setdefault(artist,
+                                                      len(artist_to_id)))
+            position += len(line)
+            offsets.append(position)
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.artist_ids = np.array(artist_ids, dtype=np.int64)
+        # artists in order of their first appearance
+        self.artists = list(artist_to_id)
+
+    def _load_index(self) -> bool:
+        """Loads the cached index if it belongs to the current file.
+
+        Returns:
+            bool: whether the index was loaded
+        """
+        try:
+            with np.load(self.index_path) as index:
+                if not np.array_equal(index["stamp"], self._stamp):
+                    return False
+                self.offsets = index["offsets"]
+                self.artist_ids = index["artist_ids"]
+                self.artists = index["artists"].tolist()
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def _save_index(self):
+        try:
+            with open(self.index_path, 'wb') as f:
+                np.savez(f, stamp=self._stamp, offsets=self.offsets,
+                         artist_ids=self.artist_ids,
+                         artists=np.array(self.artists, dtype=str))
+        except OSError:
+            # caching is optional, e.g. for read-only data folders
+            pass
+
+    def __len__(self):
+        return len(self.artist_ids)
+
+    def __getitem__(self, i) -> Tuple[str, str, str]:
+        """Reads the i-th song of the file.
+
+        Args:
+            i (int): line number
+
+        Returns:
+            (string, string, string): artist, songtitle and lyrics
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Line {i} out of range.")
+        line = self._mmap[self.offsets[i]:self.offsets[i + 1]].decode()
+        # The three values for each line are joined together with the
+        # tab '\t' character
+        artist, title, lyrics = line.split('\t')
+        return artist, title, lyrics
+
+    def lines(self, artists: Iterable[str]) -> np.ndarray:
+        """Line numbers of all songs of the given artists, in file order.
+        Unknown artists are ignored.
+
+        Args:
+            artists (Iterable[str]): the artists
+
+        Returns:
+            np.ndarray: sorted line numbers
+        """
+        ids = [self._artist_to_id[artist] for artist in artists
+               if artist in self._artist_to_id]
+        lines = [self._artist_lines[self._artist_offsets[a]:
+                                    self._artist_offsets[a + 1]]
+                 for a in ids]
+        if not lines:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(lines))
+
+    def subset(self, artists: Iterable[str]) -> List[Tuple[str, str, str]]:
+        """Reads all songs of the given artists, in file order.
+
+        Args:
+            artists (Iterable[str]): the artists
+
+        Returns:
+            List[Tuple[str, str, str]]: artist, songtitle and lyrics per song
+        """
+        return [self[i] for i in self.lines(artists)]
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
@@ -1,24 +1,77 @@
+import concurrent.futures
+import contextlib
+import itertools
 import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(__file__))
+from token_cache import TokenCache, TokenizedCorpus
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+
+# number of blocks per process when tokenizing in parallel
+BLOCKS_PER_PROCESS = 4
+
+
+def tokenize(lyrics, keep_punc=False):
+    """Tokenizes the raw data into a list of words, see
+    Preprocessor.tokenize.
+
+    Args:
+        lyrics (string): Lyrics of a song to be tokenized
+        keep_punc (bool, optional): Keep punctuation in the tokens-option.
+                                    Defaults to False.
+
+    Returns:
+        list(string): list of words in the lyrics
+    """
+    cleaned = lyrics.replace(" NEWLINE ", ' ').replace(" NEWLINE\n", '')
+    if not keep_punc:  # remove punctuation
+        return PUNCTUATION.sub('', cleaned).split(' ')
+    else:
+        return cleaned.split(' ')
+
+
+def _tokenize_block(block, keep_punc):
+    return [tokenize(lyrics, keep_punc) for lyrics in block]
 
 
 class Preprocessor():
-    def __init__(self, filepath, keep_punc=False, read_limit=1000):
+    def __init__(self, filepath=None, keep_punc=False, read_limit=1000,
+                 processes=1, cache_dir=None):
         """Preprocessing class, does reading and tokenising.
 
         Args:
-            filename (string): path to the data set file
+            filename (string, optional): path to the data set file. If None,
+                                         nothing is read, e.g. to only use
+                                         iter_records. Defaults to None.
             keep_punc (bool, optional): Keep punctuation in the tokens-option.
                                         Defaults to False.
             read_limit (int, optional): number of examples to read from file.
                                         Defaults to 1000.
+            processes (int, optional): number of processes to tokenize with.
+                                       If > 1, blocks of lyrics are
+                                       tokenized in parallel. Defaults to 1.
+            cache_dir (string, optional): directory of the cache of
+                                          tokenized files. If None, files
+                                          are always tokenized.
+                                          Defaults to None.
         """
         self.keep_punc = keep_punc
-        self.artists, self.titles, self.tokenized = self.read(filepath,
-                                                              read_limit)
+        self.processes = processes
+        self.cache = TokenCache(cache_dir) if cache_dir is not None else None
+        self.artists, self.titles, self.tokenized = [], [], []
+        if filepath is not None:
+            self.artists, self.titles, self.tokenized = self.read(filepath,
+                                                                  read_limit)
 
     def read(self, filepath, read_limit=1000):
         """Read file and tokenize lyrics
 
+        With a cache, the whole file is tokenized once and later reads are
+        served from the cache.
+
         Args:
             filename (string): path to the data set file
             read_limit (int, optional): number of examples to read from file.
@@ -29,24 +82,121 @@ class Preprocessor():
                                                             list of songtitles,
                                                             list of tokens
         """
-        artists, titles, tokenized_lyrics = [], [], []
-        with open(filepath, 'r') as f:
-            for i, line in enumerate(f.readlines()):
-                if i >= read_limit:
-                    break
-
-                # The three values for each line are joined together with the
-                # tab '\t' character
-                artist, title, lyrics = line.split('\t')
-
-                tokenized = self.tokenize(lyrics)
+        if self.cache is not None:
+            corpus = self.corpus(filepath)
+            lines = range(len(corpus) if read_limit is None
+                          else min(read_limit, len(corpus)))
+            return ([corpus.artists[i] for i in lines],
+                    [corpus.titles[i] for i in lines],
+                    corpus.tokenized(lines))
 
+        artists, titles, tokenized_lyrics = [], [], []
+        for batch in self.iter_records(filepath, read_limit=read_limit):
+            for artist, title, tokenized in batch:
                 artists.append(artist)
                 titles.append(title)
                 tokenized_lyrics.append(tokenized)
 
         return artists, titles, tokenized_lyrics
 
+    def corpus(self, filepath) -> TokenizedCorpus:
+        """Tokenizes a whole file into a compact corpus. If the Preprocessor
+        has a cache, the corpus is loaded from it if the file was tokenized
+        before with the same options, and stored in it otherwise.
+
+        Args:
+            filename (string): path to the data set file
+
+        Returns:
+            TokenizedCorpus: artists, songtitles and tokens of all songs
+        """
+        if self.cache is not None:
+            key = self.cache.key(filepath, self.keep_punc)
+            corpus = self.cache.get(key)
+            if corpus is not None:
+                return corpus
+
+        corpus = TokenizedCorpus(itertools.chain.from_iterable(
+            self.iter_records(filepath)))
+        if self.cache is not None:
+            self.cache.put(key, corpus)
+        return corpus
+
+    def iter_records(self, filepath, batch_size=1000, read_limit=None):
+        """Lazily read file and tokenize lyrics in batches. Only the lines
+        of the current batch are held in memory and reading stops at the
+        read limit.
+
+        Args:
+            filename (string): path to the data set file
+            batch_size (int, optional): number of examples per batch.
+                                        Defaults to 1000.
+            read_limit (int, optional): number of examples to read from file.
+                                        If None, the whole file is read.
+                                        Defaults to None.
+
+        Yields:
+            list((string, string, list(string))): artist, songtitle and
+                                                  tokens of every example in
+                                                  the batch
+        """
+        with contextlib.ExitStack() as stack:
+            f = stack.enter_context(open(filepath, 'r'))
+            # one process pool for all batches
+            executor = None
+            if self.processes > 1:
+                executor = stack.enter_context(
+                    concurrent.futures.ProcessPoolExecutor(self.processes))
+
+            lines = itertools.islice(f, read_limit)
+            while True:
+                artists, titles, lyrics = [], [], []
+                for line in itertools.islice(lines, batch_size):
+                    # The three values for each line are joined together
+                    # with the tab '\t' character
+                    artist, title, song = line.split('\t')
+                    artists.append(artist)
+                    titles.append(title)
+                    lyrics.append(song)
+
+                if not lyrics:
+                    break
+                yield list(zip(artists, titles,
+                               self._tokenize_all(lyrics, executor)))
+
+    def tokenize_all(self, lyrics):
+        """Tokenizes the lyrics of many songs, in parallel if the
+        Preprocessor was created with processes > 1. The tokens are the same
+        as those of tokenize.
+
+        Args:
+            lyrics (list(string)): Lyrics of the songs to be tokenized
+
+        Returns:
+            list(list(string)): list of words per song
+        """
+        if self.processes <= 1:
+            return self._tokenize_all(lyrics)
+        with concurrent.futures.ProcessPoolExecutor(self.processes) as ex:
+            return self._tokenize_all(lyrics, ex)
+
+    def _tokenize_all(self, lyrics, executor=None):
+        """Tokenizes the lyrics of many songs, split into blocks over the
+        processes of the executor if given.
+        """
+        lyrics = list(lyrics)
+        if executor is None:
+            return _tokenize_block(lyrics, self.keep_punc)
+
+        n_blocks = self.processes * BLOCKS_PER_PROCESS
+        block_size = max(-(-len(lyrics) // n_blocks), 1)
+        blocks = [lyrics[i:i + block_size]
+                  for i in range(0, len(lyrics), block_size)]
+        # ex.map keeps the order of the blocks
+        tokenized = executor.map(_tokenize_block, blocks,
+                                 itertools.repeat(self.keep_punc))
+        return list(itertools.chain.from_iterable(tokenized))
+
     def tokenize(self, lyrics):
         """Tokenizes the raw data into a list of words in the lyrics by first
         cleaning the special newline characters and then splitting the string
@@ -59,8 +209,4 @@ class Preprocessor():
         Returns:
             list(string): list of words in the lyrics
         """
-        cleaned = lyrics.replace(" NEWLINE ", ' ').replace(" NEWLINE\n", '')
-        if not self.keep_punc:  # remove punctuation
-            return re.sub(r'[^\w\s]', '', cleaned).split(' ')
-        else:
-            return cleaned.split(' ')
+        return tokenize(lyrics, self.keep_punc)
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sys
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..',
+                             'data_representations'))
+from vocabulary import Vocabulary
+
+# changes whenever the tokenization or the file format changes, so old
+# cache entries are not used anymore
+FORMAT_VERSION = 1
+
+
+def _pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Packs strings into one utf-8 byte array and offsets into it.
+    """
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end].decode()
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class TokenizedCorpus():
+    """Artists, titles and tokenized lyrics of a data set file in a compact
+    form: every distinct token is stored once in a vocabulary, the songs
+    are concatenated arrays of token ids with offsets per song.
+    """
+
+    def __init__(self,
+                 records: Iterable[Tuple[str, str, List[str]]] = ()):
+        """
+        Args:
+            records (Iterable[Tuple[str, str, List[str]]], optional):
+                artist, title and tokens per song. Defaults to ().
+        """
+        vocabulary = Vocabulary()
+        self.artists, self.titles, ids = [], [], []
+        for artist, title, tokens in records:
+            self.artists.append(artist)
+            self.titles.append(title)
+            ids.append(vocabulary.intern(tokens))
+
+        self.terms = np.array(vocabulary.terms, dtype=object)
+        self.offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum([len(song) for song in ids], out=self.offsets[1:])
+        self.ids = (np.concatenate(ids).astype(np.uint32) if ids
+                    else np.zeros(0, dtype=np.uint32))
+
+    def tokenized(self, lines: Iterable[int] = None) -> List[List[str]]:
+        """Tokens of the songs.
+
+        Args:
+            lines (Iterable[int], optional): line numbers of the songs. If
+                                             None, all songs.
+                                             Defaults to None.
+
+        Returns:
+            List[List[str]]: list of tokens per song
+        """
+        if lines is None:
+            lines = range(len(self))
+        terms, ids, offsets = self.terms, self.ids, self.offsets
+        return [terms[ids[offsets[i]:offsets[i + 1]]].tolist()
+                for i in lines]
+
+    def select(self, lines: Iterable[int]) -> List[Tuple[str, str, List[str]]]:
+        """Artist, title and tokens of some songs.
+
+        Args:
+            lines (Iterable[int]): line numbers of the songs
+
+        Returns:
+            List[Tuple[str, str, List[str]]]: artist, title and tokens per
+                                              song
+        """
+        lines = list(lines)
+        return list(zip([self.artists[i] for i in lines],
+                        [self.titles[i] for i in lines],
+                        self.tokenized(lines)))
+
+    def save(self, path):
+        """Saves the corpus in a binary .npz file.
+
+        Args:
+            path (string): path of the file
+        """
+        terms, term_offsets = _pack_strings(self.terms.tolist())
+        artists, artist_offsets = _pack_strings(self.artists)
+        titles, title_offsets = _pack_strings(self.titles)
+        with open(path, 'wb') as f:
+            np.savez(f, ids=self.ids, offsets=self.offsets,
+                     terms=terms, term_offsets=term_offsets,
+                     artists=artists, artist_offsets=artist_offsets,
+                     titles=titles, title_offsets=title_offsets)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a corpus saved with save.
+
+        Args:
+            path (string): path of the file
+
+        Returns:
+            TokenizedCorpus: the corpus
+        """
+        corpus = cls()
+        with np.load(path) as f:
+            corpus.ids, corpus.offsets = f["ids"], f["offsets"]
+            corpus.terms = np.array(_unpack_strings(f["terms"],
+                                                    f["term_offsets"]),
+                                    dtype=object)
+            corpus.artists = _unpack_strings(f["artists"],
+                                             f["artist_offsets"])
+            corpus.titles = _unpack_strings(f["titles"], f["title_offsets"])
+        return corpus
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class TokenCache():
+    """Cache of tokenized data set files on disk.
+
+    Entries are keyed by the content hash of the file and the tokenization
+    options, so a changed file or different options never hit an old entry.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (string): directory holding the cache entries
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, filepath, keep_punc) -> str:
+        """Cache key of a tokenized file.
+
+        Args:
+            filepath (string): path to the data set file
+            keep_punc (bool): Keep punctuation in the tokens-option.
+
+        Returns:
+            string: the key
+        """
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(f"keep_punc={keep_punc};v{FORMAT_VERSION}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key) -> TokenizedCorpus:
+        """Loads a cached corpus.
+
+        Args:
+            key (string): key of the corpus
+
+        Returns:
+            TokenizedCorpus: the corpus or None if not cached
+        """
+        try:
+            return TokenizedCorpus.load(self._path(key))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, key, corpus: TokenizedCorpus):
+        """Stores a corpus in the cache.
+
+        Args:
+            key (string): key of the corpus
+            corpus (TokenizedCorpus): the corpus
+        """
+        # written to a temporary file first, so a crash never leaves a
+        # truncated entry behind
+        path = self._path(key)
+        corpus.save(path + ".tmp")
+        os.replace(path + ".tmp", path)
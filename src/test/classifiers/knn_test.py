@@ -1,15 +1,50 @@
 import sys
 import os
+import tempfile
 import unittest
+from unittest import mock
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..',
                              'data_representations'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
 
-from classifiers.knn import Knn
+import numpy as np
+
+from classifiers.knn import DEPTH_MARGIN, Knn, nearest
+from classifiers.backends import recall
+from classifiers.workers import split_by_cost
 from evaluation.evaluation import Evaluator
 from vector import Vector
+from tf_idf import TfIdf
 from bow import BOW
+from compact_bow import CompactBOW
+from ivf import IVFIndex
+
+
+def random_texts(rng, n, vocabulary_size, max_size):
+    """Random texts of numbered terms.
+
+    Args:
+        rng (np.random.Generator): source of randomness
+        n (int): number of texts
+        vocabulary_size (int): number of distinct terms
+        max_size (int): texts have less than max_size terms
+
+    Returns:
+        List[List[str]]: the texts
+    """
+    return [[str(term) for term in rng.integers(0, vocabulary_size, size)]
+            for size in rng.integers(0, max_size, n)]
+
+
+def random_bows(rng, n, vocabulary_size, max_size):
+    """Random BOWs of numbered terms, see random_texts.
+
+    Returns:
+        List[BOW]: the bags of words
+    """
+    return [BOW(text)
+            for text in random_texts(rng, n, vocabulary_size, max_size)]
 
 
 class TestKnn(unittest.TestCase):
@@ -66,6 +101,427 @@ class TestKnn(unittest.TestCase):
         evaluator = Evaluator(testing_labels, predictions)
         self.assertAlmostEqual(evaluator.accuracy(), 2/3)
 
+    def test_backends_equal_brute_force(self):
+        """Test that the BOW backends predict exactly the same labels as the
+        brute force search for every BOW measure.
+        """
+        words = ["be", "like", "that", "sometimes", "never", "Dads", "Moms",
+                 "Chickens", "Grandmas", "always", "nothing", "maybe"]
+        training = [BOW(words[i % 5:i % 5 + i % 7]) for i in range(30)]
+        labels = [i % 4 for i in range(30)]
+        testing_inputs = [BOW(words[i:i + 3] + ["unknown"])
+                          for i in range(len(words))] + [BOW([])]
+
+        brute = Knn(training, labels, backend="brute")
+        for backend in ["index", "matrix"]:
+            classifier = Knn(training, labels, backend=backend)
+            for measure in ["tversky", "jaccard", "dsc", "overlap", "naive"]:
+                for k in [1, 3, 7]:
+                    self.assertEqual(
+                        brute.predict(testing_inputs, k=k, measure=measure,
+                                      alpha=0.3, beta=0.8),
+                        classifier.predict(testing_inputs, k=k,
+                                           measure=measure,
+                                           alpha=0.3, beta=0.8))
+
+    def test_dense_vector_prediction(self):
+        """Test that the dense backend predicts the same labels as the brute
+        force search on Vectors, also with blocks smaller than the input.
+        """
+        training = [Vector([[i % 3, i % 5, 1 + i % 7]]) for i in range(20)]
+        labels = [i % 3 for i in range(20)]
+        testing_inputs = [Vector([[i % 4, 2, i]]) for i in range(9)]
+
+        brute = Knn(training, labels, backend="brute")
+        dense = Knn(training, labels, block_size=4)
+        for measure in ["cosine", "euclidean"]:
+            self.assertEqual(brute.predict(testing_inputs, measure=measure),
+                             dense.predict(testing_inputs, measure=measure))
+
+    def test_nearest_keeps_training_order_for_ties(self):
+        distances = np.array([0.5, 0.1, 0.5, 0.3, 0.5, 0.1])
+        stable = list(np.argsort(distances, kind="stable"))
+        for k in range(len(distances) + 2):
+            self.assertEqual(list(nearest(distances, k)), stable[:k])
+
+    def test_predict_many_k(self):
+        """Test that predictions for several k from one ranking equal the
+        predictions of separate calls.
+        """
+        training = [BOW(["a", "b", "c"][:1 + i % 3] + [str(i % 4)])
+                    for i in range(12)]
+        labels = [i % 5 for i in range(12)]
+        testing_inputs = [BOW(["a", str(i)]) for i in range(6)]
+
+        classifier = Knn(training, labels)
+        predictions = classifier.predict_many_k(testing_inputs, [1, 4, 20],
+                                                measure="jaccard")
+        for k in [1, 4, 20]:
+            self.assertEqual(predictions[k],
+                             classifier.predict(testing_inputs, k=k,
+                                                measure="jaccard"))
+
+    def test_multiprocess_prediction(self):
+        """Test that persistent worker processes with shared training data
+        predict the same labels as a single process, over several calls.
+        """
+        training = [BOW(["a", "b", "c"][:1 + i % 3] + [str(i % 4)])
+                    for i in range(12)]
+        labels = [i % 5 for i in range(12)]
+        testing_inputs = [BOW(["a", str(i)]) for i in range(6)]
+
+        single = Knn(training, labels)
+        with Knn(training, labels, multi_process=2) as classifier:
+            for k in [1, 3]:
+                self.assertEqual(classifier.predict(testing_inputs, k=k,
+                                                    measure="jaccard"),
+                                 single.predict(testing_inputs, k=k,
+                                                measure="jaccard"))
+            self.assertEqual(sum(worker["examples"] for worker in
+                                 classifier.worker_stats.values()),
+                             len(testing_inputs))
+
+            # fewer inputs than processes
+            self.assertEqual(classifier.predict(testing_inputs[:1], k=3,
+                                                measure="jaccard"),
+                             single.predict(testing_inputs[:1], k=3,
+                                            measure="jaccard"))
+
+    def test_split_by_cost(self):
+        self.assertEqual(split_by_cost([1, 1, 1, 1], 2), [(0, 2), (2, 4)])
+        # one expensive example gets a chunk of its own
+        self.assertEqual(split_by_cost([10, 1, 1, 1, 1], 2),
+                         [(0, 1), (1, 5)])
+        self.assertEqual(split_by_cost([1], 4), [(0, 1)])
+        self.assertEqual(split_by_cost([], 4), [])
+
+    def test_sparse_tfidf_prediction(self):
+        """Test that sparse tf-idf vectors predict the same labels as the
+        dense ones.
+        """
+        docs = [["Chickens", "be", "like", "that", "sometimes"],
+                ["Moms", "be", "like", "that", "never"],
+                ["Dads", "be", "like", "this", "sometimes"],
+                ["Grandmas", "are", "like", "that", "sometimes"]]
+        labels = [1, 2, 3, 4]
+        queries = [["Moms", "never"], ["Dads", "this", "that"]]
+
+        tfidf = TfIdf()
+        dense = Knn([Vector([v]) for v in tfidf.fit_transform(docs)], labels)
+        sparse = Knn(tfidf.transform(docs, sparse=True), labels)
+        for measure in ["cosine", "euclidean"]:
+            self.assertEqual(
+                dense.predict([Vector([v]) for v in tfidf.transform(queries)],
+                              k=1, measure=measure),
+                sparse.predict(tfidf.transform(queries, sparse=True),
+                               k=1, measure=measure))
+
+    def test_minhash_backend(self):
+        """Test that the MinHash LSH backend finds near duplicates, ranks
+        its candidates by the exact distance and measures its recall.
+        """
+        words = [str(i) for i in range(200)]
+        training = [BOW(words[i:i + 40]) for i in range(0, 160, 8)]
+        labels = list(range(len(training)))
+        # every query differs from one training example by one term
+        queries = [BOW(words[i + 1:i + 40] + ["new"])
+                   for i in range(0, 160, 8)]
+
+        exact = Knn(training, labels).neighbours(queries, k=2,
+                                                 measure="jaccard")
+        with Knn(training, labels, backend="minhash",
+                 backend_options={"num_perm": 64, "bands": 32}) as lsh:
+            self.assertEqual(lsh.predict(queries, k=1, measure="jaccard"),
+                             labels)
+            approximate = lsh.neighbours(queries, k=2, measure="jaccard")
+            self.assertEqual(recall(approximate[:, :1], exact[:, :1]), 1)
+            self.assertGreater(recall(approximate, exact), 0.5)
+
+            lsh.multi_process = 2
+            self.assertEqual(lsh.neighbours(queries, k=2,
+                                            measure="jaccard").tolist(),
+                             approximate.tolist())
+
+        # queries with fewer than k candidates, or none at all, are searched
+        # exactly instead of padded with the first training examples
+        # with bands of 16 rows, the partial overlaps of the first query
+        # with the last examples are no candidates
+        lonely = [BOW(words[170:200] + [f"new{i}" for i in range(20)]),
+                  BOW(["unseen"])]
+        lsh = Knn(training, labels, backend="minhash",
+                  backend_options={"num_perm": 64, "bands": 4})
+        exact = Knn(training, labels).neighbours(lonely, k=4,
+                                                 measure="jaccard")
+        self.assertEqual(exact[0, :3].tolist(), [19, 18, 17])
+        self.assertEqual(
+            lsh.neighbours(lonely, k=4, measure="jaccard").tolist(),
+            exact.tolist())
+
+    def test_measure_grid(self):
+        """Test that a grid of measures ranks and predicts the same as one
+        measure at a time, for backends with and without counts.
+        """
+        training = random_bows(np.random.default_rng(0), 40, 40, 25)
+        labels = [i % 3 for i in range(40)]
+        queries = training[:6] + [BOW([]), BOW(["unknown", "1"])]
+        measures = ["jaccard", "dsc", "overlap", "naive",
+                    ("tversky", 0.2, 0.9), ("tversky", 1, 0)]
+
+        for backend in ["brute", "index", "matrix", "bitset", "pruned"]:
+            classifier = Knn(training, labels, backend=backend,
+                             block_size=3)
+            grid = classifier.neighbours_grid(queries, 4, measures)
+            self.assertEqual(grid.shape, (len(measures), len(queries), 4))
+            for measure, neighbours in zip(measures, grid):
+                if isinstance(measure, str):
+                    measure = (measure,)
+                self.assertEqual(
+                    neighbours.tolist(),
+                    classifier.neighbours(queries, 4, *measure).tolist())
+
+        with Knn(training, labels, multi_process=2) as classifier:
+            predictions = classifier.predict_grid(queries, [1, 3], measures)
+            classifier.multi_process = 1
+            self.assertEqual(predictions,
+                             classifier.predict_grid(queries, [1, 3],
+                                                     measures))
+        self.assertEqual(list(predictions), measures)
+        self.assertEqual(predictions[("tversky", 0.2, 0.9)][3],
+                         classifier.predict(queries, 3, "tversky", 0.2, 0.9))
+
+    def test_neighbour_cache(self):
+        """Test that cached neighbours are served for any smaller k without
+        searching, also to another classifier on the same data.
+        """
+        training = random_bows(np.random.default_rng(0), 40, 40, 25)
+        labels = [i % 3 for i in range(40)]
+        queries = training[:6] + [BOW(["unknown", "1"])]
+        expected = Knn(training, labels).neighbours_grid(
+            queries, 8, ["jaccard", ("tversky", 0.2, 0.9)])
+
+        with tempfile.TemporaryDirectory() as directory:
+            classifier = Knn(training, labels, cache_dir=directory)
+            self.assertEqual(
+                classifier.neighbours(queries, 8, "jaccard").tolist(),
+                expected[0].tolist())
+            # BOWs of the same content hit the same entry
+            copy = Knn([BOW(bow.rep) for bow in training], labels,
+                       cache_dir=directory)
+            search = mock.patch.object(copy, "_search_neighbours",
+                                       wraps=copy._search_neighbours)
+            with search as searched:
+                for k in [1, 5, 8]:
+                    self.assertEqual(
+                        copy.neighbours(queries, k, "jaccard").tolist(),
+                        expected[0, :, :k].tolist())
+                    self.assertEqual(copy.predict(queries, k, "jaccard"),
+                                     Knn(training, labels).predict(
+                                         queries, k, "jaccard"))
+                searched.assert_not_called()
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            # only the measure and depth not cached yet are searched
+            grid = classifier.neighbours_grid(
+                queries, 8, ["jaccard", ("tversky", 0.2, 0.9)])
+            self.assertEqual(grid.tolist(), expected.tolist())
+            self.assertEqual(len(os.listdir(directory)), 2)
+            deeper = classifier.neighbours(queries, 40, "jaccard")
+            self.assertEqual(deeper[:, :8].tolist(), expected[0].tolist())
+            with search as searched:
+                # k beyond the training examples is served by the full
+                # ranking
+                self.assertEqual(
+                    copy.neighbours(queries, 41, "jaccard").tolist(),
+                    deeper.tolist())
+                searched.assert_not_called()
+                copy.neighbours(queries, 8, "dsc")
+                searched.assert_called_once_with(queries, 8,
+                                                 [("dsc", 1, 1)])
+
+    def test_subsets(self):
+        """Test that neighbours within label subsets are the same as those
+        of classifiers trained on the examples of the subset only, also if
+        the first ranking is too shallow.
+        """
+        rng = np.random.default_rng(0)
+        training = random_bows(rng, 60, 40, 25)
+        labels = [0 if i in (7, 40) else 1 + i % 4 for i in range(60)]
+        queries = random_bows(rng, 20, 40, 25)
+        subsets = [{0}, {0, 1}, {0, 1, 2, 3, 4}, {0, 2}]
+        rows = [range(5), range(10), range(20), []]
+
+        classifier = Knn(training, labels)
+        # with a small margin, many first rankings are too shallow
+        for margin in [DEPTH_MARGIN, 0.2]:
+            with mock.patch("classifiers.knn.DEPTH_MARGIN", margin):
+                ranked = classifier.neighbours_subsets(queries, 3, subsets,
+                                                       rows, "jaccard")
+                predicted = classifier.predict_subsets(queries, [1, 3],
+                                                       subsets, rows,
+                                                       "jaccard")
+            for subset, subset_rows, neighbours, predictions in zip(
+                    subsets, rows, ranked, predicted):
+                members = [i for i, label in enumerate(labels)
+                           if label in subset]
+                inputs = [queries[row] for row in subset_rows]
+                self.assertEqual(neighbours.shape,
+                                 (len(inputs), min(3, len(members))))
+                if not inputs:
+                    continue
+                expected = Knn([training[i] for i in members],
+                               [labels[i] for i in members])
+                self.assertEqual(
+                    neighbours.tolist(),
+                    np.array(members)[expected.neighbours(
+                        inputs, 3, "jaccard")].tolist())
+                self.assertEqual(predictions,
+                                 expected.predict_many_k(inputs, [1, 3],
+                                                         "jaccard"))
+        with self.assertRaises(ValueError):
+            classifier.neighbours_subsets(queries, 3, [{0}, {5}])
+
+    def test_compact_bow(self):
+        """Test that CompactBOWs are ranked like the BOWs of the same text.
+        """
+        texts = random_texts(np.random.default_rng(0), 40, 30, 20)
+        labels = [i % 3 for i in range(30)]
+        for backend in ["brute", "matrix", "pruned"]:
+            bows = Knn([BOW(text) for text in texts[:30]], labels,
+                       backend=backend)
+            compact = Knn([CompactBOW(text) for text in texts[:30]], labels,
+                          backend=backend)
+            self.assertEqual(
+                compact.neighbours([CompactBOW(text) for text in texts[30:]],
+                                   k=5, measure="jaccard").tolist(),
+                bows.neighbours([BOW(text) for text in texts[30:]],
+                                k=5, measure="jaccard").tolist())
+
+        # the workers unpickle training examples and queries into their own
+        # shared vocabulary, also with terms interned after they started
+        with Knn([CompactBOW(text) for text in texts[:30]], labels,
+                 backend="brute", multi_process=2) as compact:
+            compact.predict([CompactBOW(texts[30])], k=3, measure="jaccard")
+            queries = texts[30:] + [["fresh", "1"]]
+            self.assertEqual(
+                compact.predict([CompactBOW(text) for text in queries],
+                                k=3, measure="jaccard"),
+                bows.predict([BOW(text) for text in queries], k=3,
+                             measure="jaccard"))
+
+    def test_bitset_backend(self):
+        """Test that the bitset backend ranks the same neighbours as the
+        sparse matrix backend, and still ranks with a pruned vocabulary.
+        """
+        training = random_bows(np.random.default_rng(0), 50, 200, 60)
+        labels = [i % 3 for i in range(50)]
+        queries = training[:5] + [BOW([]), BOW(["unknown", "1", "2"])]
+
+        matrix = Knn(training, labels)
+        bitset = Knn(training, labels, backend="bitset", block_size=3)
+        for measure in ["jaccard", "dsc", "overlap", "tversky"]:
+            self.assertEqual(
+                bitset.neighbours(queries, 10, measure, 0.3, 0.8).tolist(),
+                matrix.neighbours(queries, 10, measure, 0.3, 0.8).tolist())
+
+        pruned = Knn(training, labels, backend="bitset",
+                     backend_options={"max_terms": 64})
+        self.assertEqual(pruned._search.bitset.bits.shape, (1, 50))
+        self.assertEqual(pruned.neighbours(training[:5], 1,
+                                           "jaccard").ravel().tolist(),
+                         list(range(5)))
+
+    def test_pruned_backend(self):
+        """Test that the pruned backend ranks the same neighbours as the
+        sparse matrix backend, while skipping most training examples for
+        near duplicates.
+        """
+        training = random_bows(np.random.default_rng(0), 80, 50, 30)
+        labels = list(range(len(training)))
+        queries = training[:10] + [BOW([]), BOW(["unknown", "1", "2"])]
+
+        matrix = Knn(training, labels)
+        pruned = Knn(training, labels, backend="pruned", block_size=5)
+        for measure, alpha, beta in [("jaccard", 1, 1), ("dsc", 1, 1),
+                                     ("overlap", 1, 1), ("naive", 1, 1),
+                                     ("tversky", 0.3, 0.8),
+                                     ("tversky", -0.5, 2)]:
+            for k in [1, 7, 100]:
+                self.assertEqual(
+                    pruned.neighbours(queries, k, measure, alpha,
+                                      beta).tolist(),
+                    matrix.neighbours(queries, k, measure, alpha,
+                                      beta).tolist())
+
+        words = [str(i) for i in range(400)]
+        training = [BOW(words[i:i + 10 + i % 30]) for i in range(0, 360)]
+        queries = [BOW(words[i:i + 10 + i % 30] + ["new"])
+                   for i in range(0, 360, 40)]
+        labels = list(range(len(training)))
+        with Knn(training, labels, backend="pruned") as pruned:
+            self.assertEqual(pruned.predict(queries, k=1,
+                                            measure="jaccard"),
+                             list(range(0, 360, 40)))
+            self.assertEqual(pruned.pairs, len(queries) * len(training))
+            self.assertGreater(pruned.pruned_fraction, 0.5)
+
+            pruned.multi_process = 2
+            pruned.predict(queries, k=1, measure="jaccard")
+            self.assertEqual(pruned.pairs, len(queries) * len(training))
+            self.assertGreater(pruned.pruned_fraction, 0.5)
+        self.assertEqual(Knn(training, labels).pruned_fraction, 0)
+
+    def test_ivf_backend(self):
+        """Test that the IVF backend equals the dense backend when all lists
+        are searched, also with product quantization and a loaded index.
+        """
+        rng = np.random.default_rng(0)
+        training = [Vector([row.tolist()]) for row in rng.normal(size=(60, 8))]
+        labels = [i % 4 for i in range(60)]
+        queries = [Vector([row.tolist()]) for row in rng.normal(size=(7, 8))]
+
+        dense = Knn(training, labels, backend="dense")
+        for options in [{"n_lists": 4, "nprobe": 4},
+                        {"n_lists": 4, "nprobe": 4, "n_subspaces": 2,
+                         "rerank": 60}]:
+            ivf = Knn(training, labels, backend="ivf",
+                      backend_options=options)
+            for measure in ["cosine", "euclidean"]:
+                self.assertEqual(
+                    ivf.neighbours(queries, k=5, measure=measure).tolist(),
+                    dense.neighbours(queries, k=5, measure=measure).tolist())
+
+        # a single probed list or few reranked candidates hold fewer than
+        # k vectors, those queries are searched exactly
+        for options in [{"n_lists": 20, "nprobe": 1},
+                        {"n_lists": 4, "nprobe": 1, "n_subspaces": 2,
+                         "rerank": 3}]:
+            self.assertEqual(
+                Knn(training, labels, backend="ivf",
+                    backend_options=options).neighbours(queries,
+                                                        k=10).tolist(),
+                dense.neighbours(queries, k=10).tolist())
+
+        index = ivf._search.index
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(os.path.join(directory, "index.npz"))
+            loaded = IVFIndex.load(os.path.join(directory, "index.npz"))
+        approximate = ivf.neighbours(queries, k=5)
+        ivf = Knn(training, labels, backend="ivf",
+                  backend_options={"index": loaded, "nprobe": 4})
+        self.assertEqual(ivf.neighbours(queries, k=5).tolist(),
+                         approximate.tolist())
+
+        with self.assertRaises(ValueError):
+            Knn(training[:10], labels[:10], backend="ivf",
+                backend_options={"index": loaded})
+        with self.assertRaises(ValueError):
+            Knn(TfIdf().fit_transform([["a"]], sparse=True), [0],
+                backend="ivf")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            Knn([BOW(["a"])], [1], backend="unknown")
+
 
 if __name__ == "__main__":
     unittest.main()
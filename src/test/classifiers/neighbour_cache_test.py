@@ -0,0 +1,79 @@
+import sys
+import os
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..',
+                             'data_representations'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+
+import numpy as np
+
+from classifiers.neighbour_cache import NeighbourCache, fingerprint
+from vector import SparseVector, Vector
+from bow import BOW
+
+
+class TestNeighbourCache(unittest.TestCase):
+    def test_fingerprint(self):
+        bows = [BOW(["a", "b"]), BOW(["c"])]
+        self.assertEqual(fingerprint(bows),
+                         fingerprint([BOW(["b", "a", "a"]), BOW(["c"])]))
+        self.assertNotEqual(fingerprint(bows), fingerprint(bows[::-1]))
+        self.assertNotEqual(fingerprint([BOW(["a", "b"])]),
+                            fingerprint([BOW(["a"]), BOW(["b"])]))
+        self.assertNotEqual(fingerprint([Vector([[1, 2]])]),
+                            fingerprint([Vector([[1, 3]])]))
+
+        sparse = [SparseVector([5, 1], [0.5, 2.0], 10**9)]
+        self.assertEqual(fingerprint(sparse),
+                         fingerprint([SparseVector([1, 5], [2.0, 0.5],
+                                                   10**9)]))
+        self.assertNotEqual(fingerprint(sparse),
+                            fingerprint([SparseVector([1, 5], [2.0, 0.5],
+                                                      10**9 + 1)]))
+        self.assertNotEqual(fingerprint(sparse),
+                            fingerprint([SparseVector([1, 6], [2.0, 0.5],
+                                                      10**9)]))
+
+    def test_get_put(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = NeighbourCache(directory)
+            key = cache.key("train", "test", "matrix", {}, "jaccard", 1, 1)
+            self.assertEqual(key, cache.key("train", "test", "matrix", None,
+                                            "jaccard", 1.0, 1.0))
+            self.assertNotEqual(key, cache.key("train", "test", "matrix", {},
+                                               "tversky", 1, 1))
+            self.assertIsNone(cache.get(key, 1))
+
+            neighbours = np.arange(12).reshape(3, 4)
+            cache.put(key, neighbours)
+            self.assertEqual(cache.get(key, 4).tolist(), neighbours.tolist())
+            self.assertEqual(cache.get(key, 2).tolist(),
+                             neighbours[:, :2].tolist())
+            self.assertIsNone(cache.get(key, 5))
+
+    def test_eviction(self):
+        neighbours = np.zeros((10, 10), dtype=np.int64)
+        with tempfile.TemporaryDirectory() as directory:
+            # room for two entries
+            cache = NeighbourCache(directory, 2 * 1000)
+            for key in ["a", "b"]:
+                cache.put(key, neighbours)
+                time.sleep(0.01)
+            # "a" was used after "b", so "b" is evicted
+            cache.get("a", 1)
+            time.sleep(0.01)
+            cache.put("c", neighbours)
+            self.assertIsNotNone(cache.get("a", 1))
+            self.assertIsNone(cache.get("b", 1))
+            self.assertIsNotNone(cache.get("c", 1))
+
+            # entries larger than the budget are not kept
+            cache.put("d", np.zeros((100, 10), dtype=np.int64))
+            self.assertIsNone(cache.get("d", 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
+                             'data_representations'))
+import numpy as np
+from bow import BOW
+from bow_bitset import BOWBitset, popcount
+
+
+class testBOWBitset(unittest.TestCase):
+    def setUp(self):
+        """Setting up testcases
+        """
+        words = [str(i) for i in range(150)]
+        self.bows = [BOW(["I", "am", "very", "pleased"]),
+                     BOW(["I", "am", "quite", "unhappy"]),
+                     BOW([]),
+                     BOW(words[:100] + ["I"]),
+                     BOW(words[50:])]
+        self.train = BOWBitset(self.bows)
+
+    def test_intersection(self):
+        self.assertEqual(self.train.bits.shape, (3, 5))
+        self.assertEqual(self.train.intersection(self.train[:3]).tolist(),
+                         [[4, 2, 0], [2, 4, 0], [0, 0, 0], [1, 1, 0],
+                          [0, 0, 0]])
+        self.assertEqual(self.train[3:].intersection(self.train[3:]).tolist(),
+                         [[101, 50], [50, 100]])
+
+    def test_similarity_equals_bow(self):
+        # unknown terms are not part of the bitsets but count for the sizes
+        queries = [BOW(["I", "am", "not", "pleased"]), BOW(["unknown"]),
+                   BOW(["1", "99", "149", "I"])]
+        bitset = BOWBitset(queries, vocabulary=self.train.vocabulary)
+        for measure in ["tversky", "jaccard", "dsc", "overlap", "naive"]:
+            scores = self.train.similarity(bitset, measure=measure,
+                                           alpha=0.1, beta=0.6)
+            for i, a in enumerate(self.bows):
+                for j, b in enumerate(queries):
+                    self.assertEqual(scores[i, j],
+                                     a.similarity(b, measure=measure,
+                                                  alpha=0.1, beta=0.6))
+
+    def test_max_terms(self):
+        # only the two terms of the highest document frequencies are kept
+        pruned = BOWBitset(self.bows, max_terms=2)
+        self.assertEqual(pruned.vocabulary.terms, ["I", "am"])
+        self.assertEqual(pruned.sizes.tolist(), [4, 4, 0, 101, 100])
+        self.assertEqual(pruned[:2].intersection(pruned[:2]).tolist(),
+                         [[2, 2], [2, 2]])
+
+    def test_popcount(self):
+        words = np.random.default_rng(0).integers(0, 2 ** 63, 100,
+                                                  dtype=np.uint64)
+        expected = [bin(word).count("1") for word in words.tolist()]
+        self.assertEqual(popcount(words).tolist(), expected)
+        # the fallback of numpy versions without bitwise_count
+        bitwise_count = getattr(np, "bitwise_count", None)
+        try:
+            if bitwise_count is not None:
+                del np.bitwise_count
+            self.assertEqual(popcount(words).tolist(), expected)
+        finally:
+            if bitwise_count is not None:
+                np.bitwise_count = bitwise_count
+
+    def test_different_vocabulary(self):
+        with self.assertRaises(ValueError):
+            self.train.intersection(BOWBitset(self.bows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
+                             'data_representations'))
+from bow import BOW
+from bow_matrix import BOWMatrix
+
+
+class testBOWMatrix(unittest.TestCase):
+    def setUp(self):
+        """Setting up testcases
+        """
+        self.bows = [BOW(["I", "am", "very", "pleased"]),
+                     BOW(["I", "am", "quite", "unhappy"]),
+                     BOW([])]
+        self.train = BOWMatrix(self.bows)
+
+    def test_intersection(self):
+        self.assertEqual(self.train.intersection(self.train).tolist(),
+                         [[4, 2, 0], [2, 4, 0], [0, 0, 0]])
+
+    def test_similarity_equals_bow(self):
+        # unknown terms are not part of the matrix but count for the sizes
+        queries = [BOW(["I", "am", "not", "pleased"]), BOW(["unknown"])]
+        matrix = BOWMatrix(queries, vocabulary=self.train.vocabulary)
+        for measure in ["tversky", "jaccard", "dsc", "overlap", "naive"]:
+            scores = self.train.similarity(matrix, measure=measure,
+                                           alpha=0.1, beta=0.6)
+            for i, a in enumerate(self.bows):
+                for j, b in enumerate(queries):
+                    self.assertEqual(scores[i, j],
+                                     a.similarity(b, measure=measure,
+                                                  alpha=0.1, beta=0.6))
+
+    def test_similarities(self):
+        measures = ["jaccard", ("tversky", 0.2, 0.9), "naive"]
+        scores = self.train.similarities(self.train, measures)
+        self.assertEqual(scores.shape, (3, 3, 3))
+        for measure, measure_scores in zip(measures, scores):
+            if isinstance(measure, str):
+                measure = (measure,)
+            self.assertEqual(measure_scores.tolist(),
+                             self.train.similarity(self.train,
+                                                   *measure).tolist())
+        # unknown measures fail as in BOW.similarity
+        with self.assertRaises(KeyError):
+            self.train.similarities(self.train, ["jaccard", "unknown"])
+
+    def test_pair_intersection(self):
+        pairs = self.train.pair_intersection(self.train, [0, 0, 1, 2],
+                                             [0, 1, 1, 0])
+        self.assertEqual(pairs.tolist(), [4, 2, 4, 0])
+
+    def test_rows(self):
+        self.assertEqual(len(self.train[1:]), 2)
+        self.assertEqual(self.train[0].distance(self.train[1],
+                                                measure="dsc")[0, 0], 1/2)
+
+    def test_different_vocabulary(self):
+        with self.assertRaises(ValueError):
+            self.train.intersection(BOWMatrix(self.bows))
+
+
+if __name__ == '__main__':
+    unittest.main()
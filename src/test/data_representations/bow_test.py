@@ -3,7 +3,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
                              'data_representations'))
-from bow import BOW
+from bow import BOW, measure_grid, similarity_from_counts
 
 
 class testBOW(unittest.TestCase):
@@ -63,6 +63,29 @@ class testBOW(unittest.TestCase):
         self.assertEqual(self.bow1.distance(bow0, "overlap"), 1)
         self.assertEqual(self.bow1.distance(bow0, "tversky"), 1)
 
+    def test_similarity_from_counts(self):
+        bow0 = BOW([])
+        for a, b in [(self.bow1, self.bow2), (self.bow1, bow0), (bow0, bow0)]:
+            counts = (len(a.rep.intersection(b.rep)), len(a.rep), len(b.rep))
+            for measure in ["tversky", "jaccard", "dsc", "overlap", "naive"]:
+                self.assertEqual(similarity_from_counts(*counts, measure,
+                                                        alpha=0.1, beta=0.7),
+                                 a.similarity(b, measure, alpha=0.1,
+                                              beta=0.7))
+
+    def test_similarities(self):
+        measures = ["jaccard", "dsc", "overlap", "naive",
+                    ("tversky", 0.1, 0.7), ("tversky", 1, 0)]
+        self.assertEqual(measure_grid(measures)[:2],
+                         [("jaccard", 1, 1), ("dsc", 1, 1)])
+        bow0 = BOW([])
+        for a, b in [(self.bow1, self.bow2), (self.bow1, bow0), (bow0, bow0)]:
+            self.assertEqual(a.similarities(b, measures),
+                             [a.similarity(b, *measure)
+                              for measure in measure_grid(measures)])
+        with self.assertRaises(KeyError):
+            self.bow1.similarities(self.bow2, ["jaccard", "unknown"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,80 @@
+import pickle
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
+                             'data_representations'))
+import numpy as np
+from bow import BOW
+from compact_bow import CompactBOW, SHARED_VOCABULARY, intersection_size
+from vocabulary import Vocabulary
+
+
+class testCompactBOW(unittest.TestCase):
+    def setUp(self):
+        """Setting up testcases
+        """
+        self.texts = [["I", "am", "very", "pleased"],
+                      ["I", "am", "quite", "unhappy", "am"],
+                      ["pleased", "very", "very"],
+                      []]
+
+    def test_same_as_bow(self):
+        for text in self.texts:
+            for other in self.texts:
+                for measure, alpha, beta in [("jaccard", 1, 1),
+                                             ("dsc", 1, 1),
+                                             ("overlap", 1, 1),
+                                             ("naive", 1, 1),
+                                             ("tversky", 0.1, 0.1),
+                                             ("tversky", -0.5, 2)]:
+                    self.assertEqual(
+                        CompactBOW(text).similarity(CompactBOW(other),
+                                                    measure, alpha, beta),
+                        BOW(text).similarity(BOW(other), measure, alpha,
+                                             beta))
+                    self.assertEqual(
+                        CompactBOW(text).distance(CompactBOW(other),
+                                                  measure, alpha, beta),
+                        BOW(text).distance(BOW(other), measure, alpha,
+                                           beta))
+
+    def test_interned_ids(self):
+        bow1, bow2 = CompactBOW(self.texts[0]), CompactBOW(self.texts[1])
+        self.assertIs(bow1.vocabulary, SHARED_VOCABULARY)
+        self.assertEqual(bow1.ids.dtype, np.uint32)
+        self.assertEqual(bow1.ids.tolist(), sorted(bow1.ids.tolist()))
+        self.assertEqual(len(bow2), 4)
+        self.assertEqual(bow2.rep, {"I", "am", "quite", "unhappy"})
+        self.assertEqual(bow1.intersection_size(bow2), 2)
+        self.assertFalse(hasattr(bow1, "__dict__"))
+
+        vocabulary = Vocabulary()
+        with self.assertRaises(ValueError):
+            bow1.similarity(CompactBOW(self.texts[0], vocabulary))
+        with self.assertRaises(KeyError):
+            bow1.similarity(bow2, "unknown")
+
+    def test_pickle(self):
+        """Test that unpickled CompactBOWs share the vocabulary of the
+        current process, as in a worker process.
+        """
+        bow = CompactBOW(["pickled", "terms"])
+        copy = pickle.loads(pickle.dumps(bow))
+        self.assertIs(copy.vocabulary, SHARED_VOCABULARY)
+        self.assertEqual(copy.intersection_size(bow), 2)
+
+        own = CompactBOW(["own"], Vocabulary())
+        self.assertIsNot(pickle.loads(pickle.dumps(own)).vocabulary,
+                         own.vocabulary)
+
+    def test_intersection_size(self):
+        large = np.arange(0, 1000, 3, dtype=np.uint32)
+        small = np.array([0, 1, 998, 999, 2000], dtype=np.uint32)
+        self.assertEqual(intersection_size(small, large), 2)
+        self.assertEqual(intersection_size(large, small), 2)
+        self.assertEqual(intersection_size(large[:0], small), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
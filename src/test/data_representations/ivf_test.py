@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
+                             'data_representations'))
+import numpy as np
+from ivf import IVFIndex, ProductQuantizer, kmeans
+
+
+class TestIVF(unittest.TestCase):
+    def setUp(self):
+        """Setting up testcases
+        """
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(4, 8)) * 10
+        self.data = (centers[np.arange(200) % 4] +
+                     rng.normal(size=(200, 8))).astype(np.float32)
+
+    def test_lists_hold_nearest_vectors(self):
+        centroids = kmeans(self.data, 4)
+        self.assertEqual(centroids.shape, (4, 8))
+        self.assertEqual(centroids.dtype, np.float32)
+        index = IVFIndex(self.data, 4, metric="euclidean")
+        self.assertEqual(sorted(index.members), list(range(200)))
+        for list_id in range(4):
+            distances = np.square(
+                self.data[index.list_members(list_id), None, :] -
+                index.centroids[None, :, :]).sum(axis=2)
+            self.assertTrue((distances.argmin(axis=1) == list_id).all())
+
+    def test_candidates_of_all_lists(self):
+        index = IVFIndex(self.data, 4)
+        rows, examples = index.candidates(self.data[:3], nprobe=4)
+        self.assertEqual(rows.tolist(), [0] * 200 + [1] * 200 + [2] * 200)
+        for row in range(3):
+            self.assertEqual(sorted(examples[rows == row]),
+                             list(range(200)))
+
+    def test_product_quantization(self):
+        pq = ProductQuantizer(self.data, 4)
+        codes = pq.encode(self.data)
+        self.assertEqual(codes.shape, (4, 200))
+        self.assertEqual(codes.dtype, np.uint8)
+        # the table lookups approximate the squared distances
+        tables = pq.tables(self.data[:1])
+        approximate = tables[0, np.arange(4)[:, None], codes].sum(axis=0)
+        exact = np.square(self.data - self.data[0]).sum(axis=1)
+        self.assertGreater(np.corrcoef(approximate, exact)[0, 1], 0.9)
+
+        index = IVFIndex(self.data, 4, n_subspaces=4)
+        rows, examples = index.candidates(self.data[:2], nprobe=4,
+                                          max_candidates=10)
+        self.assertEqual(rows.tolist(), [0] * 10 + [1] * 10)
+        self.assertEqual(set(examples[:10] % 4), {0})
+        self.assertEqual(set(examples[10:] % 4), {1})
+
+    def test_save_and_load(self):
+        index = IVFIndex(self.data, 4, n_subspaces=2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.npz")
+            index.save(path)
+            loaded = IVFIndex.load(path)
+        self.assertEqual(loaded.metric, "cosine")
+        self.assertEqual(len(loaded), 200)
+        for expected, actual in zip(index.candidates(self.data, 2, 5),
+                                    loaded.candidates(self.data, 2, 5)):
+            self.assertEqual(expected.tolist(), actual.tolist())
+
+    def test_errors(self):
+        with self.assertRaises(NotImplementedError):
+            IVFIndex(self.data, 4, metric="manhattan")
+        with self.assertRaises(ValueError):
+            IVFIndex(self.data, 4, n_subspaces=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
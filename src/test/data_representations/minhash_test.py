@@ -0,0 +1,44 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
+                             'data_representations'))
+from bow import BOW
+from minhash import MinHash, LSHIndex
+
+
+class testMinHash(unittest.TestCase):
+    def setUp(self):
+        """Setting up testcases
+        """
+        words = [str(i) for i in range(100)]
+        self.bows = [BOW(words[:50]), BOW(words[25:75]), BOW(words[50:]),
+                     BOW([])]
+        self.minhash = MinHash(num_perm=512)
+        self.signatures = self.minhash.signatures(self.bows)
+
+    def test_jaccard_estimate(self):
+        # Jaccard similarity of the first two sets is 25 / 75
+        estimate = (self.signatures[0] == self.signatures[1]).mean()
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.1)
+        self.assertEqual((self.signatures[0] == self.signatures[2]).mean(),
+                         0)
+
+    def test_signatures_do_not_depend_on_corpus(self):
+        single = self.minhash.signatures(self.bows[1:2])
+        self.assertEqual(single.tolist(), self.signatures[1:2].tolist())
+
+    def test_candidates(self):
+        index = LSHIndex(self.signatures, bands=512)
+        queries, candidates = index.candidates(
+            self.minhash.signatures([self.bows[0], BOW(["unknown"])]))
+        self.assertEqual(queries.tolist(), [0, 0])
+        self.assertEqual(candidates.tolist(), [0, 1])
+
+    def test_bands_divide_signatures(self):
+        with self.assertRaises(ValueError):
+            LSHIndex(self.signatures, bands=500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,11 @@
+import math
 import unittest
 import os
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from data_representations.tf_idf import TfIdf
+from data_representations.tf_idf import TfIdf, HashingTfIdf
 
 
 class TestTfIdf(unittest.TestCase):
@@ -55,6 +56,92 @@ class TestTfIdf(unittest.TestCase):
         tfidf_value = matrix[0][term_index]
         self.assertGreater(tfidf_value, 0)
 
+    def test_tfidf_sparse_transform(self):
+        """Tests that the sparse output holds the same weights as the dense
+        output.
+        """
+        docs = [['something', 'new', 'new', 'unknown'], ['maybe']]
+        dense = self.tfidf.transform(docs)
+        sparse = self.tfidf.transform(docs, sparse=True)
+
+        self.assertEqual([vector.vector for vector in sparse], dense)
+        # terms in all documents have an idf and weight of 0, which is not
+        # stored
+        self.assertEqual(sparse[0].nnz, 0)
+        self.assertEqual(sparse[1].nnz, 1)
+        original = TfIdf(interned=False)
+        original.fit([['something', 'new'], ['something']])
+        self.assertEqual(original.transform([['something', 'new']],
+                                            sparse=True)[0].nnz, 1)
+
+    def test_tfidf_interned_matches_original(self):
+        """Tests that fitting on interned token ids gives exactly the same
+        vocabulary, idf and weights as the original implementation.
+        """
+        docs = [['a', 'b', 'b', 'c'], ['b', 'c', 'd'], ['d', 'e'], []]
+        interned = TfIdf(interned=True)
+        original = TfIdf(interned=False)
+        weights = interned.fit_transform(docs, sparse=True)
+        weights_original = original.fit_transform(docs, sparse=True)
+
+        self.assertEqual(interned._vocab, original._vocab)
+        self.assertEqual(dict(interned._idf), dict(original._idf))
+        self.assertEqual([vector.vector for vector in weights],
+                         [vector.vector for vector in weights_original])
+        # one-shot iterables are read once only
+        self.assertEqual(interned.transform(iter(docs)),
+                         interned.transform(docs))
+        self.assertEqual(interned.transform(iter(docs)),
+                         original.transform(iter(docs)))
+
+    def test_tfidf_partial_fit(self):
+        """Tests that fitting in batches gives the same vocabulary and idf
+        as fitting all documents at once, and that reweighted term
+        frequencies of older documents match transforming them again.
+        """
+        docs = [['a', 'b', 'b', 'c'], ['b', 'c', 'd'], ['d', 'e'], ['a']]
+        tfidf = TfIdf()
+        tfidf.fit(docs)
+
+        for interned in [True, False]:
+            partial = TfIdf(interned=interned)
+            partial.fit(docs[:2])
+            term_frequencies = partial.term_frequencies(docs[:2])
+            partial.partial_fit(docs[2:3])
+            partial.partial_fit(docs[3:])
+
+            self.assertEqual(partial._vocab, tfidf._vocab)
+            self.assertEqual(dict(partial._idf), dict(tfidf._idf))
+            reweighted = partial.reweight(term_frequencies)
+            transformed = tfidf.transform(docs[:2], sparse=True)
+            self.assertEqual([vector.vector for vector in reweighted],
+                             [vector.vector for vector in transformed])
+
+    def test_hashing_tfidf(self):
+        """Tests that the hashing variant gives the same weights as TfIdf
+        without collisions, streaming the documents in small batches.
+        """
+        docs = [['a', 'b', 'b', 'c'], ['b', 'c', 'd'], ['d', 'e'], []]
+        tfidf = TfIdf()
+        weights = tfidf.fit_transform(docs, sparse=True)
+        hashing = HashingTfIdf(n_features=2**20, batch_size=3)
+        hashing.fit(iter(docs))
+        hashed = list(hashing.iter_transform(iter(docs + [['unknown']])))
+
+        self.assertEqual(len(hashed), 5)
+        self.assertEqual(hashed[0].dim, 2**20)
+        for vector, hashed_vector in zip(weights, hashed):
+            self.assertEqual(sorted(vector.values.tolist()),
+                             sorted(hashed_vector.values.tolist()))
+        self.assertEqual(hashed[-1].nnz, 0)
+
+        # colliding terms share one feature
+        hashing = HashingTfIdf(n_features=1)
+        weights = hashing.fit_transform(docs)
+        self.assertAlmostEqual(weights[0][0], -math.log(3 / 4))
+        self.assertEqual(weights[0], weights[1])
+        self.assertEqual(weights[3], [0])
+
 
 if __name__ == "__main__":
     unittest.main()
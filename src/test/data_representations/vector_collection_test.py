@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../',
+                             'data_representations'))
+from vector import Vector, SparseVector
+from vector_collection import VectorCollection
+
+
+class TestVectorCollection(unittest.TestCase):
+    def setUp(self):
+        """Setting up testcases
+        """
+        self.vectors = [Vector([[1, 2], [3]]), Vector([[0, -1, 4]]),
+                        Vector([[2.5, 0.5, -1]])]
+        self.collection = VectorCollection(self.vectors)
+
+    def test_distances_equal_vector(self):
+        for measure in ["cosine", "euclidean"]:
+            distances = self.collection.distance(self.collection, measure)
+            self.assertEqual(distances.shape, (3, 3))
+            for i, a in enumerate(self.vectors):
+                for j, b in enumerate(self.vectors):
+                    # float32 precision, see VectorCollection
+                    self.assertAlmostEqual(distances[i, j],
+                                           a.distance(b, measure),
+                                           delta=1e-2)
+
+    def test_zero_vector(self):
+        zero = VectorCollection([Vector([[0, 0, 0]])])
+        self.assertEqual(zero.distance(self.collection, "cosine").tolist(),
+                         [[1, 1, 1]])
+
+    def test_sparse_vectors(self):
+        sparse = [SparseVector([2, 0], [3, 1], 4), SparseVector([], [], 4),
+                  SparseVector([3, 1], [0.5, -2], 4)]
+        dense = [Vector([vector.vector]) for vector in sparse]
+        self.assertEqual(dense[0].vector, [1, 0, 3, 0])
+        self.assertEqual(sparse[2].nnz, 2)
+
+        queries = [SparseVector([0, 3], [2, 1], 4), SparseVector([1], [1], 4)]
+        collection = VectorCollection(sparse)
+        for measure in ["cosine", "euclidean"]:
+            distances = VectorCollection(queries).distance(collection,
+                                                           measure)
+            dense_distances = VectorCollection(
+                [Vector([query.vector]) for query in queries]).distance(
+                VectorCollection(dense), measure)
+            for i, query in enumerate(queries):
+                for j in [0, 2]:
+                    self.assertAlmostEqual(query.distance(sparse[j],
+                                                          measure),
+                                           dense[j].distance(
+                                               Vector([query.vector]),
+                                               measure))
+                    self.assertAlmostEqual(distances[i, j],
+                                           query.distance(sparse[j],
+                                                          measure),
+                                           delta=1e-2)
+                    self.assertAlmostEqual(distances[i, j],
+                                           dense_distances[i, j], places=5)
+
+    def test_pair_distance(self):
+        sparse = VectorCollection([SparseVector([2, 0], [3, 1], 4),
+                                   SparseVector([], [], 4),
+                                   SparseVector([3, 1], [0.5, -2], 4)])
+        rows, other_rows = [0, 2, 1, 0], [1, 1, 2, 0]
+        for collection in [self.collection, sparse]:
+            for measure in ["cosine", "euclidean"]:
+                distances = collection.distance(collection, measure)
+                self.assertEqual(
+                    collection.pair_distance(collection, rows, other_rows,
+                                             measure).tolist(),
+                    distances[rows, other_rows].tolist())
+
+    def test_unknown_measure(self):
+        with self.assertRaises(NotImplementedError):
+            self.collection.distance(self.collection, "manhattan")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'evaluation'))
-from evaluation import Evaluator
+from evaluation import Evaluator, ConfusionMatrix, BatchEvaluator
 
 
 class TestEvaluator(unittest.TestCase):
@@ -48,6 +48,62 @@ class TestEvaluator(unittest.TestCase):
         self.assertAlmostEqual(evaluator.macro_fscore(), 0.57, delta=0.002)
         self.assertAlmostEqual(evaluator.micro_fscore(), 2/3)
 
+    def test_confusion_matrix(self):
+        # class 3 is only predicted, it counts for FN/FP but is no class
+        # of the evaluation
+        confusion = ConfusionMatrix([1, 2, 0, 0], [1, 2, 1, 3])
+        self.assertEqual(confusion.labels.tolist(), [0, 1, 2, 3])
+        self.assertEqual(confusion.matrix.tolist(), [[0, 1, 0, 1],
+                                                     [0, 1, 0, 0],
+                                                     [0, 0, 1, 0],
+                                                     [0, 0, 0, 0]])
+        self.assertEqual(confusion.fn.tolist(), [2, 0, 0, 0])
+        self.assertEqual(confusion.fp.tolist(), [0, 1, 0, 1])
+        self.assertEqual(confusion.tn.tolist(), [2, 2, 3, 3])
+
+        evaluator = Evaluator([1, 2, 0, 0], [1, 2, 1, 3])
+        self.assertEqual(str(evaluator.tn_per_class), "{0: 2, 1: 2, 2: 3}")
+        self.assertEqual(evaluator.precision_per_class(),
+                         {0: 0, 1: 0.5, 2: 1.0})
+
+    def test_batch_evaluator(self):
+        gold = [1, 2, 0, 0, 2]
+        runs = [[1, 2, 1, 3, 2], [0, 0, 0, 0, 0], [1, 2, 0, 0, 2]]
+        results = BatchEvaluator(gold, runs).results()
+        self.assertEqual(len(results), 3)
+        for run, result in zip(runs, results):
+            evaluator = Evaluator(gold, run)
+            for metric, value in result.items():
+                self.assertEqual(getattr(evaluator, metric)(), value)
+        self.assertEqual(results[2]["macro_fscore"], 1)
+
+    def test_bootstrap(self):
+        gold = [i % 10 for i in range(200)]
+        pred = [g if i % 3 else (g + 1) % 10 for i, g in enumerate(gold)]
+        evaluator = Evaluator(gold, pred)
+        intervals = evaluator.bootstrap(n_resamples=250, seed=0)
+        for metric, (low, high) in intervals.items():
+            self.assertLessEqual(low, getattr(evaluator, metric)())
+            self.assertGreaterEqual(high, getattr(evaluator, metric)())
+        # results do not depend on the number of processes
+        self.assertEqual(evaluator.bootstrap(n_resamples=250, seed=0,
+                                             processes=2), intervals)
+        with self.assertRaises(ValueError):
+            evaluator.bootstrap(n_resamples=0)
+
+    def test_permutation_test(self):
+        gold = [i % 10 for i in range(200)]
+        pred = [g if i % 3 else (g + 1) % 10 for i, g in enumerate(gold)]
+        worse = [g if i % 3 == 0 else (g + 1) % 10 for i, g in enumerate(gold)]
+        evaluator = Evaluator(gold, pred)
+        p_values = evaluator.permutation_test(pred, n_resamples=200, seed=0)
+        self.assertEqual(p_values["accuracy"], 1)
+        p_values = evaluator.permutation_test(worse, n_resamples=200, seed=0)
+        for p_value in p_values.values():
+            self.assertLess(p_value, 0.01)
+        with self.assertRaises(ValueError):
+            evaluator.permutation_test(worse, n_resamples=0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..',
+                             'preprocessing'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..',
+                             'data_representations'))
+from preprocessing import Preprocessor
+from dataset import DatasetFile
+from tf_idf import TfIdf
+
+
+class TestPreprocessor(unittest.TestCase):
+    def setUp(self):
+        """Writes a small data set file
+        """
+        lines = [f"Artist {i % 3}\tSong {i}\tFirst line, {i} NEWLINE "
+                 f"Second line! NEWLINE\n" for i in range(7)]
+        self.file = tempfile.NamedTemporaryFile("w", suffix=".txt",
+                                                delete=False)
+        self.file.writelines(lines)
+        self.file.close()
+
+    def tearDown(self):
+        os.remove(self.file.name)
+
+    def test_read(self):
+        preprocessor = Preprocessor(self.file.name, read_limit=5)
+        self.assertEqual(len(preprocessor.tokenized), 5)
+        self.assertEqual(preprocessor.artists[4], "Artist 1")
+        self.assertEqual(preprocessor.tokenized[0],
+                         ["First", "line", "0", "Second", "line"])
+
+    def test_iter_records(self):
+        preprocessor = Preprocessor()
+        batches = list(preprocessor.iter_records(self.file.name,
+                                                 batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        self.assertEqual(batches[1][0][:2], ("Artist 0", "Song 3"))
+
+        batches = list(preprocessor.iter_records(self.file.name,
+                                                 batch_size=3, read_limit=4))
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+
+    def test_parallel_tokenization(self):
+        lyrics = [f"Line, {i}! NEWLINE Another line... NEWLINE\n"
+                  for i in range(50)]
+        for keep_punc in [False, True]:
+            serial = Preprocessor(keep_punc=keep_punc)
+            parallel = Preprocessor(keep_punc=keep_punc, processes=2)
+            self.assertEqual(parallel.tokenize_all(lyrics),
+                             [serial.tokenize(song) for song in lyrics])
+            self.assertEqual(
+                list(parallel.iter_records(self.file.name, batch_size=3)),
+                list(serial.iter_records(self.file.name, batch_size=3)))
+
+    def test_token_cache(self):
+        directory = tempfile.mkdtemp()
+        preprocessor = Preprocessor(cache_dir=directory)
+        tokenized = Preprocessor(self.file.name).tokenized
+
+        self.assertEqual(preprocessor.read(self.file.name, read_limit=3)[2],
+                         tokenized[:3])
+        self.assertEqual(len(os.listdir(directory)), 1)
+        # served from the cache
+        self.assertEqual(preprocessor.read(self.file.name)[2], tokenized)
+        self.assertEqual(preprocessor.corpus(self.file.name).select([4]),
+                         [("Artist 1", "Song 4", tokenized[4])])
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+        # other options get their own cache entry
+        cached = Preprocessor(keep_punc=True, cache_dir=directory)
+        self.assertEqual(cached.read(self.file.name)[2],
+                         Preprocessor(self.file.name,
+                                      keep_punc=True).tokenized)
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    def test_streaming_tfidf_fit(self):
+        preprocessor = Preprocessor()
+        streamed = TfIdf()
+        streamed.fit(tokens for batch in
+                     preprocessor.iter_records(self.file.name, batch_size=2)
+                     for _, _, tokens in batch)
+        tfidf = TfIdf()
+        tfidf.fit(Preprocessor(self.file.name).tokenized)
+        self.assertEqual(streamed._idf, tfidf._idf)
+
+
+class TestDatasetFile(unittest.TestCase):
+    def setUp(self):
+        """Writes a small data set file
+        """
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "songs.txt")
+        self.lines = [f"Artist {i % 3}\tSong {i}\tLine {i} NEWLINE\n"
+                      for i in range(7)]
+        with open(self.path, 'w') as f:
+            f.writelines(self.lines)
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def test_random_access(self):
+        dataset = DatasetFile(self.path)
+        self.assertEqual(len(dataset), 7)
+        self.assertEqual(dataset[5], tuple(self.lines[5].split('\t')))
+        self.assertEqual(dataset[-1], tuple(self.lines[6].split('\t')))
+        with self.assertRaises(IndexError):
+            dataset[7]
+        dataset.close()
+
+    def test_artist_subset(self):
+        dataset = DatasetFile(self.path)
+        self.assertEqual(dataset.artists, ["Artist 0", "Artist 1",
+                                           "Artist 2"])
+        self.assertEqual(dataset.lines(["Artist 2", "Artist 0"]).tolist(),
+                         [0, 2, 3, 5, 6])
+        self.assertEqual([title for _, title, _ in
+                          dataset.subset(["Artist 1", "unknown"])],
+                         ["Song 1", "Song 4"])
+        dataset.close()
+
+    def test_cached_index(self):
+        DatasetFile(self.path).close()
+        self.assertTrue(os.path.exists(self.path + ".index.npz"))
+        self.assertEqual(DatasetFile(self.path).artists[:2],
+                         ["Artist 0", "Artist 1"])
+
+        # a changed file invalidates the cached index
+        with open(self.path, 'a') as f:
+            f.write("New Artist\tNew Song\tNew NEWLINE\n")
+        dataset = DatasetFile(self.path)
+        self.assertEqual(len(dataset), 8)
+        self.assertEqual(dataset.artists[-1], "New Artist")
+
+    def test_empty_file(self):
+        open(self.path, 'w').close()
+        self.assertEqual(len(DatasetFile(self.path)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()